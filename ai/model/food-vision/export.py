@@ -0,0 +1,100 @@
+"""
+Export a trained food classifier to an int8 ONNX model for the backend's
+local analysis engine (ANALYSIS_ENGINE=local).
+
+    python export.py --checkpoint classifier.pt --labels labels.json \
+        --calibration-dir samples/ --out-dir ../../../backend/models/food-vision
+
+The checkpoint is a TorchScript module taking a float32 NCHW batch of
+normalised RGB images and returning one logit per label. Weights and
+activations are quantised to int8 with static calibration on
+`--calibration-dir`, which should hold a few hundred representative photos.
+"""
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import onnxruntime.quantization as quantization
+import torch
+from PIL import Image, ImageOps
+
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+def load_tensor(path: Path, size: int, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    # must match load_image_tensor in backend/core/utils/helpers/vision,
+    # including the JPEG draft decode
+    with Image.open(path) as image:
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image = ImageOps.fit(image, (size, size), method=Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+    return ((pixels - mean) / std).transpose(2, 0, 1)
+
+
+class CalibrationReader(quantization.CalibrationDataReader):
+    def __init__(self, input_name: str, paths: list, size: int, mean: np.ndarray, std: np.ndarray):
+        self.input_name = input_name
+        self.samples = iter(paths)
+        self.size, self.mean, self.std = size, mean, std
+
+    def get_next(self):
+        path = next(self.samples, None)
+        if path is None:
+            return None
+        return {self.input_name: load_tensor(path, self.size, self.mean, self.std)[None]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoint", required=True, type=Path)
+    parser.add_argument("--labels", required=True, type=Path)
+    parser.add_argument("--calibration-dir", required=True, type=Path)
+    parser.add_argument("--out-dir", required=True, type=Path)
+    args = parser.parse_args()
+
+    manifest = json.loads(args.labels.read_text())
+    size = manifest.get("input_size", 224)
+    mean = np.array(manifest.get("mean", IMAGENET_MEAN), dtype=np.float32)
+    std = np.array(manifest.get("std", IMAGENET_STD), dtype=np.float32)
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    float_path = args.out_dir / "model.float.onnx"
+    int8_path = args.out_dir / "model.int8.onnx"
+
+    model = torch.jit.load(str(args.checkpoint), map_location="cpu").eval()
+    torch.onnx.export(
+        model,
+        torch.zeros(1, 3, size, size),
+        str(float_path),
+        input_names=["pixels"],
+        output_names=["logits"],
+        dynamic_axes={"pixels": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+
+    quantization.quant_pre_process(str(float_path), str(float_path))
+    paths = sorted(
+        path for path in args.calibration_dir.iterdir()
+        if path.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp"}
+    )
+    quantization.quantize_static(
+        str(float_path),
+        str(int8_path),
+        CalibrationReader("pixels", paths, size, mean, std),
+        quant_format=quantization.QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=quantization.QuantType.QUInt8,
+        weight_type=quantization.QuantType.QInt8,
+    )
+    float_path.unlink()
+    shutil.copy(args.labels, args.out_dir / "labels.json")
+    print(f"Wrote {int8_path} ({int8_path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
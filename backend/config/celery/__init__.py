@@ -1,10 +1,12 @@
 from __future__ import absolute_import, unicode_literals
 
 import os
+import time
 from pathlib import Path
 
 import environ
 from celery import Celery
+from celery.signals import before_task_publish, worker_init
 
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
@@ -20,4 +22,18 @@ os.environ.setdefault(
 
 app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@before_task_publish.connect
+def stamp_enqueue_time(headers=None, **kwargs):
+    # lets tasks measure how long they waited in the queue
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@worker_init.connect
+def configure_analysis_batching(sender=None, **kwargs):
+    # batching only pays off when tasks share a process
+    from core.results.batching import AnalysisBatcher
+    AnalysisBatcher.configure_for_pool(sender.pool_cls)
@@ -0,0 +1,34 @@
+"""
+Prints the `celery worker` arguments for a lane in CELERY_WORKER_LANES:
+
+    celery -A config worker $(python -m config.celery.lanes interactive)
+
+A lane pins a worker to a set of queues with its own concurrency and
+prefetch, so batch work never occupies the interactive analysis workers.
+"""
+import sys
+
+from django.conf import settings
+
+
+def worker_arguments(lane: str) -> list[str]:
+    try:
+        config = settings.CELERY_WORKER_LANES[lane]
+    except KeyError:
+        raise SystemExit(
+            f"Unknown worker lane '{lane}', expected one of: "
+            f"{', '.join(settings.CELERY_WORKER_LANES)}"
+        )
+
+    arguments = ["-Q", ",".join(config["queues"])]
+    if config.get("concurrency"):
+        arguments += ["--concurrency", str(config["concurrency"])]
+    if config.get("prefetch_multiplier"):
+        arguments += ["--prefetch-multiplier", str(config["prefetch_multiplier"])]
+    if config.get("pool"):
+        arguments += ["--pool", config["pool"]]
+    return arguments
+
+
+if __name__ == "__main__":
+    print(" ".join(worker_arguments(sys.argv[1] if len(sys.argv) > 1 else "all")))
@@ -4,14 +4,47 @@ from kombu import Queue
 class CeleryQueue:
     class Definitions:
         BEATS = "beats"
+        ANALYSIS = "analysis"
+        ANALYSIS_BULK = "analysis-bulk"
         EMAIL_AND_NOTIFICATION = "email-notification"
         RECOMMENDATIONS = "recommendations"
 
+    class Priority:
+        # Redis transport: lower values are consumed first
+        INTERACTIVE = 0
+        DEFAULT = 5
+        RETRY = 7
+
+    # Priority levels the Redis transport keeps separate lists for
+    PRIORITY_STEPS = list(range(10))
+
+    ROUTES = {
+        "core.results.tasks.analyze_food_image_task": Definitions.ANALYSIS,
+        "core.results.tasks.prune_analysis_result_cache": Definitions.BEATS,
+        "core.results.tasks.reconcile_stuck_analyses": Definitions.BEATS,
+        "core.results.tasks.recompute_portions_task": Definitions.ANALYSIS_BULK,
+        "core.recommendations.tasks.*": Definitions.RECOMMENDATIONS,
+        "core.utils.tasks.outbox.relay_outbox": Definitions.BEATS,
+        "core.utils.tasks.outbox.prune_outbox": Definitions.BEATS,
+        "*send_mail_async": Definitions.EMAIL_AND_NOTIFICATION,
+    }
+
     @staticmethod
-    def queues():
-        return tuple(
-            (Queue(getattr(CeleryQueue.Definitions, item)))
+    def names():
+        return [
+            getattr(CeleryQueue.Definitions, item)
             for item in filter(
                 lambda ref: not ref.startswith("_"), dir(CeleryQueue.Definitions)
             )
-        )
\ No newline at end of file
+        ]
+
+    @staticmethod
+    def queues():
+        return tuple(Queue(name) for name in CeleryQueue.names())
+
+    @staticmethod
+    def routes():
+        return {
+            pattern: {"queue": queue}
+            for pattern, queue in CeleryQueue.ROUTES.items()
+        }
@@ -297,17 +297,93 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_ACKS_LATE = True
 CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_QUEUES = CeleryQueue.queues()
+CELERY_TASK_ROUTES = CeleryQueue.routes()
+CELERY_TASK_DEFAULT_PRIORITY = CeleryQueue.Priority.DEFAULT
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": CeleryQueue.PRIORITY_STEPS,
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+# "threads" lets concurrent analyses share one process (needed by GEMINI_ASYNC_ENGINE
+# and ANALYSIS_BATCH_MAX_SIZE to have any effect)
+CELERY_WORKER_POOL = env.str("CELERY_WORKER_POOL", default="prefork")
+CELERY_WORKER_CONCURRENCY = env.int("CELERY_WORKER_CONCURRENCY", default=None)
 # CELERYD_PREFETCH_MULTIPLIER = 1\
 
+# Run food analysis Gemini calls on one asyncio loop per worker process, through
+# the SDK's async client. The interactive lane then becomes a threads pool of
+# GEMINI_ASYNC_MAX_IN_FLIGHT tasks, all multiplexed onto that loop.
+GEMINI_ASYNC_ENGINE = env.bool("GEMINI_ASYNC_ENGINE", default=False)
+GEMINI_ASYNC_MAX_IN_FLIGHT = env.int("GEMINI_ASYNC_MAX_IN_FLIGHT", default=32)
+GEMINI_ASYNC_TIMEOUT = env.int("GEMINI_ASYNC_TIMEOUT", default=120)
+
+# Worker lanes (see config/celery/lanes.py): which queues a worker consumes
+# and how eagerly. Interactive analysis prefetches one task at a time so a
+# slow Gemini call never holds queued uploads hostage.
+CELERY_WORKER_LANES = {
+    "interactive": {
+        "queues": [CeleryQueue.Definitions.ANALYSIS],
+        "concurrency": (
+            GEMINI_ASYNC_MAX_IN_FLIGHT if GEMINI_ASYNC_ENGINE
+            else env.int("CELERY_INTERACTIVE_CONCURRENCY", default=8)
+        ),
+        "prefetch_multiplier": 1,
+        "pool": "threads" if GEMINI_ASYNC_ENGINE else None,
+    },
+    "bulk": {
+        "queues": [CeleryQueue.Definitions.ANALYSIS_BULK],
+        "concurrency": env.int("CELERY_BULK_CONCURRENCY", default=2),
+        "prefetch_multiplier": 1,
+    },
+    "background": {
+        "queues": [
+            CeleryQueue.Definitions.BEATS,
+            CeleryQueue.Definitions.EMAIL_AND_NOTIFICATION,
+            CeleryQueue.Definitions.RECOMMENDATIONS,
+        ],
+        "concurrency": env.int("CELERY_BACKGROUND_CONCURRENCY", default=2),
+        "prefetch_multiplier": 4,
+    },
+    "all": {
+        "queues": CeleryQueue.names(),
+    },
+}
+
 CELERY_BEAT_SCHEDULE = {
     "generate-weekly-recommendations": {
         "task": "core.recommendations.tasks.generate_weekly_recommendations_for_all_users",
         "schedule": crontab(hour=6, minute=0, day_of_week=1),
-        "options": {"queue": "recommendations"},
+    },
+    "prune-analysis-result-cache": {
+        "task": "core.results.tasks.prune_analysis_result_cache",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "reconcile-stuck-analyses": {
+        "task": "core.results.tasks.reconcile_stuck_analyses",
+        "schedule": crontab(minute="*"),
+    },
+    "relay-outbox": {
+        "task": "core.utils.tasks.outbox.relay_outbox",
+        "schedule": timedelta(seconds=env.int("OUTBOX_RELAY_INTERVAL", default=10)),
+    },
+    "prune-outbox": {
+        "task": "core.utils.tasks.outbox.prune_outbox",
+        "schedule": crontab(hour=3, minute=30),
     },
 }
 
 
+# Transactional outbox (core.utils.helpers.outbox): messages published per relay
+# batch, publish attempts before a message is left for inspection (re-drive it
+# from the admin), and days dispatched messages are kept before pruning
+OUTBOX_BATCH_SIZE = env.int("OUTBOX_BATCH_SIZE", default=500)
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", default=10)
+OUTBOX_RETENTION_DAYS = env.int("OUTBOX_RETENTION_DAYS", default=7)
+# Seconds a relay holds the messages it is publishing; after that another
+# relay may pick them up, so keep it well above a batch's publish time
+OUTBOX_CLAIM_TIMEOUT = env.int("OUTBOX_CLAIM_TIMEOUT", default=60)
+
+
 REDIS_HOST = env.str("REDIS_HOST", default="localhost")
 REDIS_PORT = env.int("REDIS_PORT", default=6379)
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}"
@@ -365,6 +441,7 @@ if USING_MANAGED_STORAGE:
     AWS_S3_ENDPOINT_URL = "https://lon1.digitaloceanspaces.com"
     AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.lon1.digitaloceanspaces.com"
     AWS_QUERYSTRING_AUTH = False
+    AWS_S3_MAX_POOL_CONNECTIONS = env.int("DJANGO_AWS_S3_MAX_POOL_CONNECTIONS", 50)
     AWS_S3_OBJECT_PARAMETERS = {
         "CacheControl": "max-age=86400",
     }
@@ -378,5 +455,90 @@ if USING_MANAGED_STORAGE:
 
 GEMINI_API_KEY = env.str("GEMINI_API_KEY", default="**********")
 GEMINI_MODEL = env.str("GEMINI_MODEL", default="gemini-2.0-flash")
-
-USE_DOCS = env.bool("USE_DOCS", False)
\ No newline at end of file
+# Alternative API endpoint, e.g. the stand-in from `manage.py serve_gemini_standin`
+# for load testing without a Gemini key
+GEMINI_BASE_URL = env.str("GEMINI_BASE_URL", default="")
+
+# Gemini quota shared by all workers (see core.utils.services.quota)
+GEMINI_RATE_LIMIT_RPM = env.int("GEMINI_RATE_LIMIT_RPM", default=60)
+GEMINI_RATE_LIMIT_TPM = env.int("GEMINI_RATE_LIMIT_TPM", default=1_000_000)
+GEMINI_ESTIMATED_OUTPUT_TOKENS = env.int("GEMINI_ESTIMATED_OUTPUT_TOKENS", default=800)
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = env.int("GEMINI_CIRCUIT_FAILURE_THRESHOLD", default=5)
+GEMINI_CIRCUIT_RESET_TIMEOUT = env.int("GEMINI_CIRCUIT_RESET_TIMEOUT", default=30)
+GEMINI_THROTTLE_MAX_RETRIES = env.int("GEMINI_THROTTLE_MAX_RETRIES", default=20)
+# Gemini calls per structured request, including schema repair attempts
+GEMINI_STRUCTURED_MAX_ATTEMPTS = env.int("GEMINI_STRUCTURED_MAX_ATTEMPTS", default=2)
+
+# Seconds a worker holds an analysis before another may take it over; renewed
+# between pipeline stages, so it should exceed the slowest single stage
+ANALYSIS_LEASE_SECONDS = env.int("ANALYSIS_LEASE_SECONDS", default=300)
+# Expired leases recovered per reconciler run, and claims before an analysis is failed
+ANALYSIS_RECONCILE_BATCH_SIZE = env.int("ANALYSIS_RECONCILE_BATCH_SIZE", default=200)
+ANALYSIS_MAX_ATTEMPTS = env.int("ANALYSIS_MAX_ATTEMPTS", default=3)
+
+# Image preprocessing before inference (long edge in px, JPEG/WEBP, 1-100)
+ANALYSIS_IMAGE_MAX_EDGE = env.int("ANALYSIS_IMAGE_MAX_EDGE", default=1024)
+ANALYSIS_IMAGE_FORMAT = env.str("ANALYSIS_IMAGE_FORMAT", default="JPEG")
+ANALYSIS_IMAGE_QUALITY = env.int("ANALYSIS_IMAGE_QUALITY", default=85)
+ANALYSIS_IMAGE_CACHE_TTL = env.int("ANALYSIS_IMAGE_CACHE_TTL", default=60 * 60)
+
+# Analytics responses are cached per user and invalidated by a per-user data
+# version; the TTL only evicts entries left behind by older versions
+ANALYTICS_CACHE_TTL = env.int("ANALYTICS_CACHE_TTL", default=60 * 60 * 24)
+
+# Multi-image batching: concurrent analyses in one worker process share a
+# Gemini request. Needs a threaded pool (CELERY_WORKER_POOL=threads); workers
+# on a prefork or solo pool turn it off at startup. A batch size of 1 disables it.
+ANALYSIS_BATCH_MAX_SIZE = env.int("ANALYSIS_BATCH_MAX_SIZE", default=1)
+ANALYSIS_BATCH_MAX_WAIT_MS = env.int("ANALYSIS_BATCH_MAX_WAIT_MS", default=250)
+
+# Analysis engine: "gemini", or "local" for the CPU food-vision model
+# (see ai/model/food-vision). The local model runs in-process unless
+# FOOD_VISION_URL points at a `manage.py serve_food_vision` sidecar.
+ANALYSIS_ENGINE = env.str("ANALYSIS_ENGINE", default="gemini")
+FOOD_VISION_URL = env.str("FOOD_VISION_URL", default="")
+FOOD_VISION_MODEL_PATH = env.str(
+    "FOOD_VISION_MODEL_PATH", default=str(BASE_DIR / "models" / "food-vision" / "model.int8.onnx")
+)
+FOOD_VISION_LABELS_PATH = env.str(
+    "FOOD_VISION_LABELS_PATH", default=str(BASE_DIR / "models" / "food-vision" / "labels.json")
+)
+FOOD_VISION_THREADS = env.int("FOOD_VISION_THREADS", default=2)
+FOOD_VISION_BATCH_MAX_SIZE = env.int("FOOD_VISION_BATCH_MAX_SIZE", default=8)
+FOOD_VISION_BATCH_MAX_WAIT_MS = env.int("FOOD_VISION_BATCH_MAX_WAIT_MS", default=10)
+FOOD_VISION_TOP_K = env.int("FOOD_VISION_TOP_K", default=3)
+
+# Portion estimation from food-group segmentation (see ai/model/food-segmentation)
+FOOD_SEGMENTATION_ENABLED = env.bool("FOOD_SEGMENTATION_ENABLED", default=False)
+FOOD_SEGMENTATION_MODEL_PATH = env.str(
+    "FOOD_SEGMENTATION_MODEL_PATH", default=str(BASE_DIR / "models" / "food-segmentation" / "model.int8.onnx")
+)
+FOOD_SEGMENTATION_LABELS_PATH = env.str(
+    "FOOD_SEGMENTATION_LABELS_PATH", default=str(BASE_DIR / "models" / "food-segmentation" / "labels.json")
+)
+FOOD_SEGMENTATION_THREADS = env.int("FOOD_SEGMENTATION_THREADS", default=2)
+FOOD_SEGMENTATION_BATCH_MAX_SIZE = env.int("FOOD_SEGMENTATION_BATCH_MAX_SIZE", default=8)
+FOOD_SEGMENTATION_BATCH_MAX_WAIT_MS = env.int("FOOD_SEGMENTATION_BATCH_MAX_WAIT_MS", default=10)
+FOOD_SEGMENTATION_FRAME_AREA_CM2 = env.float("FOOD_SEGMENTATION_FRAME_AREA_CM2", default=40 * 30)
+PLATE_DIAMETER_CM = env.float("PLATE_DIAMETER_CM", default=26)
+
+# Nutrient values: "model" uses the analysis engine's estimates, "reference"
+# asks only for foods and portions and scales NutrientReference per-100 g values
+NUTRIENT_SOURCE = env.str("NUTRIENT_SOURCE", default="model")
+NUTRIENT_MATCH_MIN_SCORE = env.float("NUTRIENT_MATCH_MIN_SCORE", default=0.55)
+
+# Analysis result cache (seconds / max rows kept in the database tier)
+ANALYSIS_CACHE_TTL = env.int("ANALYSIS_CACHE_TTL", default=60 * 60 * 24 * 30)
+ANALYSIS_CACHE_MAX_ENTRIES = env.int("ANALYSIS_CACHE_MAX_ENTRIES", default=50000)
+# Redis-tier hits are buffered per process and written to the table this often
+ANALYSIS_CACHE_HIT_FLUSH_SECONDS = env.int("ANALYSIS_CACHE_HIT_FLUSH_SECONDS", default=60)
+
+# Near-duplicate food images (dHash bits / minutes between uploads).
+# Distances above 3 are not guaranteed to be found by the 4-band index.
+NEAR_DUPLICATE_MAX_DISTANCE = env.int("NEAR_DUPLICATE_MAX_DISTANCE", default=3)
+NEAR_DUPLICATE_WINDOW_MINUTES = env.int("NEAR_DUPLICATE_WINDOW_MINUTES", default=10)
+
+USE_DOCS = env.bool("USE_DOCS", False)
+
+# Bearer token required to scrape /metrics/
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
\ No newline at end of file
@@ -7,6 +7,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
+from core.utils.views import MetricsView
+
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -19,7 +21,8 @@ urlpatterns = [
     path("api/", include("core.file_storage.urls")),
     path("api/", include("core.results.urls")),
     path("api/", include("core.analytics.urls")),
-    path("api/", include("core.recommendations.urls"))
+    path("api/", include("core.recommendations.urls")),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
 
 if not settings.PRODUCTION:
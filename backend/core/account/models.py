@@ -70,12 +70,6 @@ class AccountManager(BaseUserManager):
     def with_food_groups_data(self, start_date=None, end_date=None):
         return self.get_queryset().with_food_groups_data(start_date=start_date, end_date=end_date)
 
-    def with_weekly_balance_score(self, start_date=None, end_date=None):
-        return self.get_queryset().with_weekly_balance_score(start_date=start_date, end_date=end_date)
-
-    def with_current_day_hourly_calories(self, target_date=None):
-        return self.get_queryset().with_current_day_hourly_calories(target_date=target_date)
-
 
 class Account(AbstractBaseUser, PermissionsMixin, BaseModelMixin):
     """Default account profiles for Balanced Plate backend"""
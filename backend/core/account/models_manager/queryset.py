@@ -4,7 +4,6 @@ from django.db.models import (
     F,
     Count,
     Sum,
-    Avg,
     FloatField,
     Value,
     ExpressionWrapper,
@@ -14,26 +13,29 @@ from django.db.models import (
 )
 from django.db.models.functions import Coalesce
 from decimal import Decimal
-from django.utils import timezone
-from datetime import timedelta
 
 from core.utils import enums
 
 
 class UserQuerySet(models.QuerySet):
 
+    @staticmethod
+    def rollup_date_filter(start_date=None, end_date=None):
+        date_filter = Q()
+        if start_date:
+            date_filter &= Q(nutrition_rollups__date__gte=start_date)
+        if end_date:
+            date_filter &= Q(nutrition_rollups__date__lte=end_date)
+        return date_filter
+
     def with_food_groups_data(self, start_date=None, end_date=None):
-        """Annotate grams and percentages of detected food groups."""
+        """Annotate grams and percentages of food groups from the daily rollups."""
 
         food_group_list = [
             member.name.lower() for member in enums.NutritionalContentType
         ]
 
-        date_filter = Q()
-        if start_date:
-            date_filter &= Q(food_analyses__date_added__date__gte=start_date)
-        if end_date:
-            date_filter &= Q(food_analyses__date_added__date__lte=end_date)
+        date_filter = self.rollup_date_filter(start_date, end_date)
 
         # grams annotations
         grams_annotations = {}
@@ -42,7 +44,7 @@ class UserQuerySet(models.QuerySet):
             if value == "calories":
                 grams_annotations[f"total_{value}"] = Coalesce(
                     Sum(
-                        f"food_analyses__detected_foods__{value}",
+                        f"nutrition_rollups__total_{value}",
                         filter=date_filter,
                     ),
                     Value(Decimal("0.00")),
@@ -51,7 +53,7 @@ class UserQuerySet(models.QuerySet):
             else:
                 grams_annotations[f"total_{value}_grams"] = Coalesce(
                     Sum(
-                        f"food_analyses__detected_foods__{value}",
+                        f"nutrition_rollups__total_{value}",
                         filter=date_filter,
                     ),
                     Value(Decimal("0.00")),
@@ -89,88 +91,11 @@ class UserQuerySet(models.QuerySet):
         return qs.annotate(**percent_annotations)
 
 
-    def with_weekly_balance_score(self, start_date=None, end_date=None):
-        """
-        Annotate average balance score for each day of the current week (Mon-Sun).
-        """
-        if start_date is None or end_date is None:
-            today = timezone.localdate()
-            start_date = today - timedelta(days=today.weekday())
-            end_date = start_date + timedelta(days=6)
-
-        day_map = {
-            "monday": 2,
-            "tuesday": 3,
-            "wednesday": 4,
-            "thursday": 5,
-            "friday": 6,
-            "saturday": 7,
-            "sunday": 1,
-        }
-
-        annotations = {
-            "avg_balance_score": Coalesce(
-                Avg(
-                    "food_analyses__balance_score",
-                    filter=Q(
-                        food_analyses__date_added__date__gte=start_date,
-                        food_analyses__date_added__date__lte=end_date,
-                    ),
-                ),
-                Value(0.0),
-                output_field=FloatField(),
-            ),
-        }
-
-        for day_name, day_num in day_map.items():
-            annotations[f"{day_name}_balance"] = Coalesce(
-                Avg(
-                    "food_analyses__balance_score",
-                    filter=Q(
-                        food_analyses__date_added__date__gte=start_date,
-                        food_analyses__date_added__date__lte=end_date,
-                        food_analyses__date_added__week_day=day_num,
-                    ),
-                ),
-                Value(0.0),
-                output_field=FloatField(),
-            )
-
-        return self.annotate(**annotations)
-
-    def with_current_day_hourly_calories(self, target_date=None):
-        """Annotate sum of calories for each hour (06:00–22:00) of a specific day.
-
-        Produces fields: h06_calories, h07_calories, ..., h22_calories
-        """
-        if target_date is None:
-            target_date = timezone.localdate()
-        
-        exprs = {}
-        for h in range(6, 23): 
-            field_name = f"h{h:02d}_calories"
-            exprs[field_name] = Coalesce(
-                Sum(
-                    "food_analyses__detected_foods__calories",
-                    filter=(
-                        Q(food_analyses__date_added__date=target_date) &
-                        Q(food_analyses__date_added__hour=h)
-                    ),
-                ),
-                Value(Decimal("0.00")),
-                output_field=DecimalField(max_digits=17, decimal_places=2),
-            )
-        return self.annotate(**exprs)
-    
     def with_meal_type_distribution(self, start_date=None, end_date=None):
         """
-        Annotate meal type counts and percentages.
+        Annotate meal type counts and percentages from the daily rollups.
         """
-        date_filter = Q()
-        if start_date:
-            date_filter &= Q(food_analyses__date_added__date__gte=start_date)
-        if end_date:
-            date_filter &= Q(food_analyses__date_added__date__lte=end_date)
+        date_filter = self.rollup_date_filter(start_date, end_date)
 
         meal_type_map = {
             member.name.lower(): member.value
@@ -178,18 +103,16 @@ class UserQuerySet(models.QuerySet):
         }
 
         count_annotations = {
-            "total_meals": Count(
-                "food_analyses",
-                filter=date_filter,
-                distinct=True,
+            "total_meals": Coalesce(
+                Sum("nutrition_rollups__meal_count", filter=date_filter),
+                Value(0),
             ),
         }
 
-        for key, value in meal_type_map.items():
-            count_annotations[f"{key}_count"] = Count(
-                "food_analyses",
-                filter=date_filter & Q(food_analyses__meal_type=value),
-                distinct=True,
+        for key in meal_type_map.keys():
+            count_annotations[f"{key}_count"] = Coalesce(
+                Sum(f"nutrition_rollups__{key}_count", filter=date_filter),
+                Value(0),
             )
 
         qs = self.annotate(**count_annotations)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from unfold.admin import ModelAdmin
+
+from .models import DailyNutritionRollup
+
+
+@admin.register(DailyNutritionRollup)
+class DailyNutritionRollupAdmin(ModelAdmin):
+    list_display = ["id", "owner", "date", "meal_count", "total_calories"]
+    list_filter = ["date"]
+    search_fields = ["owner__email", "owner__first_name"]
+    readonly_fields = [field.name for field in DailyNutritionRollup._meta.fields]
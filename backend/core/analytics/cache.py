@@ -0,0 +1,92 @@
+import hashlib
+import json
+import zlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from loguru import logger
+from rest_framework import response, status
+
+
+class AnalyticsCache:
+    """
+    Cached analytics responses, compressed in the shared cache.
+
+    Keys include a per-user data version that `bump` increments whenever the
+    user's analyses change, so a cached response is never served after the
+    data behind it moved on. The TTL only clears out entries of old versions.
+    """
+
+    KEY_PREFIX = "analytics"
+
+    @classmethod
+    def version_key(cls, user_id) -> str:
+        return f"{cls.KEY_PREFIX}:version:{user_id}"
+
+    @classmethod
+    def version(cls, user_id) -> int:
+        try:
+            return cache.get(cls.version_key(user_id), 0)
+        except Exception as e:
+            logger.warning(f"Analytics cache version read failed: {e}")
+            return 0
+
+    @classmethod
+    def bump(cls, user_id):
+        try:
+            cache.add(cls.version_key(user_id), 0, timeout=None)
+            cache.incr(cls.version_key(user_id))
+        except Exception as e:
+            logger.warning(f"Analytics cache version bump failed: {e}")
+
+    @classmethod
+    def make_key(cls, request, endpoint: str, view_kwargs: dict) -> str:
+        params = urlencode(sorted([*request.query_params.items(), *view_kwargs.items()]))
+        # date ranges such as "today" and "week" are relative to the local date
+        digest = hashlib.sha256(f"{timezone.localdate()}?{params}".encode()).hexdigest()[:32]
+        return f"{cls.KEY_PREFIX}:{request.user.id}:{cls.version(request.user.id)}:{endpoint}:{digest}"
+
+    @classmethod
+    def get(cls, key: str):
+        try:
+            payload = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Analytics cache read failed: {e}")
+            return None
+        return json.loads(zlib.decompress(payload)) if payload is not None else None
+
+    @classmethod
+    def set(cls, key: str, data):
+        payload = zlib.compress(json.dumps(data, cls=DjangoJSONEncoder).encode())
+        try:
+            cache.set(key, payload, timeout=settings.ANALYTICS_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Analytics cache write failed: {e}")
+
+    @classmethod
+    def cached(cls, endpoint: str):
+        """
+        Serve successful responses of a view method from the cache, keyed by
+        user, endpoint, query parameters and view kwargs.
+        """
+
+        def inner(function):
+            def function_to_execute(self, request, *args, **kwargs):
+                key = cls.make_key(request, endpoint, kwargs)
+                data = cls.get(key)
+                if data is not None:
+                    return response.Response(data, status=status.HTTP_200_OK)
+
+                result = function(self, request, *args, **kwargs)
+                if result.status_code == status.HTTP_200_OK:
+                    cls.set(key, result.data)
+                return result
+
+            function_to_execute.__name__ = function.__name__
+            function_to_execute.__doc__ = function.__doc__
+            return function_to_execute
+
+        return inner
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncDate
+
+from core.analytics.models import DailyNutritionRollup
+from core.results.models import FoodAnalysis
+from core.utils import enums
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily nutrition rollups from completed analyses, e.g. to backfill them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only rebuild these user ids")
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        analyses = FoodAnalysis.objects.filter(
+            analysis_status=enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value
+        )
+        rollups = DailyNutritionRollup.objects.all()
+        if options["user"]:
+            analyses = analyses.filter(owner_id__in=options["user"])
+            rollups = rollups.filter(owner_id__in=options["user"])
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be a YYYY-MM-DD date")
+            analyses = analyses.filter(date_added__date__gte=since)
+            rollups = rollups.filter(date__gte=since)
+
+        days = defaultdict(set)
+        for owner_id, day in (
+            analyses.annotate(day=TruncDate("date_added"))
+            .values_list("owner_id", "day")
+            .distinct()
+            .iterator()
+        ):
+            days[owner_id].add(day)
+
+        # days that no longer have any completed analysis
+        for owner_id, day in rollups.values_list("owner_id", "date").iterator():
+            days[owner_id].add(day)
+
+        for owner_id, owner_days in days.items():
+            with transaction.atomic():
+                DailyNutritionRollup.refresh(owner_id, owner_days)
+
+        self.stdout.write(
+            f"Rebuilt {sum(len(owner_days) for owner_days in days.values())} daily rollups "
+            f"for {len(days)} users"
+        )
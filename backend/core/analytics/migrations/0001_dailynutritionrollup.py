@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+                ('date_last_modified', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='Local Date')),
+                ('total_calories', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Calories')),
+                ('total_protein', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Protein (g)')),
+                ('total_carbs', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Carbohydrates (g)')),
+                ('total_fat', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Fat (g)')),
+                ('total_dairy', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Dairy (g)')),
+                ('total_vegetable', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Vegetable (g)')),
+                ('total_fruit', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Fruit (g)')),
+                ('micronutrients', models.JSONField(blank=True, default=dict, help_text="Summed micronutrients of the day's detected foods", verbose_name='Micronutrients')),
+                ('meal_count', models.PositiveIntegerField(default=0, verbose_name='Meals')),
+                ('breakfast_count', models.PositiveIntegerField(default=0, verbose_name='Breakfasts')),
+                ('lunch_count', models.PositiveIntegerField(default=0, verbose_name='Lunches')),
+                ('dinner_count', models.PositiveIntegerField(default=0, verbose_name='Dinners')),
+                ('snack_count', models.PositiveIntegerField(default=0, verbose_name='Snacks')),
+                ('balance_score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='Balance Score Sum')),
+                ('balance_score_count', models.PositiveIntegerField(default=0, verbose_name='Scored Meals')),
+                ('hourly_calories', models.JSONField(blank=True, default=list, help_text='24 calorie totals, one per local hour', verbose_name='Hourly Calories')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Owner')),
+            ],
+            options={
+                'verbose_name': 'Daily Nutrition Rollup',
+                'verbose_name_plural': 'Daily Nutrition Rollups',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'date'), name='unique_daily_rollup_per_owner')],
+            },
+        ),
+    ]
@@ -0,0 +1,177 @@
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from loguru import logger
+
+from core.utils.mixins import BaseModelMixin
+from core.utils import enums
+
+
+# (owner id, day) pairs waiting for the current transaction to commit
+_pending_refreshes = threading.local()
+
+
+class DailyNutritionRollup(BaseModelMixin):
+    """
+    Per-user totals of one local day of completed analyses, kept current as
+    analyses complete or are corrected so dashboards read a row per day
+    instead of aggregating the full meal history.
+    """
+
+    owner = models.ForeignKey(
+        to=get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="nutrition_rollups",
+        verbose_name=_("Owner")
+    )
+    date = models.DateField(_("Local Date"))
+    total_calories = models.DecimalField(_("Total Calories"), max_digits=12, decimal_places=2, default=0)
+    total_protein = models.DecimalField(_("Total Protein (g)"), max_digits=12, decimal_places=2, default=0)
+    total_carbs = models.DecimalField(_("Total Carbohydrates (g)"), max_digits=12, decimal_places=2, default=0)
+    total_fat = models.DecimalField(_("Total Fat (g)"), max_digits=12, decimal_places=2, default=0)
+    total_dairy = models.DecimalField(_("Total Dairy (g)"), max_digits=12, decimal_places=2, default=0)
+    total_vegetable = models.DecimalField(_("Total Vegetable (g)"), max_digits=12, decimal_places=2, default=0)
+    total_fruit = models.DecimalField(_("Total Fruit (g)"), max_digits=12, decimal_places=2, default=0)
+    micronutrients = models.JSONField(
+        _("Micronutrients"),
+        default=dict,
+        blank=True,
+        help_text=_("Summed micronutrients of the day's detected foods")
+    )
+    meal_count = models.PositiveIntegerField(_("Meals"), default=0)
+    breakfast_count = models.PositiveIntegerField(_("Breakfasts"), default=0)
+    lunch_count = models.PositiveIntegerField(_("Lunches"), default=0)
+    dinner_count = models.PositiveIntegerField(_("Dinners"), default=0)
+    snack_count = models.PositiveIntegerField(_("Snacks"), default=0)
+    balance_score_sum = models.DecimalField(_("Balance Score Sum"), max_digits=8, decimal_places=2, default=0)
+    balance_score_count = models.PositiveIntegerField(_("Scored Meals"), default=0)
+    hourly_calories = models.JSONField(
+        _("Hourly Calories"),
+        default=list,
+        blank=True,
+        help_text=_("24 calorie totals, one per local hour")
+    )
+
+    class Meta:
+        verbose_name = _("Daily Nutrition Rollup")
+        verbose_name_plural = _("Daily Nutrition Rollups")
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "date"], name="unique_daily_rollup_per_owner"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}-{self.date}"
+
+    # rollup column -> FoodAnalysis column it sums
+    TOTAL_FIELDS = {
+        "total_calories": "total_calories",
+        "total_protein": "total_protein",
+        "total_carbs": "total_carbs",
+        "total_fat": "total_fat",
+        "total_dairy": "total_dairy",
+        "total_vegetable": "total_vegetable",
+        "total_fruit": "total_fruit",
+    }
+    MEAL_TYPE_FIELDS = {
+        f"{member.name.lower()}_count": member.value for member in enums.MealType
+    }
+
+    @staticmethod
+    def day_bounds(day):
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+    @classmethod
+    def schedule_refresh(cls, owner_id, day):
+        """
+        Refresh a day once the current transaction commits. Days scheduled
+        repeatedly in one transaction, e.g. by a batch of food corrections or
+        a bulk delete, are refreshed once.
+        """
+        pending = getattr(_pending_refreshes, "days", None)
+        if pending is None:
+            pending = _pending_refreshes.days = set()
+        pending.add((owner_id, day))
+        transaction.on_commit(cls.refresh_pending)
+
+    @classmethod
+    def refresh_pending(cls):
+        pending, _pending_refreshes.days = getattr(_pending_refreshes, "days", None) or set(), set()
+        days = defaultdict(set)
+        for owner_id, day in pending:
+            days[owner_id].add(day)
+        for owner_id, owner_days in days.items():
+            try:
+                with transaction.atomic():
+                    cls.refresh(owner_id, owner_days)
+            except Exception as e:
+                # the analysis change is already committed; rebuild_nutrition_rollups repairs the day
+                logger.error(f"Failed to refresh nutrition rollups of user {owner_id}: {e}")
+
+    @classmethod
+    def refresh(cls, owner_id, days):
+        """
+        Recompute the rollups of `owner_id` for `days` from their completed
+        analyses. A day is small, so recomputing it keeps corrections,
+        retries and deletions exact without tracking deltas. Each day's row is
+        locked before it is aggregated, so concurrent refreshes of the same
+        day run one after the other and the last one sees every analysis.
+        Must run inside a transaction.
+        """
+        from core.analytics.cache import AnalyticsCache
+        from core.results.models import DetectedFood, FoodAnalysis
+        from core.results.schemas import MICRONUTRIENT_FIELDS
+        from core.utils.helpers.nutrients.aggregation import sum_micronutrients
+
+        # cached analytics responses of this user are stale once this commits
+        transaction.on_commit(lambda: AnalyticsCache.bump(owner_id))
+
+        # a fixed order, so two refreshes of overlapping days can't deadlock
+        for day in sorted(set(days)):
+            cls.objects.get_or_create(owner_id=owner_id, date=day)
+            rollup = cls.objects.select_for_update().get(owner_id=owner_id, date=day)
+
+            start, end = cls.day_bounds(day)
+            analyses = FoodAnalysis.objects.filter(
+                owner_id=owner_id,
+                analysis_status=enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value,
+                date_added__gte=start,
+                date_added__lt=end,
+            )
+            values = analyses.aggregate(
+                meal_count=Count("id"),
+                balance_score_sum=Sum("balance_score"),
+                balance_score_count=Count("balance_score"),
+                **{field: Sum(source) for field, source in cls.TOTAL_FIELDS.items()},
+                **{field: Count("id", filter=Q(meal_type=meal_type)) for field, meal_type in cls.MEAL_TYPE_FIELDS.items()},
+            )
+            if not values["meal_count"]:
+                rollup.delete()
+                continue
+
+            hourly_calories = [0.0] * 24
+            for row in (
+                analyses.annotate(hour=ExtractHour("date_added"))
+                .values("hour")
+                .annotate(calories=Sum("total_calories"))
+            ):
+                hourly_calories[row["hour"]] = float(row["calories"] or 0)
+
+            micronutrients = sum_micronutrients(
+                DetectedFood.objects.filter(analysis__in=analyses), MICRONUTRIENT_FIELDS
+            )
+
+            for key, value in values.items():
+                setattr(rollup, key, value if value is not None else Decimal(0))
+            rollup.hourly_calories = hourly_calories
+            rollup.micronutrients = {key: round(value, 2) for key, value in micronutrients.items()}
+            rollup.save()
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 
 
+class WeeklyBalanceSerializer(serializers.Serializer):
+    week_start = serializers.DateField()
+    scores = serializers.ListField(child=serializers.FloatField())
+
+
 class NutritionAnalyticsSerializer:
     class FoodGroupGrams(serializers.Serializer):
         total_carbs_grams = serializers.IntegerField()
@@ -27,9 +32,17 @@ class NutritionAnalyticsSerializer:
         friday_balance = serializers.FloatField()
         saturday_balance = serializers.FloatField()
         sunday_balance = serializers.FloatField()
+        average = serializers.FloatField()
+        weeks = WeeklyBalanceSerializer(many=True)
 
 
 class HourlyCaloriesSerializer(serializers.Serializer):
+    h00_calories = serializers.FloatField()
+    h01_calories = serializers.FloatField()
+    h02_calories = serializers.FloatField()
+    h03_calories = serializers.FloatField()
+    h04_calories = serializers.FloatField()
+    h05_calories = serializers.FloatField()
     h06_calories = serializers.FloatField()
     h07_calories = serializers.FloatField()
     h08_calories = serializers.FloatField()
@@ -47,6 +60,11 @@ class HourlyCaloriesSerializer(serializers.Serializer):
     h20_calories = serializers.FloatField()
     h21_calories = serializers.FloatField()
     h22_calories = serializers.FloatField()
+    h23_calories = serializers.FloatField()
+    weekly_heatmap = serializers.ListField(
+        child=serializers.ListField(child=serializers.FloatField()),
+        help_text="Calories per weekday (Monday first) and hour over the selected range",
+    )
 
 
 class MicronutrientItemSerializer(serializers.Serializer):
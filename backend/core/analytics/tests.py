@@ -0,0 +1,221 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import threading
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from core.account.models import Account
+from core.file_storage.models import FileModel
+from core.results.models import FoodAnalysis
+from core.utils import enums
+from core.utils.helpers.analytics import UserDashboardAnalyticsHelper
+from .models import DailyNutritionRollup
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class RollupTestCase(TestCase):
+    """Completes analyses the way a worker does, with on-commit work executed."""
+
+    def setUp(self):
+        self.user = Account.objects.create_user("rollup@example.com", "Rollup", "Test", "password")
+        self.today = timezone.localdate()
+
+    def at(self, day, hour: int):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def complete(self, when, calories=500, balance_score=0.8, meal_type=enums.MealType.LUNCH.value, micronutrients=None):
+        """Run an analysis through claim and save_result as a worker would, dated `when`."""
+        file_obj = FileModel.objects.create(owner=self.user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+        analysis = FoodAnalysis.objects.create(owner=self.user, food_image=file_obj)
+        FoodAnalysis.objects.filter(id=analysis.id).update(date_added=when)
+
+        claimed = FoodAnalysis.claim(file_obj.id, "worker-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            claimed.save_result({
+                "meal_type": meal_type,
+                "balance_score": balance_score,
+                "detected_foods": [{
+                    "name": "Jollof Rice",
+                    "nutritional_info": {"calories": calories, "protein": 10, "carbs": 60, "fat": 12},
+                    "micronutrients": micronutrients or {"iron": 2.5},
+                }],
+            }, lease_owner="worker-1")
+        return claimed
+
+    def rollup(self, day=None) -> DailyNutritionRollup:
+        return DailyNutritionRollup.objects.get(owner=self.user, date=day or self.today)
+
+
+class DailyNutritionRollupTests(RollupTestCase):
+    """Rollups follow completions, corrections and deletions of a day's analyses."""
+
+    def test_completed_analyses_are_rolled_up(self):
+        self.complete(self.at(self.today, 8), calories=300, balance_score=0.7, meal_type=enums.MealType.BREAKFAST.value)
+        self.complete(self.at(self.today, 13), calories=700, balance_score=0.9, micronutrients={"iron": 1, "zinc": 4})
+
+        rollup = self.rollup()
+        self.assertEqual(rollup.meal_count, 2)
+        self.assertEqual(rollup.breakfast_count, 1)
+        self.assertEqual(rollup.lunch_count, 1)
+        self.assertEqual(rollup.total_calories, Decimal("1000"))
+        self.assertEqual(rollup.total_carbs, Decimal("120"))
+        self.assertEqual(rollup.balance_score_sum, Decimal("1.6"))
+        self.assertEqual(rollup.balance_score_count, 2)
+        self.assertEqual(rollup.hourly_calories[8], 300)
+        self.assertEqual(rollup.hourly_calories[13], 700)
+        self.assertEqual(sum(rollup.hourly_calories), 1000)
+        self.assertEqual(rollup.micronutrients["iron"], 3.5)
+        self.assertEqual(rollup.micronutrients["zinc"], 4)
+
+    def test_unfinished_analyses_are_not_counted(self):
+        self.complete(self.at(self.today, 8))
+        file_obj = FileModel.objects.create(owner=self.user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+        FoodAnalysis.objects.create(owner=self.user, food_image=file_obj)
+        with self.captureOnCommitCallbacks(execute=True):
+            DailyNutritionRollup.schedule_refresh(self.user.id, self.today)
+
+        self.assertEqual(self.rollup().meal_count, 1)
+
+    def test_corrections_update_the_day(self):
+        analysis = self.complete(self.at(self.today, 8), calories=300)
+        food = analysis.detected_foods.get()
+        food.calories = 450
+
+        with self.captureOnCommitCallbacks(execute=True):
+            food.save()
+
+        self.assertEqual(self.rollup().total_calories, Decimal("450"))
+        self.assertEqual(self.rollup().hourly_calories[8], 450)
+
+    def test_deleting_analyses_updates_or_removes_the_day(self):
+        first = self.complete(self.at(self.today, 8), calories=300)
+        self.complete(self.at(self.today, 13), calories=700)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.rollup().total_calories, Decimal("700"))
+
+        # queryset deletes never call FoodAnalysis.delete
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodAnalysis.objects.filter(owner=self.user).delete()
+        self.assertFalse(DailyNutritionRollup.objects.filter(owner=self.user).exists())
+
+    def test_days_are_refreshed_once_per_transaction(self):
+        yesterday = self.today - timedelta(days=1)
+        with mock.patch.object(DailyNutritionRollup, "refresh") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for day in (self.today, yesterday, self.today):
+                    DailyNutritionRollup.schedule_refresh(self.user.id, day)
+
+        refresh.assert_called_once_with(self.user.id, {self.today, yesterday})
+
+
+class DashboardAnalyticsTests(RollupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.helper = UserDashboardAnalyticsHelper(self.user)
+        self.monday = self.today - timedelta(days=self.today.weekday())
+
+    def test_hourly_calories_are_dense(self):
+        self.complete(self.at(self.today, 7), calories=250)
+        self.complete(self.at(self.today, 19), calories=600)
+
+        hourly = self.helper.get_hourly_calories()
+
+        self.assertEqual(
+            [key for key in hourly if key != "weekly_heatmap"],
+            [f"h{hour:02d}_calories" for hour in range(24)],
+        )
+        self.assertEqual(hourly["h07_calories"], 250)
+        self.assertEqual(hourly["h19_calories"], 600)
+        self.assertEqual(hourly["h12_calories"], 0)
+        self.assertEqual(len(hourly["weekly_heatmap"]), 7)
+        self.assertTrue(all(len(day) == 24 for day in hourly["weekly_heatmap"]))
+        self.assertEqual(hourly["weekly_heatmap"][self.today.weekday()][19], 600)
+
+    def test_hourly_calories_without_meals(self):
+        hourly = self.helper.get_hourly_calories()
+
+        self.assertEqual(sum(value for key, value in hourly.items() if key != "weekly_heatmap"), 0)
+        self.assertEqual(hourly["weekly_heatmap"], [[0.0] * 24 for _ in range(7)])
+
+    def test_weekday_balance_scores_are_dense(self):
+        self.complete(self.at(self.monday, 8), balance_score=0.6)
+        self.complete(self.at(self.monday, 13), balance_score=0.8)
+        self.complete(self.at(self.monday + timedelta(days=2), 13), balance_score=0.9)
+
+        scores = self.helper.get_weekday_balance_scores()
+
+        self.assertEqual(scores["scores"], [0.7, 0.0, 0.9, 0.0, 0.0, 0.0, 0.0])
+        self.assertEqual(scores["average"], round((0.6 + 0.8 + 0.9) / 3, 2))
+        self.assertEqual(len(scores["weeks"]), 1)
+        self.assertEqual(scores["weeks"][0]["week_start"], self.monday)
+
+    def test_weekday_balance_scores_over_several_weeks(self):
+        self.complete(self.at(self.monday - timedelta(weeks=2), 8), balance_score=0.5)
+        self.complete(self.at(self.monday, 8), balance_score=0.7)
+
+        scores = self.helper.get_weekday_balance_scores(weeks=3)
+
+        self.assertEqual(
+            [week["week_start"] for week in scores["weeks"]],
+            [self.monday - timedelta(weeks=2), self.monday - timedelta(weeks=1), self.monday],
+        )
+        self.assertEqual([week["scores"][0] for week in scores["weeks"]], [0.5, 0.0, 0.7])
+        self.assertEqual(scores["scores"][0], 0.6)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentRollupTests(TransactionTestCase):
+    """
+    Analyses completing at the same time on different workers. Needs row
+    locks, so it is skipped on SQLite, which locks whole tables instead.
+    """
+
+    def test_two_completions_on_the_same_day_are_both_counted(self):
+        user = Account.objects.create_user("race@example.com", "Race", "Test", "password")
+        claimed = []
+        for worker in ("worker-1", "worker-2"):
+            file_obj = FileModel.objects.create(owner=user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+            FoodAnalysis.objects.create(owner=user, food_image=file_obj)
+            claimed.append(FoodAnalysis.claim(file_obj.id, worker))
+        barrier = threading.Barrier(2)
+        errors = []
+
+        def finish(analysis, calories):
+            try:
+                barrier.wait(timeout=5)
+                analysis.save_result({
+                    "meal_type": enums.MealType.LUNCH.value,
+                    "balance_score": 0.8,
+                    "detected_foods": [{"name": "Rice", "nutritional_info": {"calories": calories}}],
+                }, lease_owner=analysis.lease_owner)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=finish, args=(analysis, calories))
+            for analysis, calories in zip(claimed, (300, 500))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        self.assertEqual(errors, [])
+        rollup = DailyNutritionRollup.objects.get(owner=user, date=timezone.localdate(claimed[0].date_added))
+        self.assertEqual(rollup.meal_count, 2)
+        self.assertEqual(rollup.total_calories, Decimal("800"))
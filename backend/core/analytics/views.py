@@ -12,6 +12,7 @@ from core.analytics.serializers import (
 	HourlyCaloriesSerializer
 )
 from core.account.models import Account
+from core.analytics.cache import AnalyticsCache
 from core.results.models import FoodAnalysis, DetectedFood
 from django.db.models import Sum, Count
 from django.db.models.functions import TruncDate
@@ -56,8 +57,6 @@ class NutritionAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
         
         if self.action in ["food_classes", "distribution"]:
             qs = self.queryset.with_food_groups_data(start_date=start_date, end_date=end_date)
-        elif self.action == "balance_score":
-            qs = self.queryset.with_weekly_balance_score(start_date=start_date, end_date=end_date)
         else:
             qs = self.queryset.all()
         return qs
@@ -78,6 +77,7 @@ class NutritionAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
 		responses={200: NutritionAnalyticsSerializer.FoodGroupGrams},
 	)
     @action(detail=True, methods=["get"], url_path="food-group-grams")
+    @AnalyticsCache.cached("food-group-grams")
     def food_classes(self, request, pk):
         """Returns grams of foods per food group."""
         if request.user.id != int(pk):
@@ -103,6 +103,7 @@ class NutritionAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
 		responses={200: NutritionAnalyticsSerializer.FoodGroupPercentage},
 	)
     @action(detail=True, methods=["get"], url_path="food-group-percentage")
+    @AnalyticsCache.cached("food-group-percentage")
     def distribution(self, request, pk):
         """Returns percentage distribution of food groups."""
         if request.user.id != int(pk):
@@ -123,27 +124,41 @@ class NutritionAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
         return response.Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
-		description="Get weekly balance scores for the authenticated user",
+		description=(
+			"Get average balance scores per weekday for the authenticated user. "
+			"Pass `weeks=N` to get the last N weeks side by side."
+		),
 		responses={200: NutritionAnalyticsSerializer.DailyBalanceScore},
 	)
     @action(detail=True, methods=["get"], url_path="daily-balance-score")
+    @AnalyticsCache.cached("daily-balance-score")
     def balance_score(self, request, pk):
-        """Returns balance scores for each day of the current week."""
+        """Returns balance scores for each weekday of the selected range."""
         if request.user.id != int(pk):
             logger.error("Permission Denied")
             raise exceptions.CustomException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 message="action not allowed"
             )
-        
-        user = self.get_object()
-        if not user:
-            logger.error(f"Not Found: User with id {pk} does not exist.")
-            raise exceptions.CustomException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                message="User not found."
-            )
-        serializer = NutritionAnalyticsSerializer.DailyBalanceScore(instance=user)
+
+        weeks = request.query_params.get("weeks")
+        if weeks is not None:
+            if not weeks.isdigit() or not 1 <= int(weeks) <= 52:
+                raise exceptions.CustomException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    message="weeks must be a number between 1 and 52."
+                )
+            weeks = int(weeks)
+
+        start_date, end_date = self.get_date_range()
+        helper = analytics.UserDashboardAnalyticsHelper(request.user)
+        balance = helper.get_weekday_balance_scores(
+            start_date=start_date, end_date=end_date, weeks=weeks
+        )
+        for day, score in zip(helper.WEEKDAYS, balance["scores"]):
+            balance[f"{day}_balance"] = score
+
+        serializer = NutritionAnalyticsSerializer.DailyBalanceScore(instance=balance)
         return response.Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -156,6 +171,7 @@ class MicronutrientsAnalyticsView(views.APIView):
 		description="Micronutrients percentages for the authenticated user",
 		responses={200: MicronutrientsAnalyticsSerializer},
 	)
+	@AnalyticsCache.cached("micronutrients")
 	def get(self, request):
 
 		helper = analytics.UserDashboardAnalyticsHelper(request.user)
@@ -171,18 +187,19 @@ class MealTimingAnalyticsView(views.APIView):
 		description="Meal timing distribution and calory totals for the authenticated user",
 		responses={200: HourlyCaloriesSerializer},
 	)
+	@AnalyticsCache.cached("meal-timing")
 	def get(self, request):
 		date_range = request.query_params.get('range', 'today')
 		start_date, end_date = get_date_range_from_filter(date_range)
 		
-		# For meal timing, we use the target date (end_date or today)
+		# hourly totals are for the target date (end_date or today),
+		# the weekday heatmap covers the whole range
 		target_date = end_date if end_date else timezone.localdate()
-		
-		user = (
-			Account.objects
-			.filter(id=request.user.id)
-			.with_current_day_hourly_calories(target_date=target_date)
-		).first()
-		serializer = HourlyCaloriesSerializer(instance=user)
+
+		helper = analytics.UserDashboardAnalyticsHelper(request.user)
+		result = helper.get_hourly_calories(
+			target_date=target_date, start_date=start_date, end_date=end_date
+		)
+		serializer = HourlyCaloriesSerializer(instance=result)
 
 		return response.Response(serializer.data, status=status.HTTP_200_OK)
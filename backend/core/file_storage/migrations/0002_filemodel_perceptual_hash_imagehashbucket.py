@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_storage', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filemodel',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, editable=False, help_text='64-bit dHash of the image, hex encoded', max_length=16, null=True, verbose_name='Perceptual Hash'),
+        ),
+        migrations.CreateModel(
+            name='ImageHashBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveIntegerField(verbose_name='Hash Band Bucket')),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hash_buckets', to='file_storage.filemodel')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_hash_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Image Hash Bucket',
+                'verbose_name_plural': 'Image Hash Buckets',
+                'indexes': [models.Index(fields=['owner', 'bucket'], name='file_storag_owner_i_08c4b2_idx')],
+            },
+        ),
+    ]
@@ -1,14 +1,18 @@
 import mimetypes
 import os
 import uuid
+from datetime import timedelta
+from typing import Optional
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core.utils.mixins import BaseModelMixin
 from core.utils.enums import FilePurposeType
+from core.utils.helpers import images
  
 
 
@@ -87,6 +91,14 @@ class FileModel(BaseModelMixin):
         max_length=500,
         editable=False,
     )
+    perceptual_hash = models.CharField(
+        _("Perceptual Hash"),
+        null=True,
+        blank=True,
+        max_length=16,
+        editable=False,
+        help_text=_("64-bit dHash of the image, hex encoded"),
+    )
   
 
     @property
@@ -115,3 +127,76 @@ class FileModel(BaseModelMixin):
 
     def __str__(self):
         return str(self.id)
+
+    def index_perceptual_hash(self, value: Optional[int]) -> Optional[int]:
+        """
+        Register the upload's dHash, computed with `images.compute_dhash`, in
+        the owner's bucket index.
+        """
+        if value is None:
+            return None
+
+        self.perceptual_hash = f"{value:016x}"
+        self.save(update_fields=["perceptual_hash"])
+        ImageHashBucket.objects.bulk_create([
+            ImageHashBucket(owner_id=self.owner_id, file=self, bucket=bucket)
+            for bucket in images.hash_bands(value)
+        ])
+        return value
+
+    def get_near_duplicate_ids(self) -> list[str]:
+        """
+        Return ids of the owner's recent files whose perceptual hash is within
+        NEAR_DUPLICATE_MAX_DISTANCE bits of this one, closest first.
+        """
+        if not self.perceptual_hash:
+            return []
+
+        value = int(self.perceptual_hash, 16)
+        since = timezone.now() - timedelta(minutes=settings.NEAR_DUPLICATE_WINDOW_MINUTES)
+        candidates = (
+            FileModel.objects
+            .filter(
+                hash_buckets__owner_id=self.owner_id,
+                hash_buckets__bucket__in=images.hash_bands(value),
+                date_added__gte=since,
+            )
+            .exclude(id=self.id)
+            .values_list("id", "perceptual_hash")
+            .distinct()
+        )
+
+        matches = []
+        for file_id, perceptual_hash in candidates:
+            distance = images.hamming_distance(value, int(perceptual_hash, 16))
+            if distance <= settings.NEAR_DUPLICATE_MAX_DISTANCE:
+                matches.append((distance, file_id))
+        return [file_id for _, file_id in sorted(matches)]
+
+
+class ImageHashBucket(models.Model):
+    """
+    Per-user banded index over `FileModel.perceptual_hash` used to find
+    near-identical images without scanning all of a user's uploads.
+    """
+    owner = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name="image_hash_buckets",
+    )
+    file = models.ForeignKey(
+        FileModel,
+        on_delete=models.CASCADE,
+        related_name="hash_buckets",
+    )
+    bucket = models.PositiveIntegerField(_("Hash Band Bucket"))
+
+    class Meta:
+        verbose_name = _("Image Hash Bucket")
+        verbose_name_plural = _("Image Hash Buckets")
+        indexes = [
+            models.Index(fields=["owner", "bucket"]),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id}-{self.bucket}"
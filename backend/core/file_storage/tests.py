@@ -1,3 +1,77 @@
+import io
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from PIL import Image
+
+from core.account.models import Account
+from core.results.models import FoodAnalysis
+from core.utils import enums
+from core.utils.helpers import images
+from .models import FileModel, ImageHashBucket
+
+
+class NearDuplicateLookupTests(TestCase):
+    """The banded hash index narrows candidates before comparing full hashes."""
+
+    def setUp(self):
+        self.user = Account.objects.create_user("hash@example.com", "Hash", "Test", "password")
+
+    def upload(self, perceptual_hash: int, owner=None) -> FileModel:
+        """A food image indexed under `perceptual_hash`, without decoding a real upload."""
+        owner = owner or self.user
+        file_obj = FileModel.objects.create(owner=owner, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+        file_obj.perceptual_hash = f"{perceptual_hash:016x}"
+        file_obj.save(update_fields=["perceptual_hash"])
+        ImageHashBucket.objects.bulk_create([
+            ImageHashBucket(owner_id=owner.id, file=file_obj, bucket=bucket)
+            for bucket in images.hash_bands(perceptual_hash)
+        ])
+        return file_obj
+
+    def test_index_perceptual_hash_registers_every_band(self):
+        buffer = io.BytesIO()
+        Image.linear_gradient("L").convert("RGB").save(buffer, "JPEG")
+        file_obj = FileModel.objects.create(owner=self.user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+
+        value = file_obj.index_perceptual_hash(images.compute_dhash(buffer))
+
+        self.assertEqual(file_obj.perceptual_hash, f"{value:016x}")
+        self.assertCountEqual(
+            ImageHashBucket.objects.filter(file=file_obj).values_list("bucket", flat=True),
+            images.hash_bands(value),
+        )
+
+    def test_finds_close_hashes_closest_first(self):
+        value = 0x0123456789ABCDEF
+        upload = self.upload(value)
+        two_bits = self.upload(value ^ 0b11)
+        one_bit = self.upload(value ^ (1 << 40))
+        self.upload(value ^ 0xF0F0)
+        self.upload(~value & (2 ** 64 - 1))
+
+        self.assertEqual(upload.get_near_duplicate_ids(), [one_bit.id, two_bits.id])
+
+    def test_ignores_other_owners_and_old_uploads(self):
+        value = 0x0123456789ABCDEF
+        upload = self.upload(value)
+        other = Account.objects.create_user("other@example.com", "Other", "Test", "password")
+        self.upload(value, owner=other)
+        old = self.upload(value)
+        FileModel.objects.filter(id=old.id).update(date_added=timezone.now() - timedelta(days=1))
+
+        self.assertEqual(upload.get_near_duplicate_ids(), [])
+
+    def test_completed_analysis_of_a_near_duplicate_is_reused(self):
+        value = 0x0123456789ABCDEF
+        pending = self.upload(value ^ 1)
+        completed = self.upload(value ^ 2)
+        FoodAnalysis.objects.create(owner=self.user, food_image=pending)
+        source = FoodAnalysis.objects.create(
+            owner=self.user,
+            food_image=completed,
+            analysis_status=enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value,
+        )
 
-# Create your tests here.
+        self.assertEqual(FoodAnalysis.get_completed_near_duplicate(self.upload(value)), source)
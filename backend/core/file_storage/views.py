@@ -2,6 +2,7 @@
 import mimetypes
 import threading
 
+from django.db import transaction
 from drf_spectacular.utils import extend_schema
 from loguru import logger
 from rest_framework import response, status, views
@@ -50,18 +51,38 @@ class ListCreateFile(PaginationMixin, views.APIView):
         analysis_id = None
         if file_obj.purpose == enums.FilePurposeType.FOOD_IMAGE.value:
             from core.results.tasks import analyze_food_image_task
+            from config.celery.queue import CeleryQueue
             from core.results.models import FoodAnalysis
-            
-            # Create the analysis record first
-            analysis = FoodAnalysis.objects.create(
-                owner=file_obj.owner,
-                food_image=file_obj,
-            )
-            analysis_id = analysis.id
-            
-            # Trigger async analysis task
-            analyze_food_image_task.delay(str(file_obj.id), use_mock=False)
-            logger.info(f"Auto-triggered food analysis for file {file_obj.id}")
+            from core.utils.helpers import images, outbox
+
+            # decode the upload before taking any locks
+            perceptual_hash = images.compute_dhash(file)
+
+            # the analysis row and its task are committed together, so the
+            # worker never starts before the row exists
+            with transaction.atomic():
+                analysis = FoodAnalysis.objects.create(
+                    owner=file_obj.owner,
+                    food_image=file_obj,
+                )
+                analysis_id = analysis.id
+
+                # Serve near-identical shots of the same plate from the earlier analysis
+                file_obj.index_perceptual_hash(perceptual_hash)
+                source_analysis = FoodAnalysis.get_completed_near_duplicate(file_obj)
+                if source_analysis:
+                    analysis.copy_result_from(source_analysis)
+                    logger.info(
+                        f"Reused analysis {source_analysis.id} for near-duplicate file {file_obj.id}"
+                    )
+                else:
+                    outbox.enqueue_task(
+                        analyze_food_image_task,
+                        args=[str(file_obj.id)],
+                        kwargs={"use_mock": False},
+                        priority=CeleryQueue.Priority.INTERACTIVE,
+                    )
+                    logger.info(f"Auto-triggered food analysis for file {file_obj.id}")
         
         serializer = serializers.FileSerializer.ListRetrieve(instance=file_obj)
         response_data = serializer.data
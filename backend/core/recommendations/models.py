@@ -1,11 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
 from core.utils.mixins import BaseModelMixin
 from core.utils import enums
-from core.websocket.utils import emit_websocket_event
+from core.websocket.utils import queue_websocket_event
 
 
 class WeeklyRecommendation(BaseModelMixin):  
@@ -139,21 +139,23 @@ class WeeklyRecommendation(BaseModelMixin):
             return
         self.is_read = True
         self.read_at = timezone.now()
-        self.save()
-        emit_websocket_event(
-            self, enums.RecommendationEventType.RECOMMENDATION_READ.value
-        )
+        with transaction.atomic():
+            self.save(update_fields=["is_read", "read_at", "date_last_modified"])
+            queue_websocket_event(
+                self, enums.RecommendationEventType.RECOMMENDATION_READ.value
+            )
 
     def emit_ready_event(self):
-        emit_websocket_event(
-            self, enums.RecommendationEventType.RECOMMENDATION_READY.value
-        )
         self.notification_sent = True
         self.notification_sent_at  = timezone.now()
-        self.save(update_fields=[
-            "notification_sent", 
-            "notification_sent_at"
-        ])
+        with transaction.atomic():
+            queue_websocket_event(
+                self, enums.RecommendationEventType.RECOMMENDATION_READY.value
+            )
+            self.save(update_fields=[
+                "notification_sent", 
+                "notification_sent_at"
+            ])
 
 
     class Meta:
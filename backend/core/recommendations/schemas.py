@@ -0,0 +1,39 @@
+"""
+Response contract for weekly recommendations, used both as the Gemini
+`response_schema` and to validate its replies.
+"""
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class HealthReport(BaseModel):
+    summary: str = Field(description="2-3 sentence overall assessment of the week's nutrition")
+    strengths: List[str] = Field(description="Strengths supported by the data")
+    areas_for_improvement: List[str] = Field(description="Areas that need attention")
+    balance_assessment: str = Field(description="Assessment of overall dietary balance based on the balance scores")
+
+
+class Recommendations(BaseModel):
+    nutrition_recommendations: List[str] = Field(
+        description="Actionable advice on macro intake, nutritional gaps and macro balance"
+    )
+    meal_timing_recommendations: List[str] = Field(
+        description="Advice based on meal type distribution, timing patterns and frequency"
+    )
+    micronutrient_recommendations: List[str] = Field(
+        description="Advice on low micronutrients and foods rich in them"
+    )
+    weekly_meal_plan_suggestions: List[str] = Field(
+        description="Day-specific meal suggestions, especially for low-balance days"
+    )
+    lifestyle_recommendations: List[str] = Field(
+        description="Holistic suggestions for sustainable eating habits"
+    )
+
+
+class WeeklyRecommendationResult(BaseModel):
+    health_report: HealthReport
+    recommendations: Recommendations
+    priority_actions: List[str] = Field(description="The three most important actions, in priority order")
+    weekly_goals: List[str] = Field(description="Three specific, measurable goals for the upcoming week")
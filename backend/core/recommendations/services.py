@@ -5,8 +5,9 @@ from loguru import logger
 
 from .mock import get_mock_weekly_recommendation
 from core.utils.helpers.recommendations import WeeklyRecommendationHelper
-from core.utils.services import GeminiBaseService
+from core.utils.services import GeminiBaseService, GeminiUnavailable
 from .models import WeeklyRecommendation
+from .schemas import WeeklyRecommendationResult
 from core.utils import enums
 
 
@@ -16,57 +17,9 @@ Based on the following weekly nutrition data, provide a comprehensive health rep
 USER'S WEEKLY NUTRITION DATA:
 {input_data}
 
-Please analyze this data and provide a response in the following JSON format:
-{{
-    "health_report": {{
-        "summary": "A 2-3 sentence overall assessment of the user's weekly nutrition",
-        "strengths": [
-            "Strength 1 based on the data",
-            "Strength 2 based on the data"
-        ],
-        "areas_for_improvement": [
-            "Area 1 that needs attention",
-            "Area 2 that needs attention"
-        ],
-        "balance_assessment": "Assessment of their overall dietary balance based on the balance_score"
-    }},
-    "recommendations": {{
-        "nutrition_recommendations": [
-            "Specific actionable recommendation based on their macro intake",
-            "Recommendation to address any nutritional gaps",
-            "Recommendation for optimal macro balance"
-        ],
-        "meal_timing_recommendations": [
-            "Recommendation based on their meal type distribution",
-            "Suggestion for improving meal timing patterns",
-            "Advice on meal frequency and timing"
-        ],
-        "micronutrient_recommendations": [
-            "Recommendation to address low micronutrient levels",
-            "Suggestion for foods rich in lacking micronutrients",
-            "Advice on micronutrient balance"
-        ],
-        "weekly_meal_plan_suggestions": [
-            "Day-specific meal suggestion to improve balance",
-            "Suggestion for days with low balance scores",
-            "General weekly planning advice"
-        ],
-        "lifestyle_recommendations": [
-            "Holistic health recommendation based on eating patterns",
-            "Suggestion for sustainable dietary habits"
-        ]
-    }},
-    "priority_actions": [
-        "Most important action to take this week",
-        "Second priority action",
-        "Third priority action"
-    ],
-    "weekly_goals": [
-        "Specific measurable goal for the upcoming week",
-        "Second weekly goal",
-        "Third weekly goal"
-    ]
-}}
+Analyze this data and write a health report, personalized recommendations,
+the three most important actions to take, and three measurable goals for the
+upcoming week.
 
 Guidelines:
 - Be specific and actionable in all recommendations
@@ -75,8 +28,6 @@ Guidelines:
 - Provide realistic, achievable suggestions
 - Keep recommendations concise (one-liner bullet points)
 - Focus on gradual improvement rather than drastic changes
-
-Return ONLY valid JSON, no additional text.
 """
 
 class WeeklyRecommendationService(GeminiBaseService):
@@ -102,11 +53,11 @@ class WeeklyRecommendationService(GeminiBaseService):
             defaults={
                 "week_end_date": helper.end_date,
                 "input_data": input_data,
-                "status": "processing",
+                "status": enums.WeeklyRecommendationStatus.PROCESSING.value,
             }
         )
 
-        if not created and recommendation.status == "completed":
+        if not created and recommendation.status == enums.WeeklyRecommendationStatus.COMPLETED.value:
             logger.info(f"Recommendation already exists for user {user.id} week {helper.start_date}")
             return recommendation
 
@@ -128,6 +79,12 @@ class WeeklyRecommendationService(GeminiBaseService):
             logger.info(f"Successfully generated recommendation for user {user.id}")
             return recommendation
 
+        except GeminiUnavailable as e:
+            logger.warning(f"Gemini unavailable, deferring recommendation for user {user.id}: {e}")
+            recommendation.status = enums.WeeklyRecommendationStatus.PENDING.value
+            recommendation.save(update_fields=["status"])
+            raise
+
         except Exception as e:
             logger.error(f"Failed to generate recommendation: {e}")
             recommendation.status = enums.WeeklyRecommendationStatus.FAILED.value
@@ -142,18 +99,11 @@ class WeeklyRecommendationService(GeminiBaseService):
             logger.warning("Gemini client not configured, using mock data")
             return get_mock_weekly_recommendation(), True
 
-        try:
-            prompt = WEEKLY_RECOMMENDATION_PROMPT.format(
-                input_data=json.dumps(input_data, indent=2)
-            )
-            return self.call_gemini(prompt)
+        prompt = WEEKLY_RECOMMENDATION_PROMPT.format(
+            input_data=json.dumps(input_data, separators=(",", ":"))
+        )
+        result, is_mock = self.call_gemini(prompt, schema=WeeklyRecommendationResult)
+        return result.model_dump(mode="json"), is_mock
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Gemini response: {e}")
-            return get_mock_weekly_recommendation(), True
-        except Exception as e:
-            logger.error(f"Gemini recommendation failed: {e}")
-            return get_mock_weekly_recommendation(), True
-        
 
 weekly_recommendation_service = WeeklyRecommendationService()
\ No newline at end of file
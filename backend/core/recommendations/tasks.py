@@ -1,13 +1,20 @@
+import random
+
 from celery import shared_task
+from django.conf import settings
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from datetime import timedelta
 from loguru import logger
 
 from core.account.models import Account
+from core.recommendations.models import WeeklyRecommendation
 from core.recommendations.services import weekly_recommendation_service
+from core.utils import enums
+from core.utils.services import GeminiUnavailable
 
 
-@shared_task(bind=True, max_retries=3, queue="recommendations")
+@shared_task(bind=True, max_retries=3)
 def generate_weekly_recommendations_for_all_users(self):
     """
     Generate weekly recommendations for all active users.
@@ -21,7 +28,14 @@ def generate_weekly_recommendations_for_all_users(self):
 
     logger.info(f"Generating weekly recommendations for {start_date} to {end_date}")
 
-    users = Account.objects.filter(is_active=True)
+    # a retry after a Gemini outage resumes with the users still left
+    delivered = WeeklyRecommendation.objects.filter(
+        owner=OuterRef("pk"),
+        week_start_date=start_date,
+        status=enums.WeeklyRecommendationStatus.COMPLETED.value,
+        notification_sent=True,
+    )
+    users = Account.objects.filter(is_active=True).exclude(Exists(delivered))
     success_count = 0
     error_count = 0
 
@@ -32,11 +46,20 @@ def generate_weekly_recommendations_for_all_users(self):
                 start_date=start_date,
                 end_date=end_date,
             )
-            recommendation.emit_ready_event()
+            if not recommendation.notification_sent:
+                recommendation.emit_ready_event()
             
             success_count += 1
             logger.info(f"Emitted recommendation for user {user.id}")
 
+        except GeminiUnavailable as e:
+            logger.warning(f"Gemini unavailable, pausing weekly batch: {e}")
+            raise self.retry(
+                exc=e,
+                countdown=e.retry_after + random.uniform(0, e.retry_after),
+                max_retries=settings.GEMINI_THROTTLE_MAX_RETRIES,
+            )
+
         except Exception as e:
             error_count += 1
             logger.error(f"Failed to emit recommendation for user {user.id}: {e}")
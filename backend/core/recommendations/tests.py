@@ -1,3 +1,37 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from core.account.models import Account
+from core.utils import enums
+from .models import WeeklyRecommendation
+from .tasks import generate_weekly_recommendations_for_all_users
+
+
+class WeeklyRecommendationBatchTests(TestCase):
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.week_start = today - timedelta(days=today.weekday() + 7)
+        self.delivered = Account.objects.create_user("delivered@example.com", "Done", "Test", "password")
+        self.pending = Account.objects.create_user("pending@example.com", "Left", "Test", "password")
+        WeeklyRecommendation.objects.create(
+            owner=self.delivered,
+            week_start_date=self.week_start,
+            week_end_date=self.week_start + timedelta(days=6),
+            status=enums.WeeklyRecommendationStatus.COMPLETED.value,
+            notification_sent=True,
+        )
+
+    def test_users_already_delivered_this_week_are_skipped(self):
+        with mock.patch(
+            "core.recommendations.tasks.weekly_recommendation_service.generate_recommendation",
+            return_value=mock.Mock(notification_sent=True),
+        ) as generate:
+            result = generate_weekly_recommendations_for_all_users.apply().get()
 
-# Create your tests here.
+        self.assertEqual(result["success_count"], 1)
+        self.assertEqual([call.kwargs["user"] for call in generate.call_args_list], [self.pending])
+        self.assertEqual(generate.call_args.kwargs["start_date"], self.week_start)
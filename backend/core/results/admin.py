@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from unfold.admin import ModelAdmin
 
-from .models import FoodAnalysis, DetectedFood
+from .models import FoodAnalysis, DetectedFood, CachedAnalysisResult, NutrientReference
 
 
 @admin.register(FoodAnalysis)
@@ -25,11 +25,24 @@ class FoodAnalysisAdmin(ModelAdmin):
                     "balance_score",
                     "next_meal_recommendations",
                     "is_mock_data",
+                    "duplicate_of",
                     "analysis_status",
                     "error_message",
+                    "attempts",
+                    "lease_owner",
+                    "lease_expires_at",
+                    "stage_timings",
+                    "segmentation",
                 ),
             },
         ),
+        (
+            _("Totals"),
+            {
+                "classes": ["tab"],
+                "fields": tuple(FoodAnalysis.TOTAL_FIELDS),
+            },
+        ),
         (
             _("Important dates"),
             {
@@ -38,10 +51,13 @@ class FoodAnalysisAdmin(ModelAdmin):
             },
         ),
     )
-    list_display = ["id", "owner", "meal_type", "balance_score", "analysis_status", "is_mock_data"]
+    list_display = ["id", "owner", "meal_type", "balance_score", "total_calories", "analysis_status", "is_mock_data"]
     list_filter = ["analysis_status", "is_mock_data", "meal_type"]
     search_fields = ["id", "owner__email", "owner__first_name"]
-    readonly_fields = ["date_added", "date_last_modified"]
+    readonly_fields = [
+        "date_added", "date_last_modified", "stage_timings", "attempts", "lease_owner", "lease_expires_at", "segmentation",
+        *FoodAnalysis.TOTAL_FIELDS,
+    ]
 
 
 @admin.register(DetectedFood)
@@ -56,6 +72,10 @@ class DetectedFoodAdmin(ModelAdmin):
                     "name",
                     "confidence",
                     "portion_estimate",
+                    "food_group",
+                    "estimated_grams",
+                    "segmentation_mask",
+                    "nutrient_reference",
                 ),
             },
         ),
@@ -86,6 +106,21 @@ class DetectedFoodAdmin(ModelAdmin):
     list_display = ["id", "name", "confidence", "calories"]
     list_filter = ["name"]
     search_fields = ["name", "analysis__id"]
+    readonly_fields = ["date_added", "date_last_modified", "segmentation_mask"]
+    autocomplete_fields = ["nutrient_reference"]
+
+
+@admin.register(CachedAnalysisResult)
+class CachedAnalysisResultAdmin(ModelAdmin):
+    list_display = ["id", "content_hash", "model_name", "hit_count", "last_accessed_at", "expires_at"]
+    list_filter = ["model_name"]
+    search_fields = ["content_hash"]
     readonly_fields = ["date_added", "date_last_modified"]
 
 
+@admin.register(NutrientReference)
+class NutrientReferenceAdmin(ModelAdmin):
+    list_display = ["id", "name", "food_group", "calories", "protein", "carbs", "fat", "source"]
+    list_filter = ["food_group", "source"]
+    search_fields = ["name", "source_id"]
+    readonly_fields = ["date_added", "date_last_modified"]
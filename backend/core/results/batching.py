@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from loguru import logger
+
+from core.utils.helpers import metrics
+
+# pools that run several tasks in one process; prefork and solo run one at
+# a time per process, so a submitted image would never find a batch partner
+THREADED_POOLS = ("thread", "gevent", "eventlet")
+
+
+@dataclass
+class BatchItem:
+    image_part: Any
+    deadline: float
+    future: Future = field(default_factory=Future)
+    taken: bool = False
+    # stage durations of the batch request this image was part of
+    durations: dict = field(default_factory=dict)
+
+
+class AnalysisBatcher:
+    """
+    Collects images submitted by concurrent worker threads and analyzes them
+    in a single multi-image Gemini request.
+
+    A batch is flushed once `max_size` images are waiting or the oldest one
+    has waited `max_wait_ms`, by whichever waiting thread notices first.
+    `flush` receives the image parts and returns one result per slot; a slot
+    left as None (missing or invalid in the reply) resolves to None so that
+    caller can fall back to a single-image request.
+
+    Stages timed while the batch request runs are merged into the StageTimer
+    of every thread in the batch, not only the one that sent it. Batching is
+    switched off in workers whose pool runs one task per process (see
+    `configure_for_pool`).
+    """
+
+    pool_runs_concurrent_tasks = True
+
+    def __init__(self, flush: Callable[[List[Any]], List[Optional[Any]]], max_size: int, max_wait_ms: int):
+        self.flush = flush
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[BatchItem] = []
+        self._condition = threading.Condition()
+
+    @classmethod
+    def configure_for_pool(cls, pool_cls):
+        """Called with the Celery worker's pool class (or its alias) at worker startup."""
+        from celery.concurrency import get_implementation
+
+        pool_module = get_implementation(pool_cls).__module__.rsplit(".", 1)[-1]
+        cls.pool_runs_concurrent_tasks = pool_module in THREADED_POOLS
+        if not cls.pool_runs_concurrent_tasks:
+            logger.info(f"Analysis batching disabled: the '{pool_module}' pool runs one task per process")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 1 and self.pool_runs_concurrent_tasks
+
+    def submit(self, image_part: Any) -> Optional[Any]:
+        """Block until the batch containing `image_part` has been analyzed."""
+        item = BatchItem(image_part=image_part, deadline=time.monotonic() + self.max_wait)
+        with self._condition:
+            self._pending.append(item)
+            self._condition.notify_all()
+
+        while True:
+            with self._condition:
+                while not item.taken and not self._ready():
+                    self._condition.wait(self._time_to_deadline())
+                if item.taken:
+                    break
+                batch = self._take()
+            self._run(batch)
+
+        try:
+            return item.future.result()
+        finally:
+            metrics.merge_stages(item.durations)
+
+    def _ready(self) -> bool:
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_size
+            or time.monotonic() >= self._pending[0].deadline
+        )
+
+    def _time_to_deadline(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        return max(self._pending[0].deadline - time.monotonic(), 0)
+
+    def _take(self) -> List[BatchItem]:
+        batch = self._pending[:self.max_size]
+        del self._pending[:self.max_size]
+        for item in batch:
+            item.taken = True
+        self._condition.notify_all()
+        return batch
+
+    def _run(self, batch: List[BatchItem]):
+        if len(batch) == 1:
+            # nothing to share the request with, use the single-image path
+            batch[0].future.set_result(None)
+            return
+
+        # time the request on its own timer, every item then merges the stages
+        timer = metrics.StageTimer()
+        try:
+            with timer.activate():
+                results = self.flush([item.image_part for item in batch])
+        except Exception as e:
+            for item in batch:
+                item.durations = dict(timer.durations)
+                item.future.set_exception(e)
+            return
+
+        missing = 0
+        for index, item in enumerate(batch):
+            result = results[index] if index < len(results) else None
+            missing += result is None
+            item.durations = dict(timer.durations)
+            item.future.set_result(result)
+
+        logger.info(f"Analyzed batch of {len(batch)} images ({missing} fell back to single requests)")
@@ -0,0 +1,382 @@
+import io
+import json
+import random
+import resource
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from celery import current_app
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from loguru import logger
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.account.models import Account
+from core.file_storage.models import FileModel
+from core.file_storage.views import ListCreateFile
+from core.results.models import FoodAnalysis
+from core.results.services import gemini_service
+from core.utils import enums
+from core.utils.helpers import outbox
+
+# headline metrics shown by --compare, and whether higher is better
+COMPARED_METRICS = {
+    "analyses_per_second": True,
+    "end_to_end_ms.p50": False,
+    "end_to_end_ms.p95": False,
+    "end_to_end_ms.p99": False,
+    "queries_per_analysis": False,
+    "peak_rss_mb": False,
+}
+
+
+def percentile(values, q: float):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[index], 1)
+
+
+def summarize(values) -> dict:
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class InlineWorkerRelay(outbox.OutboxRelay):
+    """
+    Outbox relay that runs analysis tasks on an in-process thread pool instead
+    of publishing them to the broker, and timestamps analysis events as the
+    channel layer accepts them.
+    """
+
+    def __init__(self, workers: int, recorder: "BenchmarkRecorder"):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bench-worker")
+        self.recorder = recorder
+        self.futures = []
+
+    def publish_tasks(self, messages) -> dict:
+        for message in messages:
+            self.futures.append(self.executor.submit(self.run_task, message))
+        return {}
+
+    def run_task(self, message):
+        task = current_app.tasks[message.name]
+        counter = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                task.apply(
+                    args=message.payload.get("args", []),
+                    kwargs=message.payload.get("kwargs", {}),
+                    headers={"enqueued_at": message.date_added.timestamp()},
+                )
+        finally:
+            self.recorder.task_finished(message, counter.count, time.perf_counter() - started)
+            connection.close()
+
+    async def publish_events(self, messages) -> dict:
+        errors = await super().publish_events(messages)
+        now = time.perf_counter()
+        for message in messages:
+            if message.id not in errors:
+                self.recorder.event_delivered(message.payload, now)
+        return errors
+
+
+class BenchmarkRecorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploads = {}
+        self.upload_queries = []
+        self.task_queries = defaultdict(int)
+        self.task_seconds = []
+        self.events = {}
+        self.done = threading.Condition(self.lock)
+        # result cache entries the run creates, removed with the seeded rows
+        self.content_hashes = []
+
+    def upload_finished(self, analysis_id: int, started: float, finished: float, queries: int):
+        with self.lock:
+            self.uploads[analysis_id] = (started, finished)
+            self.upload_queries.append(queries)
+
+    def task_finished(self, message, queries: int, seconds: float):
+        with self.lock:
+            self.task_queries[tuple(message.payload.get("args", []))] += queries
+            self.task_seconds.append(seconds)
+
+    def event_delivered(self, payload: dict, at: float):
+        data = payload.get("data") or {}
+        if payload.get("type") not in (
+            enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value,
+            enums.FoodAnalysisStatus.ANALYSIS_FAILED.value,
+        ):
+            return
+        with self.done:
+            self.events.setdefault(data.get("id"), (payload["type"], at))
+            self.done.notify_all()
+
+    def wait(self, analysis_ids, timeout: float, poll=None) -> bool:
+        """Wait for a final event per analysis, calling `poll` about once a second meanwhile."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.done:
+                if set(analysis_ids) <= set(self.events):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.done.wait(min(remaining, 1))
+            if poll is not None:
+                poll()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the analysis pipeline end to end: upload through ListCreateFile, "
+        "analyze_food_image_task on an in-process worker pool, and websocket delivery. "
+        "Inference goes to whatever GEMINI_BASE_URL points at, normally the "
+        "serve_gemini_standin server (or one started in-process with --standin). "
+        "It seeds users and uploads into the configured database and deletes them "
+        "afterwards, so it only runs with DEBUG on or --allow-writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=100)
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent uploads")
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent analysis tasks")
+        parser.add_argument("--image-size", type=int, default=1024, help="Long edge of generated images")
+        parser.add_argument("--timeout", type=float, default=600)
+        parser.add_argument(
+            "--standin",
+            action="store_true",
+            help="Serve a Gemini stand-in in this process on GEMINI_BASE_URL's port",
+        )
+        parser.add_argument("--standin-latency", default="lognormal:1200,0.35")
+        parser.add_argument("--label", default="")
+        parser.add_argument("--output", help="Write the results as JSON to this path")
+        parser.add_argument("--compare", help="Earlier results JSON to compare against")
+        parser.add_argument(
+            "--allow-writes",
+            action="store_true",
+            help="Run with DEBUG off, writing the seeded users and analyses to this database",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["allow_writes"]:
+            raise CommandError(
+                "The benchmark writes users, uploads and analyses to the configured database. "
+                "Run it with DEBUG on, or pass --allow-writes if this database is meant for it"
+            )
+        if not settings.GEMINI_BASE_URL and settings.ANALYSIS_ENGINE == "gemini":
+            raise CommandError(
+                "Set GEMINI_BASE_URL to a stand-in (manage.py serve_gemini_standin) "
+                "so the benchmark doesn't call the real Gemini API"
+            )
+
+        server = self.start_standin(options) if options["standin"] else None
+        run_id = uuid.uuid4().hex[:8]
+        recorder = BenchmarkRecorder()
+        relay = InlineWorkerRelay(options["workers"], recorder)
+        default_relay, outbox.relay = outbox.relay, relay
+        try:
+            users = self.seed_users(run_id, options["users"])
+            report = self.run(options, users, recorder, relay)
+        finally:
+            outbox.relay = default_relay
+            relay.executor.shutdown(wait=True)
+            if server is not None:
+                server.shutdown()
+            self.cleanup(run_id, recorder.content_hashes)
+
+        report = {
+            "label": options["label"],
+            "commit": self.git_commit(),
+            "date": timezone.now().isoformat(),
+            "config": {
+                key: options[key]
+                for key in ("images", "users", "clients", "workers", "image_size", "seed")
+            } | {"engine": settings.ANALYSIS_ENGINE, "batch_max_size": settings.ANALYSIS_BATCH_MAX_SIZE},
+            **report,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+        if options["compare"]:
+            self.compare(report, options["compare"])
+
+    def start_standin(self, options):
+        from http.server import ThreadingHTTPServer
+        from core.utils.management.commands.serve_gemini_standin import GeminiStandInHandler
+        from core.utils.services.standin import GeminiStandIn
+
+        address = urlparse(settings.GEMINI_BASE_URL)
+        GeminiStandInHandler.standin = GeminiStandIn(latency=options["standin_latency"], seed=options["seed"])
+        server = ThreadingHTTPServer((address.hostname, address.port or 80), GeminiStandInHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="gemini-standin", daemon=True).start()
+        return server
+
+    @staticmethod
+    def seed_users(run_id: str, count: int):
+        return [
+            Account.objects.create_user(
+                f"bench+{run_id}-{index}@example.com", "Bench", str(index), uuid.uuid4().hex
+            )
+            for index in range(count)
+        ]
+
+    @staticmethod
+    def make_image(rng: random.Random, size: int) -> bytes:
+        # distinct noise per image so near-duplicate reuse doesn't short-circuit analyses
+        width, height = size, size * 3 // 4
+        image = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width // 8 * (height // 8) * 3))
+        buffer = io.BytesIO()
+        image.resize((width, height)).save(buffer, "JPEG", quality=85)
+        return buffer.getvalue()
+
+    def upload(self, user, image_data: bytes, name: str, recorder: BenchmarkRecorder):
+        request = APIRequestFactory().post(
+            "/api/v1/files/",
+            {
+                "file": SimpleUploadedFile(name, image_data, content_type="image/jpeg"),
+                "purpose": enums.FilePurposeType.FOOD_IMAGE.value,
+            },
+            format="multipart",
+        )
+        force_authenticate(request, user=user)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = ListCreateFile.as_view()(request)
+            finished = time.perf_counter()
+            if response.status_code != 201:
+                logger.error(f"Benchmark upload failed: {response.status_code} {response.data}")
+                return None
+            analysis_id = response.data.get("analysis_id")
+            recorder.upload_finished(analysis_id, started, finished, counter.count)
+            return analysis_id
+        finally:
+            connection.close()
+
+    def run(self, options, users, recorder: BenchmarkRecorder, relay: InlineWorkerRelay) -> dict:
+        rng = random.Random(options["seed"])
+        images = [self.make_image(rng, options["image_size"]) for _ in range(options["images"])]
+        recorder.content_hashes = [gemini_service.result_cache.make_key(image) for image in images]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["clients"], thread_name_prefix="bench-client") as clients:
+            uploads = [
+                clients.submit(self.upload, users[index % len(users)], image, f"bench-{index}.jpg", recorder)
+                for index, image in enumerate(images)
+            ]
+        analysis_ids = [future.result() for future in uploads if future.result()]
+
+        # stands in for the relay_outbox beat task, which picks up messages
+        # whose on-commit publish failed
+        finished_in_time = recorder.wait(analysis_ids, options["timeout"], poll=relay.drain)
+        wait(relay.futures)
+        elapsed = time.perf_counter() - started
+
+        analyses = FoodAnalysis.objects.filter(id__in=analysis_ids).only(
+            "id", "analysis_status", "stage_timings", "attempts", "food_image_id"
+        )
+        stage_timings = defaultdict(list)
+        statuses = defaultdict(int)
+        attempts = 0
+        queries = []
+        for analysis in analyses:
+            statuses[analysis.analysis_status] += 1
+            attempts += analysis.attempts
+            for stage, ms in (analysis.stage_timings or {}).items():
+                stage_timings[stage].append(ms)
+            queries.append(recorder.task_queries.get((str(analysis.food_image_id),), 0))
+
+        end_to_end = [
+            (recorder.events[analysis_id][1] - recorder.uploads[analysis_id][0]) * 1000
+            for analysis_id in analysis_ids
+            if analysis_id in recorder.events and analysis_id in recorder.uploads
+        ]
+        upload_ms = [(end - start) * 1000 for start, end in recorder.uploads.values()]
+        completed = statuses.get(enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value, 0)
+        upload_queries = sum(recorder.upload_queries)
+
+        return {
+            "timed_out": not finished_in_time,
+            "elapsed_seconds": round(elapsed, 2),
+            "analyses": len(analysis_ids),
+            "statuses": dict(statuses),
+            "retries": max(attempts - len(analysis_ids), 0),
+            "analyses_per_second": round(completed / elapsed, 2) if elapsed else None,
+            "end_to_end_ms": summarize(end_to_end),
+            "upload_ms": summarize(upload_ms),
+            "task_ms": summarize([seconds * 1000 for seconds in recorder.task_seconds]),
+            "stage_ms": {stage: summarize(values) for stage, values in sorted(stage_timings.items())},
+            "queries_per_upload": round(upload_queries / len(analysis_ids), 1) if analysis_ids else None,
+            "queries_per_analysis": round(
+                (upload_queries + sum(queries)) / len(analysis_ids), 1
+            ) if analysis_ids else None,
+            # ru_maxrss is in KiB on Linux; uploads and workers share this process
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+    def compare(self, report: dict, path: str):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        def lookup(data, dotted):
+            for key in dotted.split("."):
+                data = (data or {}).get(key)
+            return data
+
+        self.stdout.write(f"\nCompared with {baseline.get('label') or path} ({baseline.get('commit')}):")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = lookup(baseline, metric), lookup(report, metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            better = change >= 0 if higher_is_better else change <= 0
+            style = self.style.SUCCESS if better else self.style.ERROR
+            self.stdout.write(style(f"  {metric}: {before} -> {after} ({change:+.1f}%)"))
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    @staticmethod
+    def cleanup(run_id: str, content_hashes):
+        """Delete the run's users with their uploads, analyses and rollups, and its cache entries."""
+        users = Account.objects.filter(email__startswith=f"bench+{run_id}-")
+        for file_obj in FileModel.objects.filter(owner__in=users):
+            file_obj.file.delete(save=False)
+        users.delete()
+        if content_hashes:
+            gemini_service.result_cache.discard(content_hashes)
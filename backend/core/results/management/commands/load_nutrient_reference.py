@@ -0,0 +1,62 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.results.models import NutrientReference
+from core.results.nutrients import NutrientReferenceIndex
+from core.results.schemas import MACRO_FIELDS, MICRONUTRIENT_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Load per-100 g nutrient values from a CSV export of an open food dataset. "
+        "Columns: name, aliases (|-separated), food_group, source_id, "
+        f"{', '.join(MACRO_FIELDS)}, {', '.join(MICRONUTRIENT_FIELDS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to load")
+        parser.add_argument("--source", default="", help="Dataset name recorded on each row, e.g. usda-fdc")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        missing = {"name", *MACRO_FIELDS} - set(rows[0] if rows else {})
+        if missing:
+            raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+
+        references = {}
+        for row in rows:
+            name = (row.get("name") or "").strip()
+            if not name:
+                continue
+            references[name.lower()] = NutrientReference(
+                name=name,
+                aliases=[alias.strip() for alias in (row.get("aliases") or "").split("|") if alias.strip()],
+                food_group=row.get("food_group") or None,
+                source=options["source"] or None,
+                source_id=row.get("source_id") or None,
+                micronutrients={
+                    field: float(row[field]) for field in MICRONUTRIENT_FIELDS if row.get(field)
+                },
+                **{field: row.get(field) or 0 for field in MACRO_FIELDS},
+            )
+
+        with transaction.atomic():
+            NutrientReference.objects.bulk_create(
+                references.values(),
+                batch_size=options["batch_size"],
+                update_conflicts=True,
+                unique_fields=["name"],
+                update_fields=[
+                    "aliases", "food_group", "source", "source_id", "micronutrients", *MACRO_FIELDS,
+                ],
+            )
+        NutrientReferenceIndex.bump_version()
+        self.stdout.write(f"Loaded {len(references)} nutrient references")
@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.results.models import FoodAnalysis
+from core.results.tasks import recompute_portions_task
+from core.utils import enums
+
+
+class Command(BaseCommand):
+    help = "Queue completed analyses for portion re-estimation with the current segmentation model"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Include analyses already segmented by the current model")
+        parser.add_argument("--chunk-size", type=int, default=settings.FOOD_SEGMENTATION_BATCH_MAX_SIZE)
+
+    def handle(self, *args, **options):
+        with open(settings.FOOD_SEGMENTATION_LABELS_PATH) as f:
+            version = json.load(f).get("version", "unversioned")
+
+        analyses = FoodAnalysis.objects.filter(
+            analysis_status=enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value,
+            is_mock_data=False,
+        )
+        if not options["all"]:
+            analyses = analyses.filter(
+                ~Q(segmentation__model_version=version) | Q(segmentation__isnull=True)
+            )
+
+        ids = list(analyses.order_by("id").values_list("id", flat=True))
+        chunk_size = options["chunk_size"]
+        for start in range(0, len(ids), chunk_size):
+            recompute_portions_task.delay(ids[start:start + chunk_size])
+
+        self.stdout.write(
+            f"Queued {len(ids)} analyses in {-(-len(ids) // chunk_size)} chunks for segmentation {version}"
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.analytics.models import DailyNutritionRollup
+from core.results.models import DetectedFood, FoodAnalysis
+from core.results.nutrients import nutrient_reference
+from core.results.schemas import MACRO_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Recompute stored detected-food nutrients from the nutrient reference table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        foods = DetectedFood.objects.filter(estimated_grams__gt=0).order_by("id")
+        chunk_size = options["chunk_size"]
+        last_id, updated_count = 0, 0
+        days = set()
+
+        while True:
+            chunk = list(foods.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            updated = nutrient_reference.rederive(chunk)
+            with transaction.atomic():
+                DetectedFood.objects.bulk_update(
+                    updated, [*MACRO_FIELDS, "micronutrients", "nutrient_reference"]
+                )
+                days |= FoodAnalysis.recalculate_totals_for({food.analysis_id for food in updated})
+            updated_count += len(updated)
+
+        # an analysis' foods can span chunks, so its day is refreshed once at the end
+        with transaction.atomic():
+            for owner_id, day in days:
+                DailyNutritionRollup.schedule_refresh(owner_id, day)
+
+        self.stdout.write(f"Re-derived nutrients for {updated_count} detected foods ({len(days)} days refreshed)")
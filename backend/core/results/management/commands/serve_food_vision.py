@@ -0,0 +1,61 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from loguru import logger
+
+from core.results.services import local_analysis_service
+
+
+class FoodVisionHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {"error": "Not found"})
+        self.send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        if self.path != "/classify":
+            return self.send_json(404, {"error": "Not found"})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return self.send_json(400, {"error": "Request body must be the image bytes"})
+
+        try:
+            predictions = local_analysis_service.predict(self.rfile.read(length))
+        except Exception as e:
+            logger.error(f"Food vision inference failed: {e}")
+            return self.send_json(422, {"error": str(e)})
+        self.send_json(200, {"predictions": predictions})
+
+    def send_json(self, status_code: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"food-vision {self.address_string()} {format % args}")
+
+
+class Command(BaseCommand):
+    help = "Serve the local food-vision model over HTTP for ANALYSIS_ENGINE=local workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8100)
+
+    def handle(self, *args, **options):
+        # load the model before accepting requests
+        local_analysis_service.model
+        server = ThreadingHTTPServer((options["host"], options["port"]), FoodVisionHandler)
+        server.daemon_threads = True
+        logger.info(f"Food vision sidecar listening on {options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
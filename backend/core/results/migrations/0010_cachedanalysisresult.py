@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0009_alter_foodanalysis_analysis_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedAnalysisResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+                ('date_last_modified', models.DateTimeField(auto_now=True)),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='Content Hash')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Model Name')),
+                ('result', models.JSONField(default=dict, verbose_name='Analysis Result')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='Hit Count')),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Last Accessed At')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+            ],
+            options={
+                'verbose_name': 'Cached Analysis Result',
+                'verbose_name_plural': 'Cached Analysis Results',
+                'ordering': ['-last_accessed_at'],
+            },
+        ),
+    ]
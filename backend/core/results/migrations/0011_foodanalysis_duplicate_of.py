@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0010_cachedanalysisresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Analysis whose result was reused for a near-identical image', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='results.foodanalysis', verbose_name='Duplicate Of'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0011_foodanalysis_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Time spent in each pipeline stage for the last analysis run', null=True, verbose_name='Stage Timings (ms)'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:28
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+TOTAL_FIELDS = {
+    "total_calories": "calories",
+    "total_protein": "protein",
+    "total_carbs": "carbs",
+    "total_fat": "fat",
+    "total_dairy": "dairy",
+    "total_vegetable": "vegetable",
+    "total_fruit": "fruit",
+}
+
+
+def backfill_totals(apps, schema_editor):
+    FoodAnalysis = apps.get_model("results", "FoodAnalysis")
+    DetectedFood = apps.get_model("results", "DetectedFood")
+
+    def food_sum(food_field):
+        subquery = (
+            DetectedFood.objects.filter(analysis_id=OuterRef("pk"))
+            .order_by()
+            .values("analysis_id")
+            .annotate(total=Sum(food_field))
+            .values("total")
+        )
+        return Coalesce(
+            Subquery(subquery, output_field=models.DecimalField()),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(),
+        )
+
+    FoodAnalysis.objects.update(**{
+        total_field: food_sum(food_field)
+        for total_field, food_field in TOTAL_FIELDS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0012_foodanalysis_stage_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_calories',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Calories'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_carbs',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Carbohydrates (g)'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_dairy',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Dairy (g)'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_fat',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Fat (g)'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_fruit',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Fruit (g)'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_protein',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Protein (g)'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='total_vegetable',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total Vegetable (g)'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0013_foodanalysis_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detectedfood',
+            name='estimated_grams',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Portion weight the nutrient values correspond to', max_digits=10, null=True, verbose_name='Estimated Weight (g)'),
+        ),
+        migrations.AddField(
+            model_name='detectedfood',
+            name='food_group',
+            field=models.CharField(blank=True, max_length=50, null=True, verbose_name='Food Group'),
+        ),
+        migrations.AddField(
+            model_name='detectedfood',
+            name='segmentation_mask',
+            field=models.JSONField(blank=True, help_text="Run-length encoded mask of this food's region in the image", null=True, verbose_name='Segmentation Mask'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='segmentation',
+            field=models.JSONField(blank=True, default=dict, help_text='Segmentation model version, pixel scale and RLE plate mask used for portions', null=True, verbose_name='Segmentation'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0014_portion_segmentation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NutrientReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+                ('date_last_modified', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Food Name')),
+                ('aliases', models.JSONField(blank=True, default=list, help_text='Alternative names matched to this food', verbose_name='Aliases')),
+                ('food_group', models.CharField(blank=True, max_length=50, null=True, verbose_name='Food Group')),
+                ('source', models.CharField(blank=True, max_length=100, null=True, verbose_name='Source Dataset')),
+                ('source_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='Source ID')),
+                ('calories', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Calories per 100 g')),
+                ('protein', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Protein (g) per 100 g')),
+                ('carbs', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Carbohydrates (g) per 100 g')),
+                ('fat', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Fat (g) per 100 g')),
+                ('dairy', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Dairy (g) per 100 g')),
+                ('vegetable', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Vegetable (g) per 100 g')),
+                ('fruit', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Fruit (g) per 100 g')),
+                ('micronutrients', models.JSONField(blank=True, default=dict, help_text='Same keys and units as DetectedFood.micronutrients', verbose_name='Micronutrients per 100 g')),
+            ],
+            options={
+                'verbose_name': 'Nutrient Reference',
+                'verbose_name_plural': 'Nutrient References',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='detectedfood',
+            name='nutrient_reference',
+            field=models.ForeignKey(blank=True, help_text='Reference entry the nutrient values were derived from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='detected_foods', to='results.nutrientreference', verbose_name='Nutrient Reference'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:42
+
+from django.db import migrations, models
+
+
+def normalize_legacy_statuses(apps, schema_editor):
+    # the trigger endpoint used to create analyses with a bare "pending" status,
+    # which the claim transition wouldn't recognise
+    FoodAnalysis = apps.get_model("results", "FoodAnalysis")
+    FoodAnalysis.objects.filter(analysis_status="pending").update(analysis_status="analysis_pending")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0015_nutrientreference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of times processing has been claimed', verbose_name='Attempts'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Processing may be taken over by another worker after this time', null=True, verbose_name='Lease Expires At'),
+        ),
+        migrations.AddField(
+            model_name='foodanalysis',
+            name='lease_owner',
+            field=models.CharField(blank=True, help_text='Task currently holding the processing lease', max_length=255, null=True, verbose_name='Lease Owner'),
+        ),
+        migrations.RunPython(normalize_legacy_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0016_analysis_lease'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodanalysis',
+            index=models.Index(condition=models.Q(('analysis_status', 'analysis_processing')), fields=['lease_expires_at'], name='analysis_processing_lease_idx'),
+        ),
+    ]
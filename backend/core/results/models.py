@@ -1,12 +1,20 @@
+from datetime import timedelta
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from loguru import logger
 
 from core.utils.mixins import BaseModelMixin
 from core.file_storage.models import FileModel
 from core.utils import enums
-from core.websocket.utils import emit_websocket_event
+from core.websocket.utils import queue_websocket_event
 
 
 class FoodAnalysis(BaseModelMixin):
@@ -54,6 +62,48 @@ class FoodAnalysis(BaseModelMixin):
         default=False,
         help_text=_("Whether this result is from mock data (fallback)")
     )
+    total_calories = models.DecimalField(
+        _("Total Calories"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_protein = models.DecimalField(
+        _("Total Protein (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_carbs = models.DecimalField(
+        _("Total Carbohydrates (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_fat = models.DecimalField(
+        _("Total Fat (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_dairy = models.DecimalField(
+        _("Total Dairy (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_vegetable = models.DecimalField(
+        _("Total Vegetable (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    total_fruit = models.DecimalField(
+        _("Total Fruit (g)"),
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
     analysis_status = models.CharField(
         _("Analysis Status"),
         max_length=20,
@@ -66,6 +116,24 @@ class FoodAnalysis(BaseModelMixin):
         null=True,
         blank=True,
     )
+    lease_owner = models.CharField(
+        _("Lease Owner"),
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text=_("Task currently holding the processing lease")
+    )
+    lease_expires_at = models.DateTimeField(
+        _("Lease Expires At"),
+        null=True,
+        blank=True,
+        help_text=_("Processing may be taken over by another worker after this time")
+    )
+    attempts = models.PositiveIntegerField(
+        _("Attempts"),
+        default=0,
+        help_text=_("Number of times processing has been claimed")
+    )
     push_sent = models.BooleanField(
         _("Is Event Pushed?"),
         default = False
@@ -75,31 +143,270 @@ class FoodAnalysis(BaseModelMixin):
         blank=True,
         null=True
     )
+    stage_timings = models.JSONField(
+        _("Stage Timings (ms)"),
+        null=True,
+        blank=True,
+        default=dict,
+        help_text=_("Time spent in each pipeline stage for the last analysis run")
+    )
+    duplicate_of = models.ForeignKey(
+        to="self",
+        on_delete=models.SET_NULL,
+        related_name="duplicates",
+        null=True,
+        blank=True,
+        verbose_name=_("Duplicate Of"),
+        help_text=_("Analysis whose result was reused for a near-identical image")
+    )
+    segmentation = models.JSONField(
+        _("Segmentation"),
+        null=True,
+        blank=True,
+        default=dict,
+        help_text=_("Segmentation model version, pixel scale and RLE plate mask used for portions")
+    )
 
     class Meta:
         verbose_name = _("Food Analysis")
         verbose_name_plural = _("Food Analyses")
         ordering = ["-date_added"]
+        indexes = [
+            # the reconciler only ever scans processing rows, a small slice of the table
+            models.Index(
+                fields=["lease_expires_at"],
+                condition=Q(analysis_status=enums.FoodAnalysisStatus.ANALYSIS_PROCESSING.value),
+                name="analysis_processing_lease_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.owner.first_name}-{self.food_image.id}-analysis"
 
-    @property
-    def total_calories(self):
-        return sum(food.calories or 0 for food in self.detected_foods.all())
+    Status = enums.FoodAnalysisStatus
 
     @property
-    def total_protein(self):
-        return sum(food.protein or 0 for food in self.detected_foods.all())
+    def lease_active(self) -> bool:
+        return bool(self.lease_expires_at and self.lease_expires_at > timezone.now())
 
-    @property
-    def total_carbs(self):
-        return sum(food.carbs or 0 for food in self.detected_foods.all())
+    @staticmethod
+    def lease_deadline(seconds: Optional[int] = None):
+        return timezone.now() + timedelta(seconds=seconds or settings.ANALYSIS_LEASE_SECONDS)
+
+    @classmethod
+    def claim(cls, file_id, lease_owner: str) -> Optional["FoodAnalysis"]:
+        """
+        Move the file's analysis to processing under `lease_owner` with a
+        single conditional UPDATE, so concurrent tasks for the same file can't
+        both win. Pending and failed analyses can be claimed, as can one whose
+        lease has expired (crashed worker) or is already held by `lease_owner`
+        (a retry of the same task). Returns None if the claim was lost.
+        """
+        now = timezone.now()
+        processing = cls.Status.ANALYSIS_PROCESSING.value
+        claimable = (
+            Q(analysis_status__in=[cls.Status.ANALYSIS_PENDING.value, cls.Status.ANALYSIS_FAILED.value])
+            | Q(analysis_status=processing, lease_owner=lease_owner)
+            | Q(analysis_status=processing, lease_expires_at__lt=now)
+            | Q(analysis_status=processing, lease_expires_at__isnull=True)
+        )
+        claimed = cls.objects.filter(claimable, food_image_id=file_id).update(
+            analysis_status=processing,
+            lease_owner=lease_owner,
+            lease_expires_at=cls.lease_deadline(),
+            # a retry of the same task continues its attempt rather than starting one
+            attempts=Case(When(lease_owner=lease_owner, then=F("attempts")), default=F("attempts") + 1),
+            error_message=None,
+            date_last_modified=now,
+        )
+        if not claimed:
+            return cls.create_claimed(file_id, lease_owner)
+
+        FileModel.objects.filter(id=file_id).update(currently_under_processing=True)
+        return cls.objects.select_related("food_image").get(food_image_id=file_id)
+
+    @classmethod
+    def create_claimed(cls, file_id, lease_owner: str) -> Optional["FoodAnalysis"]:
+        """Create the analysis already claimed, for files uploaded before analyses were created eagerly."""
+        file_obj = FileModel.objects.filter(id=file_id).first()
+        if file_obj is None or cls.objects.filter(food_image_id=file_id).exists():
+            return None
+        try:
+            with transaction.atomic():
+                analysis = cls.objects.create(
+                    owner_id=file_obj.owner_id,
+                    food_image=file_obj,
+                    analysis_status=cls.Status.ANALYSIS_PROCESSING.value,
+                    lease_owner=lease_owner,
+                    lease_expires_at=cls.lease_deadline(),
+                    attempts=1,
+                )
+        except IntegrityError:
+            return None
+        FileModel.objects.filter(id=file_id).update(currently_under_processing=True)
+        return analysis
+
+    def transition(
+        self, from_statuses: list, to_status: str, update_fields=(), lease_owner: str = None, conditions: Q = None
+    ) -> bool:
+        """
+        Conditionally move to `to_status`, writing only `update_fields` plus
+        the status and lease columns. The UPDATE matches only while the row is
+        still in one of `from_statuses` (and held by `lease_owner`, if given),
+        so a stale worker can't overwrite a newer state.
+        """
+        self.analysis_status = to_status
+        if to_status != self.Status.ANALYSIS_PROCESSING.value:
+            self.lease_owner = None
+            self.lease_expires_at = None
+        self.date_last_modified = timezone.now()
+
+        fields = {*update_fields, "analysis_status", "lease_owner", "lease_expires_at", "date_last_modified"}
+        filters = Q(id=self.id, analysis_status__in=from_statuses)
+        if lease_owner is not None:
+            filters &= Q(lease_owner=lease_owner)
+        if conditions is not None:
+            filters &= conditions
+        return FoodAnalysis.objects.filter(filters).update(
+            **{field: getattr(self, field) for field in fields}
+        ) == 1
+
+    def heartbeat(self, seconds: Optional[int] = None) -> bool:
+        """Extend the lease; False means another worker has taken the analysis over."""
+        lease_expires_at = self.lease_deadline(seconds)
+        extended = FoodAnalysis.objects.filter(
+            id=self.id,
+            analysis_status=self.Status.ANALYSIS_PROCESSING.value,
+            lease_owner=self.lease_owner,
+        ).update(lease_expires_at=lease_expires_at)
+        if extended:
+            self.lease_expires_at = lease_expires_at
+        return extended == 1
+
+    def mark_failed(self, error: Exception, lease_owner: str = None) -> bool:
+        self.error_message = str(error)
+        with transaction.atomic():
+            if not self.transition(
+                [self.Status.ANALYSIS_PROCESSING.value],
+                self.Status.ANALYSIS_FAILED.value,
+                update_fields=["error_message"],
+                lease_owner=lease_owner,
+            ):
+                return False
+            FileModel.objects.filter(id=self.food_image_id).update(
+                currently_under_processing=False
+            )
+            self.emit_event_on_commit(self.Status.ANALYSIS_FAILED.value.lower())
+        return True
+
+    @classmethod
+    def expired_leases(cls, limit: int):
+        """Processing analyses whose worker stopped renewing the lease, oldest first."""
+        return list(
+            cls.objects.filter(
+                Q(lease_expires_at__lt=timezone.now()) | Q(lease_expires_at__isnull=True),
+                analysis_status=cls.Status.ANALYSIS_PROCESSING.value,
+            )
+            .select_related("owner")
+            .order_by("lease_expires_at")[:limit]
+        )
+
+    def recover(self, max_attempts: int) -> Optional[str]:
+        """
+        Move an analysis with an expired lease back to pending, or to failed
+        once it has used `max_attempts`. The update only matches the lease as
+        it was read, so a worker that has just claimed it keeps it. Returns the
+        new status, or None if the analysis moved on in the meantime.
+        """
+        failed = self.attempts >= max_attempts
+        to_status = self.Status.ANALYSIS_FAILED if failed else self.Status.ANALYSIS_PENDING
+        if failed:
+            self.error_message = f"Processing did not finish after {self.attempts} attempts"
+
+        with transaction.atomic():
+            if not self.transition(
+                [self.Status.ANALYSIS_PROCESSING.value],
+                to_status.value,
+                update_fields=["error_message"],
+                conditions=Q(lease_owner=self.lease_owner, lease_expires_at=self.lease_expires_at),
+            ):
+                return None
+            FileModel.objects.filter(id=self.food_image_id).update(
+                currently_under_processing=False
+            )
+            self.emit_event_on_commit(to_status.value.lower())
+        return to_status.value
+
+    # stored total column -> DetectedFood field it sums
+    TOTAL_FIELDS = {
+        "total_calories": "calories",
+        "total_protein": "protein",
+        "total_carbs": "carbs",
+        "total_fat": "fat",
+        "total_dairy": "dairy",
+        "total_vegetable": "vegetable",
+        "total_fruit": "fruit",
+    }
+
+    def apply_totals(self, detected_foods) -> list:
+        """
+        Set the stored totals from in-memory detected foods and return the
+        updated field names for `save(update_fields=...)`.
+        """
+        for total_field, food_field in self.TOTAL_FIELDS.items():
+            setattr(self, total_field, sum(
+                Decimal(str(getattr(food, food_field) or 0)) for food in detected_foods
+            ))
+        return list(self.TOTAL_FIELDS)
+
+    def recalculate_totals(self):
+        """Recompute the stored totals from the detected food rows."""
+        totals = DetectedFood.objects.filter(analysis_id=self.id).aggregate(**{
+            total_field: Coalesce(Sum(food_field), Value(Decimal(0)), output_field=models.DecimalField())
+            for total_field, food_field in self.TOTAL_FIELDS.items()
+        })
+        for total_field, value in totals.items():
+            setattr(self, total_field, value)
+        FoodAnalysis.objects.filter(id=self.id).update(**totals)
+        self.refresh_nutrition_rollup()
+
+    @classmethod
+    def recalculate_totals_for(cls, analysis_ids) -> set:
+        """
+        Recompute the stored totals of many analyses in a single UPDATE and
+        return the (owner_id, local day) pairs whose rollups they feed. The
+        caller refreshes those, once per day however many analyses changed.
+        """
+        def food_sum(food_field):
+            subquery = (
+                DetectedFood.objects.filter(analysis_id=OuterRef("pk"))
+                .order_by()
+                .values("analysis_id")
+                .annotate(total=Sum(food_field))
+                .values("total")
+            )
+            return Coalesce(
+                Subquery(subquery, output_field=models.DecimalField()),
+                Value(Decimal(0)),
+                output_field=models.DecimalField(),
+            )
+
+        analyses = cls.objects.filter(id__in=analysis_ids)
+        analyses.update(**{
+            total_field: food_sum(food_field)
+            for total_field, food_field in cls.TOTAL_FIELDS.items()
+        })
+        return {
+            (owner_id, timezone.localdate(date_added))
+            for owner_id, date_added in analyses.values_list("owner_id", "date_added")
+        }
+
+    def refresh_nutrition_rollup(self):
+        """Bring the owner's daily rollup for this analysis' day up to date on commit."""
+        from core.analytics.models import DailyNutritionRollup
+
+        DailyNutritionRollup.schedule_refresh(self.owner_id, timezone.localdate(self.date_added))
 
-    @property
-    def total_fat(self):
-        return sum(food.fat or 0 for food in self.detected_foods.all())
-    
 
     class EventData:
         """
@@ -118,6 +425,18 @@ class FoodAnalysis(BaseModelMixin):
                 },
             }
         
+        @staticmethod
+        def on_analysis_pending(instance: "FoodAnalysis") -> dict:
+
+            return {
+                "type": enums.FoodAnalysisStatus.ANALYSIS_PENDING.value,
+                "data": {
+                    "message": "Analysis Restarted!",
+                    "id": instance.id,
+                    "timestamp": timezone.now().isoformat(),
+                },
+            }
+
         @staticmethod
         def on_analysis_failed(instance):
 
@@ -132,16 +451,145 @@ class FoodAnalysis(BaseModelMixin):
             return data
         
     
-    def emit_event(self, event_type):
-        emit_websocket_event(
-            self, event_type
-        )
+    def emit_event_on_commit(self, event_type):
+        """
+        Queue the event in the outbox within the surrounding transaction, so
+        it is sent once the data it announces is committed, and never lost.
+        """
+        queue_websocket_event(self, event_type)
         self.push_sent = True
-        self.push_sent_at  = timezone.now()
-        self.save(update_fields=[
-            "push_sent", 
-            "push_sent_at"
-        ])
+        self.push_sent_at = timezone.now()
+        FoodAnalysis.objects.filter(id=self.id).update(
+            push_sent=True, push_sent_at=self.push_sent_at
+        )
+
+    def save_stage_timings(self, timings: dict):
+        self.stage_timings = timings
+        FoodAnalysis.objects.filter(id=self.id).update(stage_timings=timings)
+
+    @classmethod
+    def get_completed_near_duplicate(cls, file_obj: FileModel):
+        """Return the closest completed analysis of a near-identical image, if any."""
+        duplicate_ids = file_obj.get_near_duplicate_ids()
+        if not duplicate_ids:
+            return None
+
+        analyses = {
+            analysis.food_image_id: analysis
+            for analysis in cls.objects.filter(
+                owner_id=file_obj.owner_id,
+                food_image_id__in=duplicate_ids,
+                analysis_status=enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value,
+                is_mock_data=False,
+            )
+        }
+        for file_id in duplicate_ids:
+            if file_id in analyses:
+                return analyses[file_id]
+        return None
+
+    def copy_result_from(self, source: "FoodAnalysis") -> bool:
+        """
+        Fill this pending analysis from a completed one instead of calling the
+        model, recording the source in `duplicate_of`.
+        """
+        detected_foods = [
+            DetectedFood(
+                analysis=self,
+                name=food.name,
+                confidence=food.confidence,
+                portion_estimate=food.portion_estimate,
+                calories=food.calories,
+                protein=food.protein,
+                carbs=food.carbs,
+                fat=food.fat,
+                dairy=food.dairy,
+                vegetable=food.vegetable,
+                fruit=food.fruit,
+                micronutrients=food.micronutrients,
+                food_group=food.food_group,
+                estimated_grams=food.estimated_grams,
+                segmentation_mask=food.segmentation_mask,
+                nutrient_reference_id=food.nutrient_reference_id,
+            )
+            for food in source.detected_foods.all()
+        ]
+
+        with transaction.atomic():
+            self.meal_type = source.meal_type
+            self.balance_score = source.balance_score
+            self.next_meal_recommendations = source.next_meal_recommendations
+            self.is_mock_data = source.is_mock_data
+            self.segmentation = source.segmentation
+            self.duplicate_of = source.duplicate_of or source
+            if not self.transition(
+                [self.Status.ANALYSIS_PENDING.value],
+                self.Status.ANALYSIS_COMPLETED.value,
+                update_fields=[
+                    "meal_type",
+                    "balance_score",
+                    "next_meal_recommendations",
+                    "is_mock_data",
+                    "segmentation",
+                    "duplicate_of",
+                    *self.apply_totals(detected_foods),
+                ],
+            ):
+                return False
+            DetectedFood.objects.bulk_create(detected_foods)
+            self.refresh_nutrition_rollup()
+
+            self.emit_event_on_commit(
+                enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value.lower()
+            )
+        return True
+
+    def save_result(self, result: dict, is_mock: bool = False, lease_owner: str = None) -> bool:
+        """
+        Persist an analysis result and its detected foods in one transaction,
+        provided the analysis is still processing under `lease_owner`. The
+        completed event is only emitted once the rows are committed.
+        """
+        detected_foods = [
+            DetectedFood.from_result(self, food_data)
+            for food_data in result.get("detected_foods", [])
+        ]
+
+        with transaction.atomic():
+            self.meal_type = result.get("meal_type")
+            self.balance_score = result.get("balance_score")
+            self.next_meal_recommendations = result.get("next_meal_recommendations", {})
+            self.is_mock_data = is_mock
+            self.segmentation = result.get("segmentation") or {}
+            self.error_message = None
+            if not self.transition(
+                [self.Status.ANALYSIS_PROCESSING.value],
+                self.Status.ANALYSIS_COMPLETED.value,
+                update_fields=[
+                    "meal_type",
+                    "balance_score",
+                    "next_meal_recommendations",
+                    "is_mock_data",
+                    "segmentation",
+                    "error_message",
+                    *self.apply_totals(detected_foods),
+                ],
+                lease_owner=lease_owner,
+            ):
+                logger.warning(f"Analysis {self.id} is no longer held by {lease_owner}, discarding result")
+                return False
+
+            DetectedFood.objects.filter(analysis=self).delete()
+            DetectedFood.objects.bulk_create(detected_foods)
+            self.refresh_nutrition_rollup()
+            FileModel.objects.filter(id=self.food_image_id).update(
+                currently_under_processing=False
+            )
+
+            self.emit_event_on_commit(
+                enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value.lower()
+            )
+        return True
 
 
  
@@ -231,6 +679,35 @@ class DetectedFood(BaseModelMixin):
         default=dict,
         help_text=_("Micronutrient details like vitamins and minerals")
     )
+    food_group = models.CharField(
+        _("Food Group"),
+        max_length=50,
+        null=True,
+        blank=True,
+    )
+    estimated_grams = models.DecimalField(
+        _("Estimated Weight (g)"),
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_("Portion weight the nutrient values correspond to")
+    )
+    segmentation_mask = models.JSONField(
+        _("Segmentation Mask"),
+        null=True,
+        blank=True,
+        help_text=_("Run-length encoded mask of this food's region in the image")
+    )
+    nutrient_reference = models.ForeignKey(
+        to="NutrientReference",
+        on_delete=models.SET_NULL,
+        related_name="detected_foods",
+        null=True,
+        blank=True,
+        verbose_name=_("Nutrient Reference"),
+        help_text=_("Reference entry the nutrient values were derived from")
+    )
 
     class Meta:
         verbose_name = _("Detected Food")
@@ -239,3 +716,144 @@ class DetectedFood(BaseModelMixin):
 
     def __str__(self):
         return f"{self.name} ({self.portion_estimate})"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.analysis.recalculate_totals()
+
+    def delete(self, *args, **kwargs):
+        analysis = self.analysis
+        result = super().delete(*args, **kwargs)
+        analysis.recalculate_totals()
+        return result
+
+    @classmethod
+    def from_result(cls, analysis: FoodAnalysis, food_data: dict) -> "DetectedFood":
+        """Build an unsaved instance from a single `detected_foods` entry."""
+        nutritional_info = food_data.get("nutritional_info") or {}
+        return cls(
+            analysis=analysis,
+            name=food_data.get("name") or "Unknown",
+            confidence=food_data.get("confidence"),
+            portion_estimate=food_data.get("portion_estimate"),
+            calories=nutritional_info.get("calories"),
+            protein=nutritional_info.get("protein"),
+            carbs=nutritional_info.get("carbs"),
+            fat=nutritional_info.get("fat"),
+            dairy=nutritional_info.get("dairy"),
+            vegetable=nutritional_info.get("vegetable"),
+            fruit=nutritional_info.get("fruit"),
+            micronutrients=food_data.get("micronutrients") or {},
+            food_group=food_data.get("food_group"),
+            estimated_grams=food_data.get("estimated_grams") or None,
+            segmentation_mask=food_data.get("segmentation_mask"),
+            nutrient_reference_id=food_data.get("nutrient_reference_id"),
+        )
+
+
+class CachedAnalysisResult(BaseModelMixin):
+    """
+    Database tier of the analysis result cache. Rows are keyed on a SHA-256
+    of the image bytes, prompt and model so identical uploads skip Gemini.
+    """
+    content_hash = models.CharField(
+        _("Content Hash"),
+        max_length=64,
+        unique=True,
+        null=False,
+        blank=False,
+    )
+    model_name = models.CharField(
+        _("Model Name"),
+        max_length=100,
+        null=False,
+        blank=False,
+    )
+    result = models.JSONField(
+        _("Analysis Result"),
+        null=False,
+        blank=False,
+        default=dict,
+    )
+    hit_count = models.PositiveIntegerField(
+        _("Hit Count"),
+        default=0,
+    )
+    last_accessed_at = models.DateTimeField(
+        _("Last Accessed At"),
+        default=timezone.now,
+        db_index=True,
+    )
+    expires_at = models.DateTimeField(
+        _("Expires At"),
+        null=False,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = _("Cached Analysis Result")
+        verbose_name_plural = _("Cached Analysis Results")
+        ordering = ["-last_accessed_at"]
+
+    def __str__(self):
+        return f"{self.model_name}-{self.content_hash[:12]}"
+
+
+class NutrientReference(BaseModelMixin):
+    """
+    Per-100 g nutrient values for a food, loaded from an open dataset with
+    `manage.py load_nutrient_reference`. Used instead of model-estimated
+    nutrients when NUTRIENT_SOURCE is "reference".
+    """
+    name = models.CharField(
+        _("Food Name"),
+        max_length=255,
+        unique=True,
+        null=False,
+        blank=False,
+    )
+    aliases = models.JSONField(
+        _("Aliases"),
+        default=list,
+        blank=True,
+        help_text=_("Alternative names matched to this food")
+    )
+    food_group = models.CharField(
+        _("Food Group"),
+        max_length=50,
+        null=True,
+        blank=True,
+    )
+    source = models.CharField(
+        _("Source Dataset"),
+        max_length=100,
+        null=True,
+        blank=True,
+    )
+    source_id = models.CharField(
+        _("Source ID"),
+        max_length=100,
+        null=True,
+        blank=True,
+    )
+    calories = models.DecimalField(_("Calories per 100 g"), max_digits=10, decimal_places=2, default=0)
+    protein = models.DecimalField(_("Protein (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    carbs = models.DecimalField(_("Carbohydrates (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    fat = models.DecimalField(_("Fat (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    dairy = models.DecimalField(_("Dairy (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    vegetable = models.DecimalField(_("Vegetable (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    fruit = models.DecimalField(_("Fruit (g) per 100 g"), max_digits=10, decimal_places=2, default=0)
+    micronutrients = models.JSONField(
+        _("Micronutrients per 100 g"),
+        default=dict,
+        blank=True,
+        help_text=_("Same keys and units as DetectedFood.micronutrients")
+    )
+
+    class Meta:
+        verbose_name = _("Nutrient Reference")
+        verbose_name_plural = _("Nutrient References")
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,154 @@
+import copy
+import math
+import threading
+from decimal import Decimal
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from loguru import logger
+
+from core.utils.helpers.nutrients import NutrientTable
+from .models import DetectedFood, NutrientReference
+from .schemas import MACRO_FIELDS, MICRONUTRIENT_FIELDS
+
+
+NUTRIENT_COLUMNS = [*MACRO_FIELDS, *MICRONUTRIENT_FIELDS]
+
+
+def known_values(row, fields) -> dict:
+    """The scaled reference values of `fields`, leaving out those the reference lacks."""
+    nutrients = dict(zip(NUTRIENT_COLUMNS, row.tolist()))
+    return {field: nutrients[field] for field in fields if not math.isnan(nutrients[field])}
+
+
+class NutrientReferenceIndex:
+    """
+    Process-local NutrientTable built from NutrientReference rows.
+
+    The table is rebuilt when the version in the shared cache changes, which
+    `bump_version` does after every reference load, so all workers pick up
+    new data without a restart.
+    """
+
+    VERSION_KEY = "nutrient-reference-version"
+
+    def __init__(self):
+        self._table: Optional[NutrientTable] = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def current_version(cls):
+        try:
+            return cache.get(cls.VERSION_KEY, 0)
+        except Exception as e:
+            logger.warning(f"Nutrient reference version read failed: {e}")
+            return 0
+
+    @classmethod
+    def bump_version(cls):
+        try:
+            cache.add(cls.VERSION_KEY, 0, timeout=None)
+            cache.incr(cls.VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Nutrient reference version bump failed: {e}")
+
+    @property
+    def table(self) -> NutrientTable:
+        version = self.current_version()
+        with self._lock:
+            if self._table is None or version != self._version:
+                self._table = self.build_table()
+                self._version = version
+            return self._table
+
+    @staticmethod
+    def build_table() -> NutrientTable:
+        table = NutrientTable(NUTRIENT_COLUMNS)
+        references = NutrientReference.objects.only(
+            "id", "name", "aliases", "micronutrients", *MACRO_FIELDS
+        )
+        for reference in references.iterator(chunk_size=2000):
+            micronutrients = reference.micronutrients or {}
+            table.add(
+                reference.id,
+                [reference.name, *(reference.aliases or [])],
+                [getattr(reference, field) for field in MACRO_FIELDS]
+                + [micronutrients.get(field) for field in MICRONUTRIENT_FIELDS],
+            )
+        logger.info(f"Built nutrient reference index ({len(table.ids)} foods)")
+        return table.freeze()
+
+    def lookup(self, names: List[str], grams: List[float]):
+        """Return (reference_ids, nutrient rows) for each name and portion weight."""
+        table = self.table
+        positions = table.match(names, settings.NUTRIENT_MATCH_MIN_SCORE)
+        values = table.scale(positions, grams)
+        reference_ids = [table.ids[p] if p is not None else None for p in positions]
+        return reference_ids, values
+
+    def enrich(self, result: dict) -> dict:
+        """
+        Return a copy of an analysis result whose foods carry reference
+        nutrients for their estimated grams. Foods without a weight or a
+        matching reference keep whatever values they had, with no reference
+        recorded. Nutrients the matched reference lacks keep the model's value.
+        """
+        result = copy.deepcopy(result)
+        weighed = []
+        for food in result.get("detected_foods", []):
+            food["nutrient_reference_id"] = None
+            food.setdefault("nutritional_info", {})
+            food.setdefault("micronutrients", {})
+            # scaling a reference to 0 grams would zero the model's own estimate
+            if (food.get("estimated_grams") or 0) > 0:
+                weighed.append(food)
+            else:
+                logger.info(f"No portion weight for '{food.get('name')}', keeping the model's nutrients")
+        if not weighed:
+            return result
+
+        reference_ids, values = self.lookup(
+            [food.get("name", "") for food in weighed],
+            [food["estimated_grams"] for food in weighed],
+        )
+        for food, reference_id, row in zip(weighed, reference_ids, values):
+            if reference_id is None:
+                logger.info(f"No nutrient reference for '{food.get('name')}'")
+                continue
+            food["nutrient_reference_id"] = reference_id
+            food["nutritional_info"] = {**food["nutritional_info"], **known_values(row, MACRO_FIELDS)}
+            food["micronutrients"] = {**food["micronutrients"], **known_values(row, MICRONUTRIENT_FIELDS)}
+        return result
+
+    def rederive(self, foods: List[DetectedFood]) -> List[DetectedFood]:
+        """
+        Recompute nutrients in place for stored foods with a known weight and
+        return the ones that matched a reference. Values the reference lacks
+        are left as they were.
+        """
+        foods = [food for food in foods if food.estimated_grams]
+        if not foods:
+            return []
+
+        reference_ids, values = self.lookup(
+            [food.name for food in foods],
+            [float(food.estimated_grams) for food in foods],
+        )
+        updated = []
+        for food, reference_id, row in zip(foods, reference_ids, values):
+            if reference_id is None:
+                continue
+            for field, value in known_values(row, MACRO_FIELDS).items():
+                setattr(food, field, Decimal(str(value)))
+            food.micronutrients = {
+                **(food.micronutrients or {}),
+                **known_values(row, MICRONUTRIENT_FIELDS),
+            }
+            food.nutrient_reference_id = reference_id
+            updated.append(food)
+        return updated
+
+
+nutrient_reference = NutrientReferenceIndex()
@@ -0,0 +1,278 @@
+import copy
+import math
+import re
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from loguru import logger
+
+from core.utils.helpers import metrics, segmentation
+from .batching import AnalysisBatcher
+from .models import DetectedFood, FoodAnalysis
+from .nutrients import NUTRIENT_COLUMNS, known_values, nutrient_reference
+from .schemas import MACRO_FIELDS, MICRONUTRIENT_FIELDS
+from .services import read_image
+
+
+NUTRIENT_FIELDS = ["calories", "protein", "carbs", "fat", "dairy", "vegetable", "fruit"]
+
+# plates must cover this share of the frame before they are trusted as a ruler
+MIN_PLATE_FRACTION = 0.05
+
+
+PORTION_WEIGHT = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|g|grams?|oz|ounces?|lbs?|pounds?)\b", re.IGNORECASE)
+GRAMS_PER_UNIT = {"kg": 1000, "g": 1, "gram": 1, "grams": 1, "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+                  "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6}
+
+
+def base_grams(estimated_grams, portion_estimate: Optional[str]) -> float:
+    """
+    Weight the food's nutrients were given for: its gram estimate, else a
+    weight stated in the portion text ("150g", "0.2 kg"), else 0 if unknown.
+    """
+    if estimated_grams and float(estimated_grams) > 0:
+        return float(estimated_grams)
+    match = PORTION_WEIGHT.search(portion_estimate or "")
+    if not match:
+        return 0
+    return float(match.group(1)) * GRAMS_PER_UNIT[match.group(2).lower()]
+
+
+def scale_nutrients(values: dict, factor: float) -> dict:
+    return {
+        key: round(value * factor, 2) if isinstance(value, (int, float)) else value
+        for key, value in (values or {}).items()
+    }
+
+
+class PortionEstimator:
+    """
+    Estimates portion weights from food-group segmentation masks.
+
+    The plate (assumed PLATE_DIAMETER_CM across) converts pixel areas to
+    cm²; without a visible plate the frame is assumed to cover
+    FOOD_SEGMENTATION_FRAME_AREA_CM2. Each group's area times its
+    `grams_per_cm2` gives the group weight, split between the detected foods
+    of that group by their regions. Nutrient values are rescaled so they
+    always correspond to `estimated_grams`; when the weight they were given
+    for is unknown, they come from the reference table instead.
+    """
+
+    def __init__(self):
+        self.plate_area_cm2 = math.pi * (settings.PLATE_DIAMETER_CM / 2) ** 2
+        self.frame_area_cm2 = settings.FOOD_SEGMENTATION_FRAME_AREA_CM2
+        self.batcher = AnalysisBatcher(
+            self.segment_batch,
+            max_size=settings.FOOD_SEGMENTATION_BATCH_MAX_SIZE,
+            max_wait_ms=settings.FOOD_SEGMENTATION_BATCH_MAX_WAIT_MS,
+        )
+
+    @property
+    def model(self) -> segmentation.FoodSegmentationModel:
+        return segmentation.FoodSegmentationModel.get_instance()
+
+    def segment_batch(self, images_data: List[bytes]) -> List[segmentation.Segmentation]:
+        return self.model.segment(images_data)
+
+    def segment(self, image_data: bytes) -> segmentation.Segmentation:
+        result = self.batcher.submit(image_data) if self.batcher.enabled else None
+        return result or self.segment_batch([image_data])[0]
+
+    def cm2_per_pixel(self, seg: segmentation.Segmentation) -> float:
+        plate_area = seg.area(segmentation.PLATE)
+        plate_disc = plate_area + seg.food_area
+        if plate_area and plate_disc >= MIN_PLATE_FRACTION * seg.size:
+            return self.plate_area_cm2 / plate_disc
+        return self.frame_area_cm2 / seg.size
+
+    def allocate(
+        self, seg: segmentation.Segmentation, foods: List[Tuple[Optional[str], Optional[float]]]
+    ) -> Tuple[List[Tuple[Optional[float], Optional[dict]]], dict]:
+        """
+        Split each food group's segmented weight between `foods`, given as
+        (food_group, original_grams) pairs. Returns one (grams, rle_mask) per
+        food, (None, None) for foods whose group was not found in the image,
+        plus the segmentation metadata stored on the analysis.
+
+        Foods sharing a group share its connected regions, handed out in
+        proportion to their original estimates, so every food gets its own
+        mask and a weight from its own area (or a share of the group's weight
+        when there are fewer regions than foods).
+        """
+        scale = self.cm2_per_pixel(seg)
+        portions: List[Tuple[Optional[float], Optional[dict]]] = [(None, None)] * len(foods)
+
+        groups = {}
+        for index, (food_group, _) in enumerate(foods):
+            groups.setdefault((food_group or "").lower(), []).append(index)
+
+        for food_group, indexes in groups.items():
+            label_index = seg.index(food_group)
+            area = seg.area(food_group) if label_index is not None else 0
+            if not area or food_group in (segmentation.BACKGROUND, segmentation.PLATE):
+                continue
+
+            grams_per_pixel = scale * seg.labels[label_index].grams_per_cm2
+            if len(indexes) == 1:
+                portions[indexes[0]] = (round(area * grams_per_pixel, 2), seg.mask(food_group))
+                continue
+
+            weights = [float(foods[i][1] or 0) for i in indexes]
+            if sum(weights) <= 0:
+                weights = [1.0] * len(indexes)
+            masks = self.split_regions(seg.label_map == label_index, weights)
+            # with fewer regions than foods the areas say nothing about the
+            # ones left out, so the whole group is split by weight instead
+            by_area = all(mask is not None for mask in masks)
+            for index, weight, mask in zip(indexes, weights, masks):
+                pixels = int(mask.sum()) if by_area else area * weight / sum(weights)
+                portions[index] = (
+                    round(pixels * grams_per_pixel, 2),
+                    segmentation.rle_encode(mask) if mask is not None else None,
+                )
+
+        metadata = {
+            "model_version": seg.model_version,
+            "size": list(seg.label_map.shape),
+            "cm2_per_pixel": round(scale, 5),
+            "plate_mask": seg.mask(segmentation.PLATE),
+        }
+        return portions, metadata
+
+    @staticmethod
+    def split_regions(mask, weights: List[float]) -> list:
+        """
+        Assign the connected regions of `mask` to foods with the given
+        weights: the largest regions go one each to the heaviest foods, the
+        rest to whichever food is furthest below its share of the area.
+        Foods left without a region get None.
+        """
+        regions = segmentation.connected_components(mask)
+        total_area = sum(int(region.sum()) for region in regions)
+        targets = [total_area * weight / sum(weights) for weight in weights]
+        assigned = [None] * len(weights)
+        areas = [0] * len(weights)
+
+        by_weight = sorted(range(len(weights)), key=lambda i: -weights[i])
+        for index, region in zip(by_weight, regions):
+            assigned[index], areas[index] = region, int(region.sum())
+        for region in regions[len(weights):]:
+            index = max(range(len(weights)), key=lambda i: targets[i] - areas[i])
+            assigned[index] = assigned[index] | region
+            areas[index] += int(region.sum())
+        return assigned
+
+    def reference_nutrients(self, names: List[str], grams: List[float]) -> List[Optional[dict]]:
+        """
+        Nutrients from the reference table for each (name, grams), None where
+        unmatched. Values the reference lacks are left out.
+        """
+        try:
+            reference_ids, values = nutrient_reference.lookup(names, grams)
+        except Exception as e:
+            logger.warning(f"Nutrient reference lookup for portions failed: {e}")
+            return [None] * len(names)
+        return [
+            known_values(row, NUTRIENT_COLUMNS) if reference_id is not None else None
+            for reference_id, row in zip(reference_ids, values)
+        ]
+
+    def apply_to_result(self, image_data: bytes, result: dict) -> dict:
+        """Return a copy of an analysis result with segmented portions applied."""
+        seg = self.segment(image_data)
+        result = copy.deepcopy(result)
+        foods = result.get("detected_foods", [])
+        portions, result["segmentation"] = self.allocate(
+            seg, [(food.get("food_group"), food.get("estimated_grams")) for food in foods]
+        )
+
+        unscaled = []
+        for food, (grams, mask) in zip(foods, portions):
+            food["segmentation_mask"] = mask
+            if grams is None:
+                continue
+            base = base_grams(food.get("estimated_grams"), food.get("portion_estimate"))
+            food["estimated_grams"] = grams
+            if base:
+                factor = grams / base
+                food["nutritional_info"] = scale_nutrients(food.get("nutritional_info"), factor)
+                food["micronutrients"] = scale_nutrients(food.get("micronutrients"), factor)
+            else:
+                unscaled.append(food)
+
+        # no weight the nutrients belong to: take per-gram reference values instead
+        nutrients = self.reference_nutrients(
+            [food.get("name", "") for food in unscaled], [food["estimated_grams"] for food in unscaled]
+        ) if unscaled else []
+        for food, values in zip(unscaled, nutrients):
+            if values is None:
+                logger.info(f"Keeping unscaled nutrients for '{food.get('name')}' at {food['estimated_grams']}g")
+                continue
+            food["nutritional_info"] = {field: values[field] for field in MACRO_FIELDS if field in values}
+            food["micronutrients"] = {field: values[field] for field in MICRONUTRIENT_FIELDS if field in values}
+        return result
+
+    def recompute(self, analyses: List[FoodAnalysis]) -> int:
+        """
+        Re-run segmentation for stored analyses in one batch and rescale
+        their detected foods. Returns the number of analyses updated.
+        """
+        images_data, loaded = [], []
+        for analysis in analyses:
+            try:
+                images_data.append(read_image(analysis.food_image))
+                loaded.append(analysis)
+            except Exception as e:
+                logger.warning(f"Skipping portions for analysis {analysis.id}: {e}")
+        if not loaded:
+            return 0
+
+        with metrics.stage("segmentation"):
+            segmentations = self.segment_batch(images_data)
+
+        for analysis, seg in zip(loaded, segmentations):
+            foods = list(analysis.detected_foods.all())
+            portions, metadata = self.allocate(
+                seg, [(food.food_group, food.estimated_grams) for food in foods]
+            )
+            unscaled = []
+            for food, (grams, mask) in zip(foods, portions):
+                food.segmentation_mask = mask
+                if grams is None:
+                    continue
+                base = base_grams(food.estimated_grams, food.portion_estimate)
+                food.estimated_grams = Decimal(str(grams))
+                if not base:
+                    unscaled.append(food)
+                    continue
+                factor = Decimal(str(grams)) / Decimal(str(base))
+                for field in NUTRIENT_FIELDS:
+                    value = getattr(food, field)
+                    if value is not None:
+                        setattr(food, field, round(value * factor, 2))
+                food.micronutrients = scale_nutrients(food.micronutrients, float(factor))
+
+            nutrients = self.reference_nutrients(
+                [food.name for food in unscaled], [float(food.estimated_grams) for food in unscaled]
+            ) if unscaled else []
+            for food, values in zip(unscaled, nutrients):
+                if values is None:
+                    continue
+                for field in MACRO_FIELDS:
+                    setattr(food, field, Decimal(str(values[field])) if field in values else None)
+                food.micronutrients = {field: values[field] for field in MICRONUTRIENT_FIELDS if field in values}
+
+            with transaction.atomic():
+                DetectedFood.objects.bulk_update(
+                    foods,
+                    [*NUTRIENT_FIELDS, "micronutrients", "estimated_grams", "segmentation_mask"],
+                )
+                analysis.segmentation = metadata
+                analysis.save(update_fields=["segmentation"])
+                analysis.recalculate_totals()
+        return len(loaded)
+
+
+portion_estimator = PortionEstimator()
@@ -0,0 +1,102 @@
+"""
+Response contract for food image analysis.
+
+The models double as the `response_schema` sent to Gemini and as the
+validator for its replies; field descriptions carry the units so the prompt
+does not need a JSON example.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from core.utils import enums
+
+
+def clamp_unit_interval(value: Optional[float]) -> Optional[float]:
+    if value is None:
+        return None
+    return min(max(value, 0.0), 1.0)
+
+
+class NutritionalInfo(BaseModel):
+    calories: float = Field(0, description="Energy in kcal")
+    protein: float = Field(0, description="Protein in grams")
+    carbs: float = Field(0, description="Carbohydrates in grams")
+    fat: float = Field(0, description="Fat in grams")
+    dairy: float = Field(0, description="Dairy content in grams")
+    vegetable: float = Field(0, description="Vegetable content in grams")
+    fruit: float = Field(0, description="Fruit content in grams")
+
+
+class Micronutrients(BaseModel):
+    vitamin_c: float = Field(0, description="Vitamin C in mg")
+    vitamin_d: float = Field(0, description="Vitamin D in mcg")
+    vitamin_b12: float = Field(0, description="Vitamin B12 in mcg")
+    calcium: float = Field(0, description="Calcium in mg")
+    iron: float = Field(0, description="Iron in mg")
+    zinc: float = Field(0, description="Zinc in mg")
+    magnesium: float = Field(0, description="Magnesium in mg")
+    folate: float = Field(0, description="Folate in mg")
+
+
+class DetectedFoodItem(BaseModel):
+    name: str = Field(description="Specific common name of the food, e.g. 'boiled white rice'")
+    confidence: float = Field(description="Detection confidence between 0 and 1")
+    portion_estimate: str = Field(description="Estimated portion size, e.g. '1 cup' or '150g'")
+    estimated_grams: float = Field(0, description="Estimated weight of the portion in grams")
+    food_group: str = Field(description="One of Carbs, Proteins, Vegetables, Fruits, Dairy")
+
+    _clamp_confidence = field_validator("confidence")(clamp_unit_interval)
+
+
+class DetectedFoodResult(DetectedFoodItem):
+    nutritional_info: NutritionalInfo
+    micronutrients: Micronutrients
+
+
+class NextMealRecommendations(BaseModel):
+    nutritional_recommendations: List[str] = Field(
+        description="2-3 one-liners on what to eat next given this meal's nutritional gaps"
+    )
+    balance_improvements: List[str] = Field(
+        description="2-3 one-liners naming underrepresented food groups or nutrients and foods that fill them"
+    )
+    timing_recommendations: List[str] = Field(
+        description="2-3 one-liners on meal timing: foods to avoid or include at this time of day"
+    )
+
+
+class FoodAnalysisItemsResult(BaseModel):
+    """Items and portions only; nutrients are filled in from the reference table."""
+    detected_foods: List[DetectedFoodItem]
+    meal_type: enums.MealType
+    balance_score: float = Field(description="Nutritional balance rating between 0 and 1")
+    next_meal_recommendations: NextMealRecommendations
+
+    _clamp_balance_score = field_validator("balance_score")(clamp_unit_interval)
+
+
+class FoodAnalysisResult(FoodAnalysisItemsResult):
+    detected_foods: List[DetectedFoodResult]
+
+
+class FoodAnalysisBatchSlot(BaseModel):
+    image_index: int = Field(description="Index of the image this analysis belongs to, starting at 0")
+    analysis: FoodAnalysisResult
+
+
+class FoodAnalysisBatchResult(BaseModel):
+    results: List[FoodAnalysisBatchSlot] = Field(description="Exactly one entry per image")
+
+
+class FoodAnalysisItemsBatchSlot(BaseModel):
+    image_index: int = Field(description="Index of the image this analysis belongs to, starting at 0")
+    analysis: FoodAnalysisItemsResult
+
+
+class FoodAnalysisItemsBatchResult(BaseModel):
+    results: List[FoodAnalysisItemsBatchSlot] = Field(description="Exactly one entry per image")
+
+
+MACRO_FIELDS = list(NutritionalInfo.model_fields)
+MICRONUTRIENT_FIELDS = list(Micronutrients.model_fields)
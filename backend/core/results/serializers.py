@@ -11,6 +11,8 @@ class DetectedFoodSerializer(serializers.ModelSerializer):
             "name",
             "confidence",
             "portion_estimate",
+            "estimated_grams",
+            "food_group",
             "calories",
             "protein",
             "carbs",
@@ -21,10 +23,6 @@ class DetectedFoodSerializer(serializers.ModelSerializer):
 class FoodAnalysisSerializer:
     class List(serializers.ModelSerializer):
         detected_foods = DetectedFoodSerializer(many=True, read_only=True)
-        total_calories = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_protein = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_carbs = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_fat = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
         image_url = serializers.SerializerMethodField()
 
         def get_image_url(self, obj):
@@ -42,6 +40,7 @@ class FoodAnalysisSerializer:
                 "balance_score",
                 "next_meal_recommendations",
                 "is_mock_data",
+                "duplicate_of",
                 "analysis_status",
                 "error_message",
                 "detected_foods",
@@ -49,16 +48,15 @@ class FoodAnalysisSerializer:
                 "total_protein",
                 "total_carbs",
                 "total_fat",
+                "total_dairy",
+                "total_vegetable",
+                "total_fruit",
                 "date_added",
             ]
 
 
     class Detail(serializers.ModelSerializer):
         detected_foods = DetectedFoodSerializer(many=True, read_only=True)
-        total_calories = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_protein = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_carbs = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
-        total_fat = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
         image_url = serializers.SerializerMethodField()
         owner_name = serializers.SerializerMethodField()
 
@@ -82,6 +80,7 @@ class FoodAnalysisSerializer:
                 "balance_score",
                 "next_meal_recommendations",
                 "is_mock_data",
+                "duplicate_of",
                 "analysis_status",
                 "error_message",
                 "detected_foods",
@@ -89,6 +88,9 @@ class FoodAnalysisSerializer:
                 "total_protein",
                 "total_carbs",
                 "total_fat",
+                "total_dairy",
+                "total_vegetable",
+                "total_fruit",
                 "date_added",
                 "date_last_modified",
             ]
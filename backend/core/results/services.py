@@ -1,131 +1,488 @@
+import hashlib
 import json
-from typing import Tuple
+import threading
+import time
+from datetime import timedelta
+from typing import Any, List, Optional, Tuple
 
+import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
 from loguru import logger
+from pydantic import ValidationError
 
 from .mock import get_mock_analysis_response
 from core.utils.helpers.recommendations import WeeklyRecommendationHelper
+from core.utils import enums
+from core.utils.helpers import images, metrics, storage, vision
 from core.utils.services import GeminiBaseService
+from .models import CachedAnalysisResult
+from .batching import AnalysisBatcher
+from .schemas import (
+    FoodAnalysisBatchResult,
+    FoodAnalysisItemsBatchResult,
+    FoodAnalysisItemsResult,
+    FoodAnalysisResult,
+)
 
 
 
+RECOMMENDATIONS_GUIDANCE = """
+For next_meal_recommendations:
+- nutritional_recommendations: what to eat next based on the nutritional content and gaps in this meal, following evidence-based health practices.
+- balance_improvements: which food groups or nutrients are underrepresented and specific foods to eat next to achieve better dietary balance.
+- timing_recommendations: meal timing best practices, including foods to avoid or reduce at certain times of day (e.g., heavy carbs late at night) and foods beneficial at specific meal times.
+
+Keep all recommendations concise, actionable one-liners.
+"""
+
 ANALYSIS_PROMPT = """
-Analyze this food image and provide nutritional information in the following JSON format:
-{
-    "detected_foods": [
-        {
-            "name": "food name",
-            "confidence": 0.0 to 1.0,
-            "portion_estimate": "estimated portion size",
-            "nutritional_info": {
-                "calories": number,
-                "protein": number in grams,
-                "carbs": number in grams,
-                "fat": number in grams,
-                "dairy": number in grams,
-                "vegetable": number in grams,
-                "fruit": number in grams
-            },
-            "micronutrients": {
-                "vitamin_c": number in mg,
-                "vitamin_d": number in mcg,
-                "vitamin_b12": number in mcg,
-                "calcium": number in mg,
-                "iron": number in mg,
-                "zinc": number in mg,
-                "magnesium": number in mg,
-                "folate": number in mg
-            },
-            "food_group": "Carbs/Proteins/Vegetables/Fruits/Dairy"
-        }
-    ],
-    "meal_type": "Breakfast/Lunch/Dinner/Snack",
-    "balance_score": 0.0 to 1.0 (nutritional balance rating),
-    "next_meal_recommendations": {
-        "nutritional_recommendations": [
-            "One-liner recommendation based on current meal's nutritional content",
-            "One-liner recommendation based on health best practices"
-        ],
-        "balance_improvements": [
-            "One-liner suggestion to improve diet balance based on missing food groups",
-            "One-liner suggestion for nutrients lacking in the analyzed meal"
-        ],
-        "timing_recommendations": [
-            "One-liner advice on foods to avoid at this meal time",
-            "One-liner advice on foods to include at this meal time",
-            "One-liner age-appropriate dietary timing suggestion"
-        ]
-    }
-}
+Analyze this food image and identify every food on the plate with its
+nutritional content.
 
-Be accurate with portion estimates and nutritional values and micronutrients values.
+Be accurate with portion estimates, nutritional values and micronutrient values.
+""" + RECOMMENDATIONS_GUIDANCE
 
-For next_meal_recommendations:
-- nutritional_recommendations: Provide 2-3 one-liner bullet points suggesting what to eat next based on the nutritional content and gaps in the current meal, following evidence-based health practices.
-- balance_improvements: Provide 2-3 one-liner bullet points identifying which food groups or nutrients are underrepresented and specific foods to eat in the next meal to achieve better dietary balance.
-- timing_recommendations: Provide 2-3 one-liner bullet points advising on meal timing best practices, including foods to avoid or reduce at certain times of day (e.g., heavy carbs late at night), and foods beneficial to consume at specific meal times for optimal health.
+# used with NUTRIENT_SOURCE=reference, where nutrients come from NutrientReference
+ITEMS_ANALYSIS_PROMPT = """
+Analyze this food image and identify every food on the plate. Name each food
+specifically, including how it is prepared (e.g. "fried plantain"), and
+estimate its portion weight in grams. Nutrient values are looked up
+separately, so do not estimate them.
+""" + RECOMMENDATIONS_GUIDANCE
 
-Keep all recommendations concise, actionable, and in one-liner bullet point format.
-Return ONLY valid JSON, no additional text.
+BATCH_INSTRUCTIONS = """
+You are given {count} separate meal images, each preceded by its label
+"Image <index>:". Analyze every image independently and return one entry in
+`results` per image, with `image_index` set to that image's index.
 """
 
+
+def read_image(file_obj) -> bytes:
+    """Read an uploaded FileModel image straight from its storage backend."""
+    with metrics.stage("storage_fetch"):
+        reader = storage.get_storage_reader(file_obj.file.storage)
+        return reader.read(file_obj.file.name)
+
+
+class AnalysisResultCache:
+    """
+    Two-tier cache of Gemini analysis results.
+
+    Keys are a SHA-256 of the model name, prompt and raw image bytes. Redis is
+    checked first; the `CachedAnalysisResult` table is the fallback when the
+    entry was evicted or Redis is unavailable. Hits on either tier count
+    towards the table's access stats, which `prune` evicts by.
+    """
+
+    KEY_PREFIX = "analysis-result"
+
+    def __init__(self, prompt: str, model_name: str):
+        self.model_name = model_name
+        self.prompt_digest = hashlib.sha256(prompt.encode()).hexdigest()
+        # Redis hits since the last flush, so hot entries look recent to prune()
+        self._hits = {}
+        self._hits_lock = threading.Lock()
+        self._hits_flushed_at = time.monotonic()
+
+    @property
+    def timeout(self) -> int:
+        return settings.ANALYSIS_CACHE_TTL
+
+    def make_key(self, image_data: bytes) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode())
+        digest.update(b"\0")
+        digest.update(self.prompt_digest.encode())
+        digest.update(b"\0")
+        digest.update(image_data)
+        return digest.hexdigest()
+
+    def _cache_key(self, content_hash: str) -> str:
+        return f"{self.KEY_PREFIX}:{content_hash}"
+
+    def get(self, content_hash: str) -> Optional[dict]:
+        try:
+            result = cache.get(self._cache_key(content_hash))
+        except Exception as e:
+            logger.warning(f"Analysis cache read failed: {e}")
+            result = None
+
+        if result is not None:
+            self.record_hit(content_hash)
+            return result
+
+        now = timezone.now()
+        entry = (
+            CachedAnalysisResult.objects
+            .filter(content_hash=content_hash, expires_at__gt=now)
+            .only("result", "expires_at")
+            .first()
+        )
+        if entry is None:
+            return None
+
+        CachedAnalysisResult.objects.filter(id=entry.id).update(
+            hit_count=F("hit_count") + 1,
+            last_accessed_at=now,
+        )
+        self._set_cache(content_hash, entry.result, (entry.expires_at - now).total_seconds())
+        return entry.result
+
+    def set(self, content_hash: str, result: dict):
+        now = timezone.now()
+        CachedAnalysisResult.objects.update_or_create(
+            content_hash=content_hash,
+            defaults={
+                "model_name": self.model_name,
+                "result": result,
+                "last_accessed_at": now,
+                "expires_at": now + timedelta(seconds=self.timeout),
+            },
+        )
+        self._set_cache(content_hash, result, self.timeout)
+
+    def _set_cache(self, content_hash: str, result: dict, timeout: float):
+        try:
+            cache.set(self._cache_key(content_hash), result, timeout=int(timeout))
+        except Exception as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    def discard(self, content_hashes: List[str]):
+        """Drop entries from both tiers, e.g. ones seeded by a benchmark run."""
+        CachedAnalysisResult.objects.filter(content_hash__in=content_hashes).delete()
+        try:
+            cache.delete_many([self._cache_key(content_hash) for content_hash in content_hashes])
+        except Exception as e:
+            logger.warning(f"Analysis cache delete failed: {e}")
+
+    def record_hit(self, content_hash: str):
+        with self._hits_lock:
+            self._hits[content_hash] = self._hits.get(content_hash, 0) + 1
+            due = time.monotonic() - self._hits_flushed_at >= settings.ANALYSIS_CACHE_HIT_FLUSH_SECONDS
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self):
+        """Write buffered Redis hits to the database rows, one UPDATE per distinct count."""
+        with self._hits_lock:
+            hits, self._hits = self._hits, {}
+            self._hits_flushed_at = time.monotonic()
+        by_count = {}
+        for content_hash, count in hits.items():
+            by_count.setdefault(count, []).append(content_hash)
+        now = timezone.now()
+        try:
+            for count, hashes in by_count.items():
+                CachedAnalysisResult.objects.filter(content_hash__in=hashes).update(
+                    hit_count=F("hit_count") + count,
+                    last_accessed_at=now,
+                )
+        except Exception as e:
+            logger.warning(f"Failed to record analysis cache hits: {e}")
+
+    @staticmethod
+    def prune(max_entries: Optional[int] = None) -> int:
+        """
+        Delete expired rows, then trim the table to `max_entries` by
+        evicting the least recently accessed results.
+        """
+        if max_entries is None:
+            max_entries = settings.ANALYSIS_CACHE_MAX_ENTRIES
+
+        deleted, _ = CachedAnalysisResult.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+
+        cutoff = (
+            CachedAnalysisResult.objects
+            .order_by("-last_accessed_at")
+            .values_list("last_accessed_at", flat=True)[max_entries:max_entries + 1]
+            .first()
+        )
+        if cutoff is not None:
+            evicted, _ = CachedAnalysisResult.objects.filter(
+                last_accessed_at__lte=cutoff
+            ).delete()
+            deleted += evicted
+
+        return deleted
+
+
 class GeminiAnalysisService(GeminiBaseService):
 
     def __init__(self):
-        super().__init__()
+        super().__init__(use_async_engine=settings.GEMINI_ASYNC_ENGINE)
+        if settings.NUTRIENT_SOURCE == "reference":
+            self.prompt = ITEMS_ANALYSIS_PROMPT
+            self.result_schema = FoodAnalysisItemsResult
+            self.batch_schema = FoodAnalysisItemsBatchResult
+        else:
+            self.prompt = ANALYSIS_PROMPT
+            self.result_schema = FoodAnalysisResult
+            self.batch_schema = FoodAnalysisBatchResult
+        self.result_cache = AnalysisResultCache(self.prompt, self.model_name)
+        self.batcher = AnalysisBatcher(
+            self.analyze_batch,
+            max_size=settings.ANALYSIS_BATCH_MAX_SIZE,
+            max_wait_ms=settings.ANALYSIS_BATCH_MAX_WAIT_MS,
+        )
 
-    def analyze_image(self, image_path: str) -> Tuple[dict, bool]:
+    def analyze_file(self, file_obj) -> Tuple[dict, bool]:
+        """
+        Analyze an uploaded FileModel image, reading it directly from the
+        configured storage backend.
+        Returns tuple of (response_data, is_mock_data)
+        """
+        return self.analyze_image_data(read_image(file_obj), file_id=file_obj.id)
+
+    def analyze_image(self, image_path: str, file_id: Optional[str] = None) -> Tuple[dict, bool]:
         """
         Analyze food image using Gemini AI.
         Returns tuple of (response_data, is_mock_data)
         """
-        if not self.client:
-            logger.warning("Gemini client not configured, using mock data")
-            return get_mock_analysis_response(), True
+        with open(image_path, 'rb') as f:
+            image_data = f.read()
 
-        try:
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-            
-            # Use the new SDK format with types.Part
-            image_part = self.create_image_part(image_data, "image/jpeg")
+        return self.analyze_image_data(image_data, file_id=file_id)
 
-            return self.call_gemini([ANALYSIS_PROMPT, image_part])
+    def prepare_image(self, image_data: bytes, file_id: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Downscale and re-encode an image before inference. The prepared bytes
+        are cached per file so task retries skip the decode/encode work.
+        Returns tuple of (image_bytes, mime_type)
+        """
+        cache_key = f"analysis-image:{file_id}" if file_id else None
+        if cache_key:
+            try:
+                prepared = cache.get(cache_key)
+            except Exception as e:
+                logger.warning(f"Prepared image cache read failed: {e}")
+                prepared = None
+            if prepared is not None:
+                return prepared
 
-        except FileNotFoundError:
-            logger.error(f"Image file not found: {image_path}")
-            return get_mock_analysis_response(), True
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Gemini response: {e}")
-            return get_mock_analysis_response(), True
-        except Exception as e:
-            logger.error(f"Gemini analysis failed: {e}")
-            return get_mock_analysis_response(), True
+        prepared = images.preprocess_image(
+            image_data,
+            max_edge=settings.ANALYSIS_IMAGE_MAX_EDGE,
+            image_format=settings.ANALYSIS_IMAGE_FORMAT,
+            quality=settings.ANALYSIS_IMAGE_QUALITY,
+        )
+        if prepared is None:
+            return image_data, images.guess_mime_type(image_data)
 
-    def analyze_image_from_url(self, image_url: str) -> Tuple[dict, bool]:
+        logger.info(
+            f"Prepared image for analysis: {len(image_data)} -> {len(prepared[0])} bytes"
+        )
+        if cache_key:
+            try:
+                cache.set(cache_key, prepared, timeout=settings.ANALYSIS_IMAGE_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Prepared image cache write failed: {e}")
+        return prepared
+
+    def analyze_image_data(self, image_data: bytes, file_id: Optional[str] = None) -> Tuple[dict, bool]:
         """
-        Analyze food image from URL using Gemini AI.
+        Analyze raw image bytes, serving identical images from the result cache.
+        Mock data is only returned when no Gemini client is configured; a
+        reply that still fails validation after repair raises
+        InvalidModelResponse.
         Returns tuple of (response_data, is_mock_data)
         """
+        with metrics.stage("cache_lookup"):
+            content_hash = self.result_cache.make_key(image_data)
+            cached_result = self.result_cache.get(content_hash)
+        if cached_result is not None:
+            logger.info(f"Analysis cache hit for {content_hash[:12]}")
+            return cached_result, False
+
         if not self.client:
             logger.warning("Gemini client not configured, using mock data")
             return get_mock_analysis_response(), True
 
+        with metrics.stage("preprocess"):
+            prepared_data, mime_type = self.prepare_image(image_data, file_id=file_id)
+        # Use the new SDK format with types.Part
+        image_part = self.create_image_part(prepared_data, mime_type)
+
+        analysis_result = None
+        if self.batcher.enabled:
+            with metrics.stage("batch"):
+                analysis_result = self.batcher.submit(image_part)
+        if analysis_result is None:
+            # batching disabled, or this image's slot was missing from the batch reply
+            analysis_result, _ = self.call_gemini(
+                [self.prompt, image_part], schema=self.result_schema
+            )
+        result = analysis_result.model_dump(mode="json")
+
+        with metrics.stage("cache_store"):
+            self.result_cache.set(content_hash, result)
+        return result, False
+
+    def analyze_batch(self, image_parts: List[Any]) -> List[Optional[FoodAnalysisItemsResult]]:
+        """
+        Analyze several images in one request, sending the prompt once.
+        Returns one result per image, None where the reply had no valid slot.
+        """
+        contents = [self.prompt + BATCH_INSTRUCTIONS.format(count=len(image_parts))]
+        for index, image_part in enumerate(image_parts):
+            contents += [f"Image {index}:", image_part]
+
+        response = self.generate_content(
+            contents, config=self.structured_config(self.batch_schema)
+        )
+        with metrics.stage("parse"):
+            return self.parse_batch_response(response.text, len(image_parts), self.result_schema)
+
+    @staticmethod
+    def parse_batch_response(
+        response_text: Optional[str], count: int, schema=FoodAnalysisResult
+    ) -> List[Optional[FoodAnalysisItemsResult]]:
+        """Validate each slot on its own so one bad entry only invalidates that image."""
+        results: List[Optional[FoodAnalysisItemsResult]] = [None] * count
         try:
-            import requests
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-            image_data = response.content
+            slots = json.loads(response_text or "").get("results") or []
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Unreadable batch analysis reply: {e}")
+            return results
 
-            # Use the new SDK format with types.Part
-            image_part = self.create_image_part(image_data, "image/jpeg")
+        for slot in slots:
+            if not isinstance(slot, dict):
+                continue
+            index = slot.get("image_index")
+            if not isinstance(index, int) or not 0 <= index < count or results[index] is not None:
+                continue
+            try:
+                results[index] = schema.model_validate(slot.get("analysis"))
+            except ValidationError as e:
+                logger.warning(f"Invalid batch slot {index}: {e.error_count()} errors")
+        return results
 
-            return self.call_gemini([ANALYSIS_PROMPT, image_part])
 
-        except Exception as e:
-            logger.error(f"Gemini analysis from URL failed: {e}")
-            return get_mock_analysis_response(), True
+class LocalAnalysisService:
+    """
+    Food analysis on the CPU food-vision model instead of Gemini, either
+    in-process or through the sidecar at FOOD_VISION_URL. Follows the same
+    (response_data, is_mock_data) contract as GeminiAnalysisService.
+    """
+
+    FOOD_GROUPS = 5
+
+    def __init__(self):
+        self.sidecar_url = settings.FOOD_VISION_URL.rstrip("/")
+        self.top_k = settings.FOOD_VISION_TOP_K
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.batcher = AnalysisBatcher(
+            self.classify_batch,
+            max_size=settings.FOOD_VISION_BATCH_MAX_SIZE,
+            max_wait_ms=settings.FOOD_VISION_BATCH_MAX_WAIT_MS,
+        )
+
+    @property
+    def model(self) -> vision.FoodVisionModel:
+        # loaded on first use so web processes never pay for it
+        return vision.FoodVisionModel.get_instance()
+
+    def analyze_file(self, file_obj) -> Tuple[dict, bool]:
+        return self.analyze_image_data(read_image(file_obj), file_id=file_obj.id)
+
+    def analyze_image_data(self, image_data: bytes, file_id: Optional[str] = None) -> Tuple[dict, bool]:
+        with metrics.stage("inference"):
+            if self.sidecar_url:
+                predictions = self.predict_remote(image_data)
+            else:
+                predictions = self.predict(image_data)
+        return self.build_result(predictions), False
+
+    def predict(self, image_data: bytes) -> List[dict]:
+        """Classify in-process, sharing a batch with concurrent callers when enabled."""
+        predictions = self.batcher.submit(image_data) if self.batcher.enabled else None
+        if predictions is None:
+            predictions = self.classify_batch([image_data])[0]
+        return predictions
+
+    @property
+    def session(self) -> requests.Session:
+        # one pooled keep-alive connection set to the sidecar per process
+        with self._session_lock:
+            if self._session is None:
+                self._session = requests.Session()
+            return self._session
+
+    def predict_remote(self, image_data: bytes) -> List[dict]:
+        response = self.session.post(
+            f"{self.sidecar_url}/classify",
+            data=image_data,
+            headers={"Content-Type": "application/octet-stream"},
+            timeout=30,
+        )
+        response.raise_for_status()
+        return response.json()["predictions"]
+
+    def classify_batch(self, images_data: List[bytes]) -> List[List[dict]]:
+        return [
+            [prediction.as_dict() for prediction in predictions]
+            for predictions in self.model.classify(images_data, top_k=self.top_k)
+        ]
+
+    def build_result(self, predictions: List[dict]) -> dict:
+        """
+        Turn classifier predictions into an analysis result dict. The model is
+        a single-label classifier, so the runners-up are rival labels for the
+        same food rather than other foods on the plate: only the top one is
+        kept, the others are just logged.
+        """
+        foods = predictions[:1]
+        if len(predictions) > 1:
+            logger.debug(
+                "Food vision alternatives: "
+                + ", ".join(f"{p['name']} ({p['confidence']:.2f})" for p in predictions[1:])
+            )
+        food_groups = {food["food_group"] for food in foods}
+        hour = timezone.localtime().hour
+        if hour < 11:
+            meal_type = enums.MealType.BREAKFAST.value
+        elif hour < 16:
+            meal_type = enums.MealType.LUNCH.value
+        elif hour < 21:
+            meal_type = enums.MealType.DINNER.value
+        else:
+            meal_type = enums.MealType.SNACK.value
+
+        result = FoodAnalysisResult.model_validate({
+            "detected_foods": [
+                {
+                    "name": food["name"],
+                    "confidence": food["confidence"],
+                    "portion_estimate": food["portion_estimate"],
+                    "estimated_grams": food.get("portion_grams", 0),
+                    "nutritional_info": food["nutritional_info"],
+                    "micronutrients": food["micronutrients"],
+                    "food_group": food["food_group"],
+                }
+                for food in foods
+            ],
+            "meal_type": meal_type,
+            "balance_score": round(len(food_groups) / self.FOOD_GROUPS, 2),
+            "next_meal_recommendations": {
+                "nutritional_recommendations": [],
+                "balance_improvements": [],
+                "timing_recommendations": [],
+            },
+        })
+        return result.model_dump(mode="json")
 
 
 gemini_service = GeminiAnalysisService()
+local_analysis_service = LocalAnalysisService()
+
+
+def get_analysis_service():
+    """Analysis backend selected by the ANALYSIS_ENGINE setting."""
+    if settings.ANALYSIS_ENGINE == "local":
+        return local_analysis_service
+    return gemini_service
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import FoodAnalysis
+
+
+@receiver(post_delete, sender=FoodAnalysis)
+def refresh_rollup_on_delete(sender, instance, **kwargs):
+    # also covers queryset and cascade deletes (admin bulk delete, deleting
+    # the image or the account), which never call FoodAnalysis.delete
+    instance.refresh_nutrition_rollup()
@@ -1,94 +1,148 @@
-from celery import shared_task
-from loguru import logger
+import random
+import time
+from collections import Counter
 
+from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from loguru import logger
 
-from core.file_storage.models import FileModel
-from .models import FoodAnalysis, DetectedFood
-from .services import gemini_service
+from .models import FoodAnalysis
+from .services import get_analysis_service, read_image, AnalysisResultCache
+from .portions import portion_estimator
+from .nutrients import nutrient_reference
 from .mock import get_mock_analysis_response
-from core.utils import enums
+from core.utils.helpers import metrics, outbox
+from core.utils.services import GeminiUnavailable
+from config.celery.queue import CeleryQueue
 
 
-@shared_task(bind=True, max_retries=3, queue="email-notification")
+@shared_task(bind=True, max_retries=3)
 def analyze_food_image_task(self, file_id: str, use_mock: bool = False):
+    timer = metrics.StageTimer()
+    enqueued_at = (
+        getattr(self.request, "enqueued_at", None)
+        or (self.request.headers or {}).get("enqueued_at")
+    )
+    if enqueued_at:
+        timer.record("queue_wait", time.time() - float(enqueued_at))
+
+    lease_owner = self.request.id or file_id
+    analysis = None
     try:
-        file_obj = FileModel.objects.get(id=file_id)
-        file_obj.currently_under_processing = True
-        file_obj.save()
-
-        analysis = FoodAnalysis.objects.filter(food_image=file_obj).first()
-        if not analysis:
-            analysis = FoodAnalysis.objects.create(
-                owner=file_obj.owner,
-                food_image=file_obj,
-                analysis_status=enums.FoodAnalysisStatus.ANALYSIS_PROCESSING.value
-            )
-        else:
-            analysis.analysis_status = enums.FoodAnalysisStatus.ANALYSIS_PROCESSING.value
-            analysis.save()
-
-        if use_mock:
-            result, is_mock = get_mock_analysis_response(), True
-        else:
-            if not settings.USING_MANAGED_STORAGE:
-                image_path = file_obj.file.path
-                result, is_mock = gemini_service.analyze_image(image_path)
+        with timer.activate():
+            with metrics.stage("claim"):
+                analysis = FoodAnalysis.claim(file_id, lease_owner)
+            if analysis is None:
+                logger.info(f"Analysis for file {file_id} is completed or claimed by another worker, skipping")
+                return {"status": "skipped"}
+
+            if use_mock:
+                result, is_mock = get_mock_analysis_response(), True
             else:
-                image_url = file_obj.file.url
-                result, is_mock = gemini_service.analyze_image_from_url(image_url)
-
-        analysis.meal_type = result.get("meal_type")
-        analysis.balance_score = result.get("balance_score")
-        analysis.next_meal_recommendations = result.get("next_meal_recommendations", {})
-        analysis.is_mock_data = is_mock
-        analysis.analysis_status = enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value
-        analysis.save()
-        analysis.emit_event(enums.FoodAnalysisStatus.ANALYSIS_COMPLETED.value.lower())
-
-        DetectedFood.objects.filter(analysis=analysis).delete()
-
-        for food_data in result.get("detected_foods", []):
-            nutritional_info = food_data.get("nutritional_info", {})
-            DetectedFood.objects.create(
-                analysis=analysis,
-                name=food_data.get("name", "Unknown"),
-                confidence=food_data.get("confidence"),
-                portion_estimate=food_data.get("portion_estimate"),
-                calories=nutritional_info.get("calories"),
-                protein=nutritional_info.get("protein"),
-                carbs=nutritional_info.get("carbs"),
-                fat=nutritional_info.get("fat"),
-                dairy=nutritional_info.get("dairy"),
-                vegetable=nutritional_info.get("vegetable"),
-                fruit=nutritional_info.get("fruit"),
-            )
-
-        file_obj.currently_under_processing = False
-        file_obj.save()
+                image_data = read_image(analysis.food_image)
+                result, is_mock = get_analysis_service().analyze_image_data(
+                    image_data, file_id=file_id
+                )
+                if not analysis.heartbeat():
+                    logger.warning(f"Lost lease on analysis {analysis.id} during inference")
+                    return {"status": "skipped"}
+                if settings.NUTRIENT_SOURCE == "reference" and not is_mock:
+                    with metrics.stage("nutrients"):
+                        result = nutrient_reference.enrich(result)
+                if settings.FOOD_SEGMENTATION_ENABLED and not is_mock:
+                    result = estimate_portions(image_data, result)
+
+            with metrics.stage("persist"):
+                if not analysis.save_result(result, is_mock, lease_owner=lease_owner):
+                    return {"status": "skipped"}
 
+        analysis.save_stage_timings(timer.as_record())
         logger.info(f"Completed food analysis for file {file_id}")
         return {"status": "completed", "analysis_id": analysis.id}
 
-    except FileModel.DoesNotExist:
-        logger.error(f"File {file_id} not found")
-        return {"status": "failed", "error": "File not found"}
+    except GeminiUnavailable as e:
+        if self.request.retries >= settings.GEMINI_THROTTLE_MAX_RETRIES:
+            logger.error(f"Gemini unavailable for file {file_id}, giving up: {e}")
+            mark_analysis_failed(analysis, e, lease_owner)
+            return {"status": "failed", "error": e.message}
+
+        # keep the analysis in processing, holding the lease until the retry runs
+        countdown = e.retry_after + random.uniform(0, e.retry_after)
+        analysis.heartbeat(int(countdown) + settings.ANALYSIS_LEASE_SECONDS)
+        logger.warning(f"Gemini unavailable for file {file_id}, retrying in {e.retry_after}s")
+        raise self.retry(
+            exc=e,
+            countdown=countdown,
+            max_retries=settings.GEMINI_THROTTLE_MAX_RETRIES,
+            # don't let a throttled backlog jump ahead of fresh uploads
+            priority=CeleryQueue.Priority.RETRY,
+        )
 
     except Exception as e:
         logger.error(f"Food analysis failed: {e}")
-        
-        try:
-            analysis = FoodAnalysis.objects.filter(food_image_id=file_id).first()
-            if analysis:
-                analysis.analysis_status = enums.FoodAnalysisStatus.ANALYSIS_FAILED.value
-                analysis.error_message = str(e)
-                analysis.save()
-                analysis.emit_event(enums.FoodAnalysisStatus.ANALYSIS_FAILED.value.lower())
-            
-            file_obj = FileModel.objects.get(id=file_id)
-            file_obj.currently_under_processing = False
-            file_obj.save()
-        except Exception:
-            pass
-
+        mark_analysis_failed(analysis, e, lease_owner)
         raise self.retry(exc=e, countdown=60)
+
+    finally:
+        timer.export()
+
+
+def estimate_portions(image_data: bytes, result: dict) -> dict:
+    # portions refine the model's estimate, so a segmentation failure keeps the original
+    try:
+        with metrics.stage("segmentation"):
+            return portion_estimator.apply_to_result(image_data, result)
+    except Exception as e:
+        logger.error(f"Portion estimation failed: {e}")
+        return result
+
+
+def mark_analysis_failed(analysis, error: Exception, lease_owner: str):
+    if analysis is None:
+        return
+    try:
+        analysis.mark_failed(error, lease_owner=lease_owner)
+    except Exception as e:
+        logger.error(f"Failed to mark analysis {analysis.id} as failed: {e}")
+
+
+@shared_task
+def prune_analysis_result_cache():
+    """Evict expired and least recently used analysis cache rows."""
+    deleted = AnalysisResultCache.prune()
+    logger.info(f"Pruned {deleted} cached analysis results")
+    return {"deleted": deleted}
+
+
+@shared_task
+def recompute_portions_task(analysis_ids: list):
+    """Re-segment a chunk of stored analyses, e.g. after a segmentation model update."""
+    analyses = list(
+        FoodAnalysis.objects.filter(id__in=analysis_ids).select_related("food_image")
+    )
+    updated = portion_estimator.recompute(analyses)
+    logger.info(f"Recomputed portions for {updated}/{len(analysis_ids)} analyses")
+    return {"updated": updated}
+
+
+@shared_task
+def reconcile_stuck_analyses():
+    """Re-enqueue or fail analyses whose worker died while holding the processing lease."""
+    outcomes = Counter()
+    for analysis in FoodAnalysis.expired_leases(settings.ANALYSIS_RECONCILE_BATCH_SIZE):
+        with transaction.atomic():
+            outcome = analysis.recover(settings.ANALYSIS_MAX_ATTEMPTS)
+            if outcome == FoodAnalysis.Status.ANALYSIS_PENDING.value:
+                outbox.enqueue_task(
+                    analyze_food_image_task,
+                    args=[str(analysis.food_image_id)],
+                    priority=CeleryQueue.Priority.RETRY,
+                )
+        if outcome is not None:
+            outcomes[outcome] += 1
+
+    metrics.analyses_reconciled_total.increment_many(outcomes)
+    if outcomes:
+        logger.warning(f"Recovered analyses with expired leases: {dict(outcomes)}")
+    return dict(outcomes)
@@ -1,3 +1,549 @@
-from django.test import TestCase
+import json
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from google import genai
+
+from core.account.models import Account
+from core.analytics.models import DailyNutritionRollup
+from core.file_storage.models import FileModel
+from core.utils import enums
+from core.utils.helpers import metrics
+from .batching import AnalysisBatcher
+from .models import CachedAnalysisResult, DetectedFood, FoodAnalysis, NutrientReference
+from .nutrients import NUTRIENT_COLUMNS, NutrientReferenceIndex
+from .services import AnalysisResultCache, gemini_service
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def create_analysis(user, **fields) -> FoodAnalysis:
+    file_obj = FileModel.objects.create(owner=user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+    return FoodAnalysis.objects.create(owner=user, food_image=file_obj, **fields)
+
+
+class FoodAnalysisLeaseTests(TestCase):
+    """Claims, transitions and recovery are conditional UPDATEs on the lease."""
+
+    def setUp(self):
+        self.user = Account.objects.create_user("lease@example.com", "Lease", "Test", "password")
+        self.analysis = create_analysis(self.user)
+        self.file_id = self.analysis.food_image_id
+
+    def expire_lease(self):
+        FoodAnalysis.objects.filter(id=self.analysis.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_claim_is_won_once(self):
+        claimed = FoodAnalysis.claim(self.file_id, "worker-1")
+
+        self.assertEqual(claimed.analysis_status, FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+        self.assertEqual(claimed.lease_owner, "worker-1")
+        self.assertEqual(claimed.attempts, 1)
+        self.assertTrue(claimed.food_image.currently_under_processing)
+        self.assertIsNone(FoodAnalysis.claim(self.file_id, "worker-2"))
+
+    def test_retry_of_the_same_task_keeps_its_attempt(self):
+        FoodAnalysis.claim(self.file_id, "worker-1")
+
+        claimed = FoodAnalysis.claim(self.file_id, "worker-1")
+
+        self.assertEqual(claimed.lease_owner, "worker-1")
+        self.assertEqual(claimed.attempts, 1)
+
+    def test_expired_lease_can_be_taken_over(self):
+        FoodAnalysis.claim(self.file_id, "worker-1")
+        self.expire_lease()
+
+        claimed = FoodAnalysis.claim(self.file_id, "worker-2")
+
+        self.assertEqual(claimed.lease_owner, "worker-2")
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_claim_creates_a_missing_analysis(self):
+        file_obj = FileModel.objects.create(owner=self.user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+
+        claimed = FoodAnalysis.claim(file_obj.id, "worker-1")
+
+        self.assertEqual(claimed.food_image_id, file_obj.id)
+        self.assertEqual(claimed.analysis_status, FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+        self.assertIsNone(FoodAnalysis.claim(file_obj.id, "worker-2"))
+
+    def test_transition_needs_the_lease(self):
+        claimed = FoodAnalysis.claim(self.file_id, "worker-1")
+        stale = FoodAnalysis.objects.get(id=claimed.id)
+
+        self.assertFalse(stale.transition(
+            [FoodAnalysis.Status.ANALYSIS_PROCESSING.value],
+            FoodAnalysis.Status.ANALYSIS_FAILED.value,
+            lease_owner="worker-2",
+        ))
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+
+        self.assertTrue(claimed.transition(
+            [FoodAnalysis.Status.ANALYSIS_PROCESSING.value],
+            FoodAnalysis.Status.ANALYSIS_FAILED.value,
+            lease_owner="worker-1",
+        ))
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_FAILED.value)
+        self.assertIsNone(self.analysis.lease_owner)
+
+    def test_transition_from_an_unexpected_status_is_refused(self):
+        self.assertFalse(self.analysis.transition(
+            [FoodAnalysis.Status.ANALYSIS_PROCESSING.value],
+            FoodAnalysis.Status.ANALYSIS_COMPLETED.value,
+        ))
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_PENDING.value)
+
+    def test_recover_returns_an_expired_analysis_to_pending(self):
+        FoodAnalysis.claim(self.file_id, "worker-1")
+        self.expire_lease()
+        [expired] = FoodAnalysis.expired_leases(limit=10)
+
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(expired.recover(max_attempts=3), FoodAnalysis.Status.ANALYSIS_PENDING.value)
+
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_PENDING.value)
+        self.assertFalse(self.analysis.food_image.currently_under_processing)
+
+    def test_recover_fails_the_analysis_after_max_attempts(self):
+        FoodAnalysis.claim(self.file_id, "worker-1")
+        self.expire_lease()
+        [expired] = FoodAnalysis.expired_leases(limit=10)
+
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(expired.recover(max_attempts=1), FoodAnalysis.Status.ANALYSIS_FAILED.value)
+
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_FAILED.value)
+        self.assertIn("1 attempts", self.analysis.error_message)
+
+    def test_recover_leaves_a_reclaimed_analysis_alone(self):
+        FoodAnalysis.claim(self.file_id, "worker-1")
+        self.expire_lease()
+        [expired] = FoodAnalysis.expired_leases(limit=10)
+        FoodAnalysis.claim(self.file_id, "worker-2")
+
+        self.assertIsNone(expired.recover(max_attempts=3))
+
+        self.analysis.refresh_from_db()
+        self.assertEqual(self.analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+        self.assertEqual(self.analysis.lease_owner, "worker-2")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class CopyResultTests(TestCase):
+    """Near-duplicate uploads are completed from an earlier analysis."""
+
+    def setUp(self):
+        self.user = Account.objects.create_user("copy@example.com", "Copy", "Test", "password")
+        self.source = create_analysis(
+            self.user,
+            analysis_status=FoodAnalysis.Status.ANALYSIS_COMPLETED.value,
+            meal_type=enums.MealType.LUNCH.value,
+            balance_score="0.80",
+        )
+        DetectedFood.objects.create(analysis=self.source, name="Rice", calories=200, protein=4, estimated_grams=150)
+        DetectedFood.objects.create(analysis=self.source, name="Beans", calories=120, protein=8, estimated_grams=100)
+
+    def copy(self, analysis, source) -> bool:
+        with self.captureOnCommitCallbacks(execute=True):
+            return analysis.copy_result_from(source)
+
+    def test_copies_foods_and_totals(self):
+        analysis = create_analysis(self.user)
+
+        self.assertTrue(self.copy(analysis, self.source))
+
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_COMPLETED.value)
+        self.assertEqual(analysis.meal_type, enums.MealType.LUNCH.value)
+        self.assertEqual(analysis.duplicate_of, self.source)
+        self.assertEqual(analysis.total_calories, 320)
+        self.assertCountEqual(analysis.detected_foods.values_list("name", flat=True), ["Rice", "Beans"])
+        self.assertEqual(self.source.detected_foods.count(), 2)
+
+    def test_copy_of_a_copy_points_at_the_original(self):
+        first = create_analysis(self.user)
+        self.copy(first, self.source)
+        first.refresh_from_db()
+        second = create_analysis(self.user)
+
+        self.copy(second, first)
+
+        second.refresh_from_db()
+        self.assertEqual(second.duplicate_of, self.source)
+
+    def test_refreshes_the_daily_rollup(self):
+        analysis = create_analysis(self.user)
+
+        self.copy(analysis, self.source)
+
+        rollup = DailyNutritionRollup.objects.get(owner=self.user, date=timezone.localdate(analysis.date_added))
+        # the day is re-aggregated, so it counts the source meal as well
+        self.assertEqual(rollup.meal_count, 2)
+        self.assertEqual(rollup.total_calories, 640)
+
+    def test_analysis_no_longer_pending_is_left_alone(self):
+        analysis = create_analysis(self.user, analysis_status=FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+
+        self.assertFalse(self.copy(analysis, self.source))
+
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.analysis_status, FoodAnalysis.Status.ANALYSIS_PROCESSING.value)
+        self.assertIsNone(analysis.duplicate_of)
+        self.assertFalse(analysis.detected_foods.exists())
+        self.assertFalse(DailyNutritionRollup.objects.filter(owner=self.user).exists())
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    ANALYSIS_CACHE_HIT_FLUSH_SECONDS=3600,
+)
+class AnalysisResultCacheTests(TestCase):
+    """Redis in front of the CachedAnalysisResult table, pruned by last access."""
+
+    result = {"foods": [], "total_calories": 0}
+
+    def setUp(self):
+        cache.clear()
+        self.result_cache = AnalysisResultCache("prompt", "gemini-test")
+
+    def test_identical_image_is_served_without_calling_gemini(self):
+        image_data = b"same image bytes"
+        self.result_cache.set(self.result_cache.make_key(image_data), self.result)
+
+        with mock.patch.object(gemini_service, "result_cache", self.result_cache), \
+                mock.patch.object(gemini_service, "generate_content") as generate_content:
+            result, is_mock = gemini_service.analyze_image_data(image_data)
+
+        self.assertEqual(result, self.result)
+        self.assertFalse(is_mock)
+        generate_content.assert_not_called()
+
+    def test_key_depends_on_prompt_and_model(self):
+        image_data = b"image"
+        key = self.result_cache.make_key(image_data)
+
+        self.assertNotEqual(key, AnalysisResultCache("other prompt", "gemini-test").make_key(image_data))
+        self.assertNotEqual(key, AnalysisResultCache("prompt", "gemini-other").make_key(image_data))
+
+    def test_falls_back_to_the_table_and_refills_redis(self):
+        self.result_cache.set("abc", self.result)
+        cache.clear()
+
+        self.assertEqual(self.result_cache.get("abc"), self.result)
+
+        entry = CachedAnalysisResult.objects.get(content_hash="abc")
+        self.assertEqual(entry.hit_count, 1)
+        self.assertEqual(cache.get(self.result_cache._cache_key("abc")), self.result)
+
+    def test_expired_rows_are_a_miss(self):
+        self.result_cache.set("abc", self.result)
+        cache.clear()
+        CachedAnalysisResult.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(self.result_cache.get("abc"))
+
+    def test_redis_outage_falls_back_to_the_table(self):
+        self.result_cache.set("abc", self.result)
+
+        with mock.patch("core.results.services.cache.get", side_effect=ConnectionError("down")):
+            self.assertEqual(self.result_cache.get("abc"), self.result)
+
+    def test_redis_hits_are_buffered_until_flushed(self):
+        self.result_cache.set("abc", self.result)
+        stale = timezone.now() - timedelta(days=1)
+        CachedAnalysisResult.objects.update(last_accessed_at=stale)
+
+        for _ in range(3):
+            self.assertEqual(self.result_cache.get("abc"), self.result)
+        self.assertEqual(CachedAnalysisResult.objects.get(content_hash="abc").hit_count, 0)
+
+        self.result_cache.flush_hits()
+
+        entry = CachedAnalysisResult.objects.get(content_hash="abc")
+        self.assertEqual(entry.hit_count, 3)
+        self.assertGreater(entry.last_accessed_at, stale)
+
+    def test_prune_keeps_the_most_recently_hit_rows(self):
+        now = timezone.now()
+        for age, content_hash in enumerate(["newest", "middle", "oldest"]):
+            self.result_cache.set(content_hash, self.result)
+            CachedAnalysisResult.objects.filter(content_hash=content_hash).update(
+                last_accessed_at=now - timedelta(hours=age + 1)
+            )
+        CachedAnalysisResult.objects.filter(content_hash="middle").update(
+            expires_at=now - timedelta(seconds=1)
+        )
+        self.result_cache.get("oldest")
+        self.result_cache.flush_hits()
+
+        deleted = AnalysisResultCache.prune(max_entries=1)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(
+            list(CachedAnalysisResult.objects.values_list("content_hash", flat=True)), ["oldest"]
+        )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    NUTRIENT_MATCH_MIN_SCORE=0.55,
+)
+class NutrientReferenceIndexTests(TestCase):
+    """Detected foods matched by name against the reference table and scaled to their weight."""
+
+    def setUp(self):
+        NutrientReference.objects.create(
+            name="White rice, cooked",
+            aliases=["steamed rice"],
+            calories=130, protein="2.70", carbs=28,
+            micronutrients={"iron": "0.20", "magnesium": 12},
+        )
+        NutrientReference.objects.create(
+            name="Black beans, boiled", calories=132, protein="8.90", micronutrients={"iron": 2},
+        )
+        self.index = NutrientReferenceIndex()
+
+    def lookup(self, name: str, grams: float = 100):
+        reference_ids, values = self.index.lookup([name], [grams])
+        return reference_ids[0], values[0]
+
+    def test_exact_name_after_normalising(self):
+        reference_id, _ = self.lookup("White Rice (cooked)")
+
+        self.assertEqual(reference_id, NutrientReference.objects.get(name="White rice, cooked").id)
+
+    def test_alias(self):
+        reference_id, _ = self.lookup("Steamed rice")
+
+        self.assertEqual(reference_id, NutrientReference.objects.get(name="White rice, cooked").id)
+
+    def test_close_spelling_matches_by_trigrams(self):
+        reference_id, _ = self.lookup("blak beans boild")
+
+        self.assertEqual(reference_id, NutrientReference.objects.get(name="Black beans, boiled").id)
+
+    def test_unrelated_name_is_below_the_threshold(self):
+        reference_id, values = self.lookup("chocolate cake")
+
+        self.assertIsNone(reference_id)
+        self.assertFalse(values.any())
+
+    def test_values_are_scaled_to_the_portion(self):
+        _, values = self.lookup("white rice cooked", grams=150)
+        nutrients = dict(zip(NUTRIENT_COLUMNS, values.tolist()))
+
+        self.assertEqual(nutrients["calories"], 195)
+        self.assertEqual(nutrients["protein"], 4.05)
+        self.assertEqual(nutrients["iron"], 0.3)
+
+    def test_enrich_uses_the_reference_and_keeps_what_it_lacks(self):
+        result = {"detected_foods": [{
+            "name": "white rice cooked",
+            "estimated_grams": 200,
+            "nutritional_info": {"calories": 999},
+            "micronutrients": {"iron": 9, "vitamin_c": 4},
+        }]}
+
+        food = self.index.enrich(result)["detected_foods"][0]
+
+        self.assertEqual(food["nutrient_reference_id"], NutrientReference.objects.get(name="White rice, cooked").id)
+        self.assertEqual(food["nutritional_info"]["calories"], 260)
+        self.assertEqual(food["micronutrients"]["iron"], 0.4)
+        self.assertEqual(food["micronutrients"]["magnesium"], 24)
+        # the reference has no vitamin C, so the model's estimate stays
+        self.assertEqual(food["micronutrients"]["vitamin_c"], 4)
+        self.assertEqual(result["detected_foods"][0]["nutritional_info"]["calories"], 999)
+
+    def test_enrich_skips_foods_without_a_weight(self):
+        result = {"detected_foods": [
+            {"name": "white rice cooked", "nutritional_info": {"calories": 180}},
+            {"name": "black beans boiled", "estimated_grams": 0, "nutritional_info": {"calories": 90}},
+        ]}
+
+        foods = self.index.enrich(result)["detected_foods"]
+
+        self.assertEqual([food["nutritional_info"]["calories"] for food in foods], [180, 90])
+        self.assertEqual([food["nutrient_reference_id"] for food in foods], [None, None])
+
+    def test_rederive_updates_matched_foods_in_place(self):
+        user = Account.objects.create_user("nutrients@example.com", "Nutrient", "Test", "password")
+        analysis = create_analysis(user)
+        rice = DetectedFood.objects.create(
+            analysis=analysis, name="steamed rice", estimated_grams=50, calories=10,
+            micronutrients={"vitamin_c": 1},
+        )
+        cake = DetectedFood.objects.create(analysis=analysis, name="chocolate cake", estimated_grams=80, calories=300)
+        unweighed = DetectedFood.objects.create(analysis=analysis, name="white rice cooked", calories=70)
+
+        updated = self.index.rederive([rice, cake, unweighed])
+
+        self.assertEqual(updated, [rice])
+        self.assertEqual(rice.calories, 65)
+        self.assertEqual(rice.micronutrients["magnesium"], 6)
+        self.assertEqual(rice.micronutrients["vitamin_c"], 1)
+        self.assertEqual(cake.calories, 300)
+        self.assertEqual(unweighed.calories, 70)
+
+
+class AnalysisBatcherTests(TestCase):
+    """Concurrent submissions share one Gemini request."""
+
+    def submit_concurrently(self, batcher: AnalysisBatcher, parts: list) -> dict:
+        results, timings = {}, {}
+
+        def submit(part):
+            timer = metrics.StageTimer()
+            with timer.activate(), timer.stage("batch"):
+                results[part] = batcher.submit(part)
+            timings[part] = dict(timer.durations)
+
+        threads = [threading.Thread(target=submit, args=(part,)) for part in parts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        return results, timings
+
+    def test_full_batch_is_flushed_in_one_call(self):
+        calls = []
+
+        def flush(parts):
+            calls.append(list(parts))
+            with metrics.stage("inference"):
+                time.sleep(0.02)
+            return [part * 10 for part in parts]
+
+        batcher = AnalysisBatcher(flush, max_size=3, max_wait_ms=5000)
+        results, timings = self.submit_concurrently(batcher, [1, 2, 3])
+
+        self.assertEqual(results, {1: 10, 2: 20, 3: 30})
+        self.assertEqual(len(calls), 1)
+        self.assertCountEqual(calls[0], [1, 2, 3])
+        # every member, not only the thread that sent the request, sees the inference time
+        for part in (1, 2, 3):
+            self.assertGreaterEqual(timings[part]["inference"], 0.02)
+            self.assertLess(timings[part]["batch"], timings[part]["inference"])
+
+    def test_partial_batch_is_flushed_after_max_wait(self):
+        calls = []
+
+        def flush(parts):
+            calls.append(list(parts))
+            return [part * 10 for part in parts]
+
+        batcher = AnalysisBatcher(flush, max_size=8, max_wait_ms=50)
+        started = time.monotonic()
+        results, _ = self.submit_concurrently(batcher, [1, 2])
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(results, {1: 10, 2: 20})
+        self.assertEqual(len(calls), 1)
+
+    def test_lone_image_and_missing_slots_fall_back(self):
+        batcher = AnalysisBatcher(lambda parts: [parts[0] * 10], max_size=2, max_wait_ms=10)
+
+        self.assertIsNone(batcher.submit(1))
+        results, _ = self.submit_concurrently(batcher, [1, 2])
+        # the reply only covered the first slot, the other image gets None
+        self.assertCountEqual(results.values(), [10, None])
+
+    def test_flush_errors_reach_every_member(self):
+        def flush(parts):
+            raise RuntimeError("batch request failed")
+
+        batcher = AnalysisBatcher(flush, max_size=2, max_wait_ms=5000)
+        errors = []
+
+        def submit(part):
+            try:
+                batcher.submit(part)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=submit, args=(part,)) for part in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(errors, ["batch request failed"] * 2)
+
+    def test_disabled_on_process_pools(self):
+        batcher = AnalysisBatcher(lambda parts: parts, max_size=4, max_wait_ms=10)
+        try:
+            AnalysisBatcher.configure_for_pool("prefork")
+            self.assertFalse(batcher.enabled)
+            AnalysisBatcher.configure_for_pool("solo")
+            self.assertFalse(batcher.enabled)
+            AnalysisBatcher.configure_for_pool("threads")
+            self.assertTrue(batcher.enabled)
+        finally:
+            AnalysisBatcher.pool_runs_concurrent_tasks = True
+        self.assertFalse(AnalysisBatcher(lambda parts: parts, max_size=1, max_wait_ms=10).enabled)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class BenchmarkAnalysisTests(TransactionTestCase):
+    """A tiny end-to-end run against an in-process Gemini stand-in."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = self.settings(MEDIA_ROOT=media_root, GEMINI_BASE_URL=f"http://127.0.0.1:{free_port()}")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # the shared service built its client at import, point it at the stand-in
+        client = genai.Client(api_key="benchmark", http_options=gemini_service.http_options())
+        patcher = mock.patch.object(gemini_service, "client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_smoke_run(self):
+        stdout = StringIO()
+        call_command(
+            "benchmark_analysis",
+            images=3, users=1, clients=1, workers=1, image_size=128, timeout=60,
+            standin=True, standin_latency="fixed:0", allow_writes=True, stdout=stdout,
+        )
+
+        report = json.loads(stdout.getvalue())
+        self.assertFalse(report["timed_out"])
+        self.assertEqual(report["analyses"], 3)
+        self.assertEqual(report["statuses"], {FoodAnalysis.Status.ANALYSIS_COMPLETED.value: 3})
+        self.assertIsNotNone(report["end_to_end_ms"]["p50"])
+        self.assertFalse(Account.objects.filter(email__startswith="bench+").exists())
+        self.assertFalse(FoodAnalysis.objects.exists())
+        self.assertFalse(CachedAnalysisResult.objects.exists())
+
+    def test_refuses_to_write_without_debug_or_allow_writes(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_analysis", images=1, standin=True, stdout=StringIO())
+
+        self.assertFalse(Account.objects.exists())
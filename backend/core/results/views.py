@@ -1,3 +1,4 @@
+from django.db import IntegrityError, transaction
 from drf_spectacular.utils import extend_schema
 from loguru import logger
 from rest_framework import response, status, views
@@ -9,10 +10,12 @@ from core.utils.exceptions import exceptions
 from core.utils.permissions import IsObjectOwner
 from core.file_storage.models import FileModel
 from core.utils.enums import FilePurposeType
+from core.utils.helpers import outbox
 
 from .models import FoodAnalysis
 from .serializers import FoodAnalysisSerializer, AnalyzeRequestSerializer
 from .tasks import analyze_food_image_task
+from config.celery.queue import CeleryQueue
 
 
 @extend_schema(tags=["Food Analysis"])
@@ -25,7 +28,11 @@ class ListAnalysis(PaginationMixin, views.APIView):
         responses={200: FoodAnalysisSerializer.List(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        analyses = FoodAnalysis.objects.filter(owner=request.user)
+        analyses = (
+            FoodAnalysis.objects.filter(owner=request.user)
+            .select_related("food_image")
+            .prefetch_related("detected_foods")
+        )
         
         # Filter by date range if provided
         start_date = request.query_params.get('start_date')
@@ -112,26 +119,37 @@ class TriggerAnalysis(views.APIView):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
-        if file_obj.currently_under_processing:
-            raise exceptions.CustomException(
-                message="This file is already being processed",
-                status_code=status.HTTP_409_CONFLICT
-            )
-
-        existing_analysis = FoodAnalysis.objects.filter(food_image=file_obj).first()
-        if existing_analysis and existing_analysis.analysis_status == "completed":
-            serializer = FoodAnalysisSerializer.Detail(instance=existing_analysis)
+        try:
+            with transaction.atomic():
+                analysis, _ = FoodAnalysis.objects.get_or_create(
+                    food_image=file_obj,
+                    defaults={"owner": request.user}
+                )
+        except IntegrityError:
+            # a concurrent request created the analysis between our lookup and insert
+            analysis = FoodAnalysis.objects.get(food_image=file_obj)
+
+        if analysis.analysis_status == FoodAnalysis.Status.ANALYSIS_COMPLETED.value:
+            serializer = FoodAnalysisSerializer.Detail(instance=analysis)
             return response.Response(
                 data={"message": "Analysis already exists", "data": serializer.data},
                 status=status.HTTP_200_OK
             )
 
-        analysis, created = FoodAnalysis.objects.get_or_create(
-            food_image=file_obj,
-            defaults={"owner": request.user, "analysis_status": "pending"}
-        )
+        if analysis.analysis_status == FoodAnalysis.Status.ANALYSIS_PROCESSING.value and analysis.lease_active:
+            raise exceptions.CustomException(
+                message="This file is already being processed",
+                status_code=status.HTTP_409_CONFLICT
+            )
 
-        analyze_food_image_task.delay(file_id, use_mock=use_mock)
+        # pending and expired analyses are claimed by the task itself; if a
+        # duplicate request gets here too, only one of the queued tasks runs
+        outbox.enqueue_task(
+            analyze_food_image_task,
+            args=[file_id],
+            kwargs={"use_mock": use_mock},
+            priority=CeleryQueue.Priority.INTERACTIVE,
+        )
         logger.info(f"Triggered analysis for file {file_id}")
 
         return response.Response(
@@ -1,3 +1,37 @@
+from django.conf import settings
 from django.contrib import admin
+from unfold.admin import ModelAdmin
 
-# Register your models here.
+from .helpers.outbox import relay
+from .models import OutboxMessage
+
+
+class OutboxStateFilter(admin.SimpleListFilter):
+    title = "state"
+    parameter_name = "state"
+
+    def lookups(self, request, model_admin):
+        return [("pending", "Pending"), ("dead", "Gave up"), ("dispatched", "Dispatched")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "pending":
+            return queryset.filter(dispatched_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+        if self.value() == "dead":
+            return queryset.filter(dispatched_at__isnull=True, attempts__gte=settings.OUTBOX_MAX_ATTEMPTS)
+        if self.value() == "dispatched":
+            return queryset.filter(dispatched_at__isnull=False)
+        return queryset
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(ModelAdmin):
+    list_display = ["id", "kind", "name", "attempts", "dispatched_at", "date_added"]
+    list_filter = [OutboxStateFilter, "kind"]
+    search_fields = ["name"]
+    readonly_fields = ["date_added", "date_last_modified", "dispatched_at", "claimed_until", "attempts", "last_error"]
+    actions = ["redrive"]
+
+    @admin.action(description="Re-drive selected undispatched messages")
+    def redrive(self, request, queryset):
+        published = relay.redrive(list(queryset.values_list("id", flat=True)))
+        self.message_user(request, f"Published {published} outbox messages")
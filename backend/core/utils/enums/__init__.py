@@ -1,4 +1,5 @@
 from .account import *
 from .file_storage import *
 from .results import *
-from .recommendation import *
\ No newline at end of file
+from .recommendation import *
+from .outbox import *
\ No newline at end of file
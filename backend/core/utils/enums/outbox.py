@@ -0,0 +1,6 @@
+from .base import BaseEnum
+
+
+class OutboxMessageKind(BaseEnum):
+    TASK = "task"
+    EVENT = "event"
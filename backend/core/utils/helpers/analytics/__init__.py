@@ -1,7 +1,10 @@
+from datetime import timedelta
+
 from django.utils import timezone
 from typing import Any, Optional
 
-from core.results.models import DetectedFood
+from core.analytics.models import DailyNutritionRollup
+from core.utils.helpers.nutrients.aggregation import sum_micronutrients
 
 
 class UserDashboardAnalyticsHelper:
@@ -20,6 +23,8 @@ class UserDashboardAnalyticsHelper:
         "folate",
     ]
 
+    WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
     def __init__(self, user):
         self.user = user
 
@@ -36,24 +41,11 @@ class UserDashboardAnalyticsHelper:
             keys = self.DEFAULT_MICRONUTRIENT_KEYS
 
         today = timezone.localdate()
-        
-        detected_foods = DetectedFood.objects.filter(
-            food_analysis__user=self.user,
-            food_analysis__date_added__date=today,
-        ).values_list("micronutrients", flat=True)
 
-        totals = {k: 0.0 for k in keys}
-        
-        for micronutrients_json in detected_foods:
-            if not micronutrients_json:
-                continue
-            for key in keys:
-                value = micronutrients_json.get(key, 0)
-                if value:
-                    try:
-                        totals[key] += float(value)
-                    except (ValueError, TypeError):
-                        pass
+        totals = sum_micronutrients(
+            DailyNutritionRollup.objects.filter(owner=self.user, date=today),
+            keys,
+        )
 
         # grand total
         grand_total = sum(totals.values())
@@ -71,4 +63,86 @@ class UserDashboardAnalyticsHelper:
                 "percent": round(percent, 2),
             })
 
-        return result
\ No newline at end of file
+        return result
+
+    def get_hourly_calories(self, target_date=None, start_date=None, end_date=None) -> dict[str, Any]:
+        """
+        Get calories per local hour of `target_date` and a weekday x hour
+        heatmap over `start_date`..`end_date`, from the daily rollups' hourly
+        buckets.
+
+        Returns {"h00_calories": ..., "h23_calories": ..., "weekly_heatmap": [[24 floats] x 7]}
+        with the heatmap rows running Monday to Sunday.
+        """
+        if target_date is None:
+            target_date = timezone.localdate()
+        # the range always has to cover the target day
+        end_date = max(end_date or target_date, target_date)
+
+        rollups = DailyNutritionRollup.objects.filter(owner=self.user, date__lte=end_date)
+        if start_date:
+            rollups = rollups.filter(date__gte=min(start_date, target_date))
+
+        hourly = [0.0] * 24
+        heatmap = [[0.0] * 24 for _ in range(7)]
+        for day, hourly_calories in rollups.values_list("date", "hourly_calories").order_by():
+            weekday = heatmap[day.weekday()]
+            for hour, calories in enumerate(hourly_calories or []):
+                weekday[hour] += calories
+            if day == target_date:
+                hourly = list(hourly_calories or hourly)
+
+        result = {f"h{hour:02d}_calories": round(value, 2) for hour, value in enumerate(hourly)}
+        result["weekly_heatmap"] = [[round(value, 2) for value in day] for day in heatmap]
+        return result
+
+    def get_weekday_balance_scores(self, start_date=None, end_date=None, weeks=None) -> dict[str, Any]:
+        """
+        Get average balance scores per local weekday from the daily rollups'
+        score sums and counts.
+
+        Without a range this covers the current week; `weeks` covers the
+        last N weeks up to the current one instead.
+
+        Returns {"average": ..., "scores": [7 floats], "weeks": [{"week_start": date, "scores": [7 floats]}, ...]}
+        with score arrays running Monday to Sunday and weeks oldest first.
+        """
+        today = timezone.localdate()
+        current_week = today - timedelta(days=today.weekday())
+        if weeks:
+            start_date, end_date = current_week - timedelta(weeks=weeks - 1), current_week + timedelta(days=6)
+        elif start_date is None or end_date is None:
+            start_date, end_date = current_week, current_week + timedelta(days=6)
+
+        rows = DailyNutritionRollup.objects.filter(
+            owner=self.user,
+            date__gte=start_date,
+            date__lte=end_date,
+            balance_score_count__gt=0,
+        ).values_list("date", "balance_score_sum", "balance_score_count").order_by()
+
+        first_week = start_date - timedelta(days=start_date.weekday())
+        week_count = (end_date - first_week).days // 7 + 1
+        totals = [[0.0] * 7 for _ in range(week_count)]
+        counts = [[0] * 7 for _ in range(week_count)]
+        for day, total, count in rows:
+            week = (day - first_week).days // 7
+            totals[week][day.weekday()] += float(total)
+            counts[week][day.weekday()] += count
+
+        def averages(total, count):
+            return round(total / count, 2) if count else 0.0
+
+        weekday_totals = [sum(week[day] for week in totals) for day in range(7)]
+        weekday_counts = [sum(week[day] for week in counts) for day in range(7)]
+        return {
+            "average": averages(sum(weekday_totals), sum(weekday_counts)),
+            "scores": [averages(*pair) for pair in zip(weekday_totals, weekday_counts)],
+            "weeks": [
+                {
+                    "week_start": first_week + timedelta(weeks=week),
+                    "scores": [averages(*pair) for pair in zip(totals[week], counts[week])],
+                }
+                for week in range(week_count)
+            ],
+        }
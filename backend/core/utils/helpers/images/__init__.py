@@ -0,0 +1,128 @@
+from io import BytesIO
+from typing import IO, Optional
+
+from loguru import logger
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+
+MAGIC_MIME_TYPES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+
+DHASH_SIZE = 8
+HASH_BANDS = 4
+BAND_BITS = (DHASH_SIZE * DHASH_SIZE) // HASH_BANDS
+
+
+def compute_dhash(fp: IO[bytes]) -> Optional[int]:
+    """
+    Compute a 64-bit difference hash (dHash) of an image.
+
+    The image is orientation-corrected, reduced to a 9x8 greyscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour.
+    Returns None when the file cannot be decoded.
+    """
+    if not PIL_AVAILABLE:
+        logger.warning("Pillow is not installed, skipping perceptual hashing")
+        return None
+
+    try:
+        fp.seek(0)
+        with Image.open(fp) as image:
+            # let the JPEG decoder downscale while decoding
+            image.draft("L", (DHASH_SIZE * 8, DHASH_SIZE * 8))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert("L").resize(
+                (DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS
+            )
+            pixels = list(image.getdata())
+    except Exception as e:
+        logger.warning(f"Could not compute perceptual hash: {e}")
+        return None
+    finally:
+        fp.seek(0)
+
+    value = 0
+    width = DHASH_SIZE + 1
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * width + col]
+            right = pixels[row * width + col + 1]
+            value = (value << 1) | int(left > right)
+    return value
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+def hash_bands(value: int) -> list[int]:
+    """
+    Split a hash into HASH_BANDS bucket keys of the form (band index, band bits).
+
+    Two hashes within Hamming distance HASH_BANDS - 1 always share at least
+    one band, so an exact lookup on the bucket keys finds every candidate.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [
+        (index << BAND_BITS) | ((value >> (index * BAND_BITS)) & mask)
+        for index in range(HASH_BANDS)
+    ]
+
+
+def guess_mime_type(image_data: bytes, default: str = "image/jpeg") -> str:
+    """Guess an image MIME type from its leading bytes."""
+    for magic, mime_type in MAGIC_MIME_TYPES:
+        if image_data.startswith(magic):
+            return mime_type
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        return "image/webp"
+    if image_data[4:8] == b"ftyp":
+        brand = image_data[8:12]
+        if brand in (b"heic", b"heix", b"heim", b"heis"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1", b"heif"):
+            return "image/heif"
+    return default
+
+
+def preprocess_image(
+    image_data: bytes,
+    max_edge: int,
+    image_format: str = "JPEG",
+    quality: int = 85,
+) -> Optional[tuple[bytes, str]]:
+    """
+    Decode, orientation-correct, downscale and re-encode an image for inference.
+
+    The long edge is capped at `max_edge` and the result is encoded as
+    `image_format`. Returns (image_bytes, mime_type), or None when the image
+    cannot be decoded so callers can fall back to the original bytes.
+    """
+    if not PIL_AVAILABLE:
+        return None
+
+    image_format = image_format.upper()
+    try:
+        with Image.open(BytesIO(image_data)) as image:
+            # let the JPEG decoder downscale while decoding
+            image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+            output = BytesIO()
+            image.save(output, format=image_format, quality=quality)
+    except Exception as e:
+        logger.warning(f"Could not preprocess image: {e}")
+        return None
+
+    return output.getvalue(), Image.MIME.get(image_format, "image/jpeg")
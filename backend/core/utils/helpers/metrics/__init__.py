@@ -0,0 +1,216 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from loguru import logger
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+KEY_PREFIX = "metrics"
+
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar("current_stage_timer", default=None)
+
+
+def get_redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+class StageHistogram:
+    """
+    Latency histogram per stage, aggregated in Redis so every worker process
+    contributes to one series. Rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    def _key(self, stage: str) -> str:
+        return f"{KEY_PREFIX}:{self.name}:{stage}"
+
+    def observe_many(self, durations: dict[str, float]):
+        if not durations:
+            return
+        try:
+            pipeline = get_redis().pipeline(transaction=False)
+            for stage, seconds in durations.items():
+                key = self._key(stage)
+                bucket = next((b for b in LATENCY_BUCKETS if seconds <= b), "+Inf")
+                pipeline.hincrby(key, str(bucket), 1)
+                pipeline.hincrbyfloat(key, "sum", seconds)
+                pipeline.sadd(f"{KEY_PREFIX}:{self.name}", stage)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Failed to export {self.name} metrics: {e}")
+
+    def render(self) -> list[str]:
+        redis = get_redis()
+        stages = sorted(s.decode() for s in redis.smembers(f"{KEY_PREFIX}:{self.name}"))
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        pipeline = redis.pipeline(transaction=False)
+        for stage in stages:
+            pipeline.hgetall(self._key(stage))
+
+        for stage, values in zip(stages, pipeline.execute()):
+            values = {k.decode(): v.decode() for k, v in values.items()}
+            cumulative = 0
+            for bound in (*LATENCY_BUCKETS, "+Inf"):
+                cumulative += int(values.get(str(bound), 0))
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {float(values.get("sum", 0))}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {cumulative}')
+        return lines
+
+
+analysis_stage_seconds = StageHistogram(
+    "balanced_plate_analysis_stage_seconds",
+    "Time spent in each stage of the food analysis pipeline.",
+)
+
+
+class EventCounter:
+    """Monotonic counters per label value, summed across workers in Redis."""
+
+    def __init__(self, name: str, description: str, label: str):
+        self.name = name
+        self.description = description
+        self.label = label
+
+    @property
+    def key(self) -> str:
+        return f"{KEY_PREFIX}:{self.name}"
+
+    def increment_many(self, counts: dict[str, int]):
+        counts = {value: count for value, count in counts.items() if count}
+        if not counts:
+            return
+        try:
+            pipeline = get_redis().pipeline(transaction=False)
+            for value, count in counts.items():
+                pipeline.hincrby(self.key, value, count)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Failed to export {self.name} metrics: {e}")
+
+    def render(self) -> list[str]:
+        values = get_redis().hgetall(self.key)
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        for value, count in sorted((k.decode(), int(v)) for k, v in values.items()):
+            lines.append(f'{self.name}{{{self.label}="{value}"}} {count}')
+        return lines
+
+
+analyses_reconciled_total = EventCounter(
+    "balanced_plate_analyses_reconciled_total",
+    "Analyses recovered after their processing lease expired, by outcome.",
+    label="outcome",
+)
+
+
+class StageTimer:
+    """
+    Collects named stage durations for one unit of work.
+
+    Stages nest: while a child stage runs, its parent's clock is paused, so
+    each recorded duration is the time spent in that stage alone.
+    """
+
+    def __init__(self, histogram: StageHistogram = analysis_stage_seconds):
+        self.histogram = histogram
+        self.durations: dict[str, float] = {}
+        self._stack: list[list] = []
+        self._started = time.perf_counter()
+
+    def record(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + max(seconds, 0.0)
+
+    @contextmanager
+    def stage(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.record(parent[0], now - parent[1])
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            stage_name, started = self._stack.pop()
+            self.record(stage_name, now - started)
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def merge(self, durations: dict[str, float]):
+        """
+        Add stages that were timed by another thread on this unit's behalf,
+        such as a shared batch request. The stage this unit was waiting in
+        doesn't also count that time.
+        """
+        for name, seconds in durations.items():
+            self.record(name, seconds)
+        if self._stack:
+            self._stack[-1][1] += sum(durations.values())
+
+    @contextmanager
+    def activate(self):
+        """Make this the timer that `stage()` calls record into."""
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    def as_record(self) -> dict[str, float]:
+        """Compact per-analysis record of stage durations in milliseconds."""
+        record = {name: round(seconds * 1000, 1) for name, seconds in self.durations.items()}
+        record["total"] = round((time.perf_counter() - self._started) * 1000, 1)
+        return record
+
+    def export(self):
+        self.histogram.observe_many(self.durations)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as `name` on the active StageTimer, if there is one."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+
+    with timer.stage(name):
+        yield
+
+
+def merge_stages(durations: dict[str, float]):
+    """Add stages timed elsewhere to the active StageTimer, if there is one."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.merge(durations)
+
+
+outbox_messages_dead_total = EventCounter(
+    "balanced_plate_outbox_dead_messages_total",
+    "Outbox messages that reached OUTBOX_MAX_ATTEMPTS and are no longer relayed, by kind.",
+    label="kind",
+)
+
+
+def render_prometheus() -> str:
+    lines = [
+        *analysis_stage_seconds.render(),
+        *analyses_reconciled_total.render(),
+        *outbox_messages_dead_total.render(),
+    ]
+    return "\n".join(lines) + "\n"
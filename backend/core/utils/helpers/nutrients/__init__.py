@@ -0,0 +1,131 @@
+"""
+In-memory nutrient lookup: a fuzzy food-name index over a per-100 g
+nutrient matrix, so a whole list of detected foods is matched and scaled in
+one vectorised step.
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+STOPWORDS = {"a", "an", "and", "of", "the", "with", "some", "serving", "portion", "plate", "bowl"}
+NGRAM_SIZE = 3
+
+
+def singularize(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation, drop filler words and plurals."""
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    words = [singularize(word) for word in re.findall(r"[a-z0-9]+", text) if word not in STOPWORDS]
+    return " ".join(words)
+
+
+def ngrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class NameIndex:
+    """
+    Exact lookup on normalised names, falling back to a trigram inverted
+    index ranked by Dice similarity. Several names (aliases) may share a key.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.keys = []
+        self.gram_counts = []
+        self.postings = defaultdict(list)
+
+    def add(self, key, name: str):
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        self.exact.setdefault(normalized, key)
+        grams = ngrams(normalized)
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.gram_counts.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(entry)
+
+    def match(self, name: str, min_score: float = 0.5) -> Tuple[Optional[object], float]:
+        """Return (key, score) of the best match, or (None, best_score) below `min_score`."""
+        normalized = normalize_name(name)
+        if normalized in self.exact:
+            return self.exact[normalized], 1.0
+
+        grams = ngrams(normalized)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self.postings.get(gram, ()))
+        if not overlaps:
+            return None, 0.0
+
+        entry, score = max(
+            (
+                (entry, 2 * overlap / (len(grams) + self.gram_counts[entry]))
+                for entry, overlap in overlaps.items()
+            ),
+            key=lambda item: item[1],
+        )
+        if score < min_score:
+            return None, score
+        return self.keys[entry], score
+
+
+class NutrientTable:
+    """
+    Reference foods as rows of a per-100 g matrix with one column per
+    nutrient, searchable through a NameIndex over names and aliases. Values a
+    reference doesn't have are NaN, so callers can tell them from a real 0.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        self.ids = []
+        self.rows = []
+        self.index = NameIndex()
+        self.matrix = None
+
+    def add(self, reference_id, names: Iterable[str], per_100g: Sequence[float]):
+        position = len(self.ids)
+        self.ids.append(reference_id)
+        self.rows.append([float("nan") if value is None else float(value) for value in per_100g])
+        for name in names:
+            self.index.add(position, name)
+
+    def freeze(self) -> "NutrientTable":
+        self.matrix = np.array(self.rows, dtype=np.float64).reshape(len(self.rows), len(self.columns))
+        self.rows = []
+        return self
+
+    def match(self, names: Sequence[str], min_score: float) -> List[Optional[int]]:
+        """Row position for each name, None where nothing matched well enough."""
+        return [self.index.match(name, min_score)[0] for name in names]
+
+    def scale(self, positions: Sequence[Optional[int]], grams: Sequence[float]) -> "np.ndarray":
+        """Nutrients for each (row, grams) pair; unmatched rows come back as zeros."""
+        values = np.zeros((len(positions), len(self.columns)))
+        matched = [i for i, position in enumerate(positions) if position is not None]
+        if matched:
+            rows = np.array([positions[i] for i in matched])
+            factors = np.array([grams[i] or 0 for i in matched], dtype=np.float64) / 100
+            values[matched] = self.matrix[rows] * factors[:, None]
+        return values.round(2)
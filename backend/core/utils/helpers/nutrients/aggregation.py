@@ -0,0 +1,85 @@
+"""
+Sums of micronutrient keys stored in a JSON column, computed by the
+database where it can read JSON keys (`->>` on PostgreSQL, `JSON_EXTRACT`
+on SQLite/MySQL), so the rows never have to be loaded into Python. Values
+that aren't numbers are skipped on every backend.
+"""
+from typing import Iterable
+
+from django.db import connections
+from django.db.models import Case, FloatField, QuerySet, Sum, When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.db.models.lookups import Regex
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+FALLBACK_CHUNK_SIZE = 2000
+
+# what float() accepts for a plain decimal number, surrounding spaces included
+NUMBER_PATTERN = r"^\s*[-+]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+
+
+def to_float(value) -> float:
+    if isinstance(value, bool):
+        return 0.0
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def numeric_key(key: str, field: str) -> Case:
+    """
+    `field[key]` as a float, or NULL when it isn't a number. Older free-form
+    replies hold values such as "12mg" or "", which would make the cast
+    raise on PostgreSQL and read as 12 on SQLite; like `to_float`, those
+    count as nothing.
+    """
+    value = KeyTextTransform(key, field)
+    return Case(
+        When(Regex(value, NUMBER_PATTERN), then=Cast(value, FloatField())),
+        default=None,
+        output_field=FloatField(),
+    )
+
+
+def sum_micronutrients(queryset: QuerySet, keys: Iterable[str], field: str = "micronutrients") -> dict[str, float]:
+    """Sum `keys` of the JSON `field` over `queryset`; missing keys count as 0."""
+    keys = list(keys)
+    if not keys:
+        return {}
+
+    if connections[queryset.db].features.supports_json_field:
+        totals = queryset.order_by().aggregate(**{
+            key: Sum(numeric_key(key, field)) for key in keys
+        })
+    else:
+        totals = sum_micronutrients_in_python(queryset, keys, field)
+
+    return {key: float(totals.get(key) or 0) for key in keys}
+
+
+def sum_micronutrients_in_python(queryset: QuerySet, keys: list, field: str) -> dict[str, float]:
+    """Fallback for backends without JSON support, summing a chunk of rows at a time."""
+    totals = np.zeros(len(keys)) if NUMPY_AVAILABLE else [0.0] * len(keys)
+    chunk = []
+    for micronutrients in queryset.order_by().values_list(field, flat=True).iterator(chunk_size=FALLBACK_CHUNK_SIZE):
+        chunk.append([to_float((micronutrients or {}).get(key)) for key in keys])
+        if len(chunk) == FALLBACK_CHUNK_SIZE:
+            totals = add_chunk(totals, chunk)
+            chunk = []
+    if chunk:
+        totals = add_chunk(totals, chunk)
+    return dict(zip(keys, (float(total) for total in totals)))
+
+
+def add_chunk(totals, chunk: list):
+    if NUMPY_AVAILABLE:
+        return totals + np.asarray(chunk, dtype=float).sum(axis=0)
+    return [total + sum(column) for total, column in zip(totals, zip(*chunk))]
@@ -0,0 +1,206 @@
+"""
+Transactional outbox for Celery tasks and websocket events.
+
+Work is recorded as OutboxMessage rows inside the caller's transaction, so a
+task is never published for rows a worker can't see yet, and is never lost
+when the transaction commits. Messages added in a transaction are published
+right after it commits; the `relay_outbox` beat task picks up anything that
+wasn't (process crash, broker outage).
+"""
+import asyncio
+from collections import Counter, defaultdict
+from datetime import timedelta
+from typing import Iterable, List, Optional
+
+from asgiref.sync import async_to_sync
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from loguru import logger
+
+from core.utils import enums
+from core.utils.helpers import metrics
+
+
+def enqueue_task(task, args: Iterable = (), kwargs: Optional[dict] = None, **options):
+    """Record `task.apply_async(args, kwargs, **options)` for publishing on commit."""
+    return add(
+        kind=enums.OutboxMessageKind.TASK.value,
+        name=getattr(task, "name", task),
+        payload={"args": list(args), "kwargs": kwargs or {}},
+        options=options,
+    )
+
+
+def enqueue_event(group: str, message: dict):
+    """Record a channel-layer `group_send(group, message)` for publishing on commit."""
+    return add(kind=enums.OutboxMessageKind.EVENT.value, name=group, payload=message)
+
+
+def add(**fields):
+    from core.utils.models import OutboxMessage
+
+    message = OutboxMessage.objects.create(**fields)
+    transaction.on_commit(lambda: relay.drain(ids=[message.id]))
+    return message
+
+
+class OutboxRelay:
+    """
+    Publishes undispatched messages in id order. A batch is claimed in one
+    short transaction, published with no locks held, then marked in another,
+    so the on-commit publish and the periodic relay never send the same
+    message twice and a slow broker never holds row locks. Claims expire after
+    OUTBOX_CLAIM_TIMEOUT, so a relay dying midway only delays its batch.
+    Tasks share one broker producer and events for different groups are sent
+    concurrently, so a batch costs a few round trips rather than one per
+    message; events for the same group keep their order.
+    """
+
+    def drain(self, ids: Optional[List[int]] = None, limit: Optional[int] = None) -> int:
+        try:
+            messages = self.claim(ids, limit or settings.OUTBOX_BATCH_SIZE)
+            if not messages:
+                return 0
+            errors = self.publish(messages)
+            published = [message.id for message in messages if message.id not in errors]
+            self.mark(published, errors)
+        except Exception as e:
+            # whatever wasn't marked dispatched is retried once its claim expires
+            logger.error(f"Outbox relay failed: {e}")
+            return 0
+
+        if errors:
+            logger.warning(f"Failed to publish {len(errors)}/{len(messages)} outbox messages")
+        dead = [
+            message for message in messages
+            if message.id in errors and message.attempts + 1 >= settings.OUTBOX_MAX_ATTEMPTS
+        ]
+        for message in dead:
+            logger.error(
+                f"Outbox message {message.id} ({message.kind} {message.name}) gave up after "
+                f"{settings.OUTBOX_MAX_ATTEMPTS} attempts: {errors[message.id]}"
+            )
+        if dead:
+            metrics.outbox_messages_dead_total.increment_many(Counter(message.kind for message in dead))
+        return len(published)
+
+    @staticmethod
+    def claim(ids: Optional[List[int]], limit: int) -> list:
+        """Lease up to `limit` publishable messages to this relay, skipping ones another relay holds."""
+        from core.utils.models import OutboxMessage
+
+        now = timezone.now()
+        with transaction.atomic():
+            messages = OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+                Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+                dispatched_at__isnull=True,
+                attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+            )
+            if ids is not None:
+                messages = messages.filter(id__in=ids)
+            messages = list(messages.order_by("id")[:limit])
+            if messages:
+                OutboxMessage.objects.filter(id__in=[message.id for message in messages]).update(
+                    claimed_until=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT)
+                )
+        return messages
+
+    @staticmethod
+    def mark(published: List[int], errors: dict):
+        """Record the outcome of a claimed batch and release the claim."""
+        from core.utils.models import OutboxMessage
+
+        with transaction.atomic():
+            OutboxMessage.objects.filter(id__in=published).update(
+                dispatched_at=timezone.now(), claimed_until=None
+            )
+            for message_id, error in errors.items():
+                OutboxMessage.objects.filter(id=message_id).update(
+                    attempts=F("attempts") + 1, last_error=error, claimed_until=None
+                )
+
+    def redrive(self, ids: List[int]) -> int:
+        """Reset the attempts of undispatched messages, e.g. ones that gave up, and publish them again."""
+        from core.utils.models import OutboxMessage
+
+        OutboxMessage.objects.filter(id__in=ids, dispatched_at__isnull=True).update(attempts=0, last_error=None)
+        return self.drain(ids=ids)
+
+    @staticmethod
+    def prune(older_than: timedelta, chunk_size: int = 5000) -> int:
+        """Delete messages dispatched before `older_than` ago, a chunk at a time."""
+        from core.utils.models import OutboxMessage
+
+        cutoff = timezone.now() - older_than
+        deleted = 0
+        while True:
+            ids = list(
+                OutboxMessage.objects.filter(dispatched_at__lt=cutoff)
+                .order_by("dispatched_at")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            deleted += OutboxMessage.objects.filter(id__in=ids).delete()[0]
+
+    def publish(self, messages) -> dict:
+        """Publish a batch and return {message id: error} for the ones that failed."""
+        tasks = [m for m in messages if m.kind == enums.OutboxMessageKind.TASK.value]
+        events = [m for m in messages if m.kind == enums.OutboxMessageKind.EVENT.value]
+        errors = {}
+        if tasks:
+            errors.update(self.publish_tasks(tasks))
+        if events:
+            errors.update(async_to_sync(self.publish_events)(events))
+        return errors
+
+    @staticmethod
+    def publish_tasks(messages) -> dict:
+        errors = {}
+        with current_app.producer_or_acquire() as producer:
+            for message in messages:
+                try:
+                    current_app.send_task(
+                        message.name,
+                        args=message.payload.get("args", []),
+                        kwargs=message.payload.get("kwargs", {}),
+                        producer=producer,
+                        **message.options,
+                    )
+                except Exception as e:
+                    errors[message.id] = str(e)
+        return errors
+
+    @staticmethod
+    async def publish_events(messages) -> dict:
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        groups = defaultdict(list)
+        for message in messages:
+            groups[message.name].append(message)
+
+        async def publish_group(group_messages) -> dict:
+            # one after another in id order, so e.g. "processing" never
+            # overtakes "completed" for the same analysis
+            errors = {}
+            for message in group_messages:
+                if errors:
+                    errors[message.id] = "An earlier message for this group failed"
+                    continue
+                try:
+                    await channel_layer.group_send(message.name, message.payload)
+                except Exception as e:
+                    errors[message.id] = str(e)
+            return errors
+
+        errors = {}
+        for group_errors in await asyncio.gather(*(publish_group(group) for group in groups.values())):
+            errors.update(group_errors)
+        return errors
+
+
+relay = OutboxRelay()
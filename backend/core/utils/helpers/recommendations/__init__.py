@@ -5,7 +5,10 @@ from decimal import Decimal
 from typing import Any, Optional
 
 from core.account.models import Account
+from core.analytics.models import DailyNutritionRollup
 from core.results.models import FoodAnalysis, DetectedFood
+from core.utils.helpers.analytics import UserDashboardAnalyticsHelper
+from core.utils.helpers.nutrients.aggregation import sum_micronutrients
 
 class WeeklyRecommendationHelper:
     """Helper class for generating weekly recommendation input data."""
@@ -67,41 +70,14 @@ class WeeklyRecommendationHelper:
 
     def get_weekly_balance_score(self) -> dict[str, Any]:
         """Get average weekly balance score and daily breakdown."""
-        user = (
-            Account.objects
-            .filter(id=self.user.id)
-            .with_weekly_balance_score(
-                start_date=self.start_date,
-                end_date=self.end_date,
-            )
-            .first()
+        balance = UserDashboardAnalyticsHelper(self.user).get_weekday_balance_scores(
+            start_date=self.start_date,
+            end_date=self.end_date,
         )
 
-        if not user:
-            return {
-                "average": 0.0,
-                "daily_breakdown": {
-                    "monday": 0.0,
-                    "tuesday": 0.0,
-                    "wednesday": 0.0,
-                    "thursday": 0.0,
-                    "friday": 0.0,
-                    "saturday": 0.0,
-                    "sunday": 0.0,
-                },
-            }
-
         return {
-            "average": round(user.avg_balance_score, 2),
-            "daily_breakdown": {
-                "monday": round(user.monday_balance, 2),
-                "tuesday": round(user.tuesday_balance, 2),
-                "wednesday": round(user.wednesday_balance, 2),
-                "thursday": round(user.thursday_balance, 2),
-                "friday": round(user.friday_balance, 2),
-                "saturday": round(user.saturday_balance, 2),
-                "sunday": round(user.sunday_balance, 2),
-            },
+            "average": balance["average"],
+            "daily_breakdown": dict(zip(UserDashboardAnalyticsHelper.WEEKDAYS, balance["scores"])),
         }
 
     def get_nutrition_totals_and_percentages(self) -> dict[str, Any]:
@@ -165,24 +141,14 @@ class WeeklyRecommendationHelper:
         if keys is None:
             keys = self.DEFAULT_MICRONUTRIENT_KEYS
 
-        detected_foods = DetectedFood.objects.filter(
-            analysis__owner=self.user,
-            analysis__date_added__date__gte=self.start_date,
-            analysis__date_added__date__lte=self.end_date,
-        ).values_list("micronutrients", flat=True)
-
-        totals = {k: 0.0 for k in keys}
-
-        for micronutrients_json in detected_foods:
-            if not micronutrients_json:
-                continue
-            for key in keys:
-                value = micronutrients_json.get(key, 0)
-                if value:
-                    try:
-                        totals[key] += float(value)
-                    except (ValueError, TypeError):
-                        pass
+        totals = sum_micronutrients(
+            DailyNutritionRollup.objects.filter(
+                owner=self.user,
+                date__gte=self.start_date,
+                date__lte=self.end_date,
+            ),
+            keys,
+        )
 
         return {k: round(v, 2) for k, v in totals.items()}
 
@@ -0,0 +1,167 @@
+"""
+CPU food segmentation backed by an int8-quantised ONNX model.
+
+The model (see `ai/model/food-segmentation`) labels every pixel as
+background, plate or one of the food groups. Masks are exchanged as
+column-major run-length encodings (COCO "uncompressed RLE"), which keeps a
+256x256 mask to a few hundred integers.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from loguru import logger
+
+from core.utils.helpers import vision
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+BACKGROUND = "background"
+PLATE = "plate"
+
+
+def rle_encode(mask: "np.ndarray") -> dict:
+    """Encode a boolean HxW mask; counts alternate runs of 0s and 1s, starting with 0s."""
+    pixels = np.asarray(mask, dtype=bool).flatten(order="F")
+    changes = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    boundaries = np.concatenate(([0], changes, [pixels.size]))
+    counts = np.diff(boundaries).tolist()
+    if pixels.size and pixels[0]:
+        counts.insert(0, 0)
+    return {"size": list(mask.shape), "counts": counts}
+
+
+def rle_decode(rle: dict) -> "np.ndarray":
+    height, width = rle["size"]
+    values = np.zeros(len(rle["counts"]), dtype=bool)
+    values[1::2] = True
+    pixels = np.repeat(values, rle["counts"])
+    return pixels.reshape((height, width), order="F")
+
+
+def rle_area(rle: dict) -> int:
+    return sum(rle["counts"][1::2])
+
+
+def connected_components(mask: "np.ndarray") -> List["np.ndarray"]:
+    """Split a boolean mask into its 4-connected regions, largest first."""
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return []
+
+    # every pixel starts with its own id; ids spread to neighbours as minima,
+    # and each pass also jumps to the id its id points at, so a region
+    # converges in a logarithmic number of passes rather than its diameter
+    background = mask.size
+    ids = np.where(mask, np.arange(mask.size).reshape(mask.shape), background)
+    while True:
+        spread = ids.copy()
+        spread[1:, :] = np.minimum(spread[1:, :], ids[:-1, :])
+        spread[:-1, :] = np.minimum(spread[:-1, :], ids[1:, :])
+        spread[:, 1:] = np.minimum(spread[:, 1:], ids[:, :-1])
+        spread[:, :-1] = np.minimum(spread[:, :-1], ids[:, 1:])
+        spread = np.where(mask, spread, background)
+        flat = spread.ravel()
+        flat[mask.ravel()] = flat[flat[mask.ravel()]]
+        if np.array_equal(spread, ids):
+            break
+        ids = spread
+
+    roots, areas = np.unique(ids[mask], return_counts=True)
+    return [ids == roots[i] for i in np.argsort(-areas, kind="stable")]
+
+
+@dataclass
+class SegmentationLabel:
+    name: str
+    grams_per_cm2: float = 0
+
+
+@dataclass
+class Segmentation:
+    label_map: "np.ndarray"
+    labels: List[SegmentationLabel]
+    model_version: str
+
+    def area(self, name: str) -> int:
+        index = self.index(name)
+        if index is None:
+            return 0
+        return int((self.label_map == index).sum())
+
+    def mask(self, name: str) -> Optional[dict]:
+        index = self.index(name)
+        if index is None:
+            return None
+        return rle_encode(self.label_map == index)
+
+    def index(self, name: str) -> Optional[int]:
+        for index, label in enumerate(self.labels):
+            if label.name.lower() == (name or "").lower():
+                return index
+        return None
+
+    @property
+    def size(self) -> int:
+        return int(self.label_map.size)
+
+    @property
+    def food_area(self) -> int:
+        ignored = [self.index(BACKGROUND), self.index(PLATE)]
+        return int(np.isin(self.label_map, [i for i in ignored if i is not None], invert=True).sum())
+
+
+class FoodSegmentationModel:
+    """
+    Wraps an ONNX Runtime CPU session whose output is [batch, labels, H, W]
+    logits. Images are decoded in parallel, then segmented in one `run` call.
+    """
+
+    _instance: Optional["FoodSegmentationModel"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_path: str, labels_path: str, threads: int = 1):
+        if not vision.ONNX_AVAILABLE:
+            raise ImportError("onnxruntime, numpy and Pillow are required for food segmentation")
+
+        with open(labels_path) as f:
+            manifest = json.load(f)
+        self.labels = [SegmentationLabel(**entry) for entry in manifest["labels"]]
+        self.version = manifest.get("version", "unversioned")
+        self.input_size = manifest.get("input_size", 256)
+        self.mean = np.array(manifest.get("mean", vision.IMAGENET_MEAN), dtype=np.float32)
+        self.std = np.array(manifest.get("std", vision.IMAGENET_STD), dtype=np.float32)
+
+        self.session = vision.create_session(model_path, threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="food-segmentation")
+        logger.info(f"Loaded food segmentation model {model_path} ({self.version})")
+
+    @classmethod
+    def get_instance(cls) -> "FoodSegmentationModel":
+        from django.conf import settings
+
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    model_path=settings.FOOD_SEGMENTATION_MODEL_PATH,
+                    labels_path=settings.FOOD_SEGMENTATION_LABELS_PATH,
+                    threads=settings.FOOD_SEGMENTATION_THREADS,
+                )
+            return cls._instance
+
+    def preprocess(self, image_data: bytes) -> "np.ndarray":
+        return vision.load_image_tensor(image_data, self.input_size, self.mean, self.std)
+
+    def segment(self, images_data: List[bytes]) -> List[Segmentation]:
+        batch = np.stack(list(self.executor.map(self.preprocess, images_data)))
+        (logits,) = self.session.run(None, {self.input_name: batch})
+        label_maps = logits.argmax(axis=1).astype(np.uint8)
+        return [Segmentation(label_map, self.labels, self.version) for label_map in label_maps]
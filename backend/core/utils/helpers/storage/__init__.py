@@ -0,0 +1,132 @@
+import mmap
+import os
+import threading
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from loguru import logger
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StorageReader:
+    """
+    Reads stored file bytes straight from the storage backend instead of
+    downloading them again through their public URL.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def read(self, name: str) -> bytes:
+        with self.storage.open(name, "rb") as f:
+            return f.read()
+
+    def read_range(self, name: str, start: int, end: Optional[int] = None) -> bytes:
+        """Read bytes [start, end) of a file, or up to EOF when `end` is None."""
+        with self.storage.open(name, "rb") as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start)
+
+    def stream(self, name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        with self.storage.open(name, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+
+class FileSystemStorageReader(StorageReader):
+    """Local storage reader backed by memory-mapped files."""
+
+    def _slice(self, name: str, start: int, end: Optional[int]) -> bytes:
+        with open(self.storage.path(name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[start:end]
+
+    def read(self, name: str) -> bytes:
+        return self._slice(name, 0, None)
+
+    def read_range(self, name: str, start: int, end: Optional[int] = None) -> bytes:
+        return self._slice(name, start, end)
+
+
+class S3StorageReader(StorageReader):
+    """
+    S3 / Spaces reader sharing one pooled, keep-alive boto3 client per process.
+    """
+
+    _client = None
+    _client_pid: Optional[int] = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls):
+        # boto3 clients are thread safe but must not be shared across a fork
+        with cls._client_lock:
+            if cls._client is None or cls._client_pid != os.getpid():
+                import boto3
+                from botocore.config import Config
+
+                cls._client = boto3.session.Session().client(
+                    "s3",
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                    config=Config(
+                        signature_version=settings.AWS_S3_SIGNATURE_VERSION,
+                        s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+                        max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS,
+                        tcp_keepalive=True,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                    ),
+                )
+                cls._client_pid = os.getpid()
+                logger.info("Created shared S3 client for storage reads")
+            return cls._client
+
+    def _key(self, name: str) -> str:
+        from storages.utils import clean_name
+        return self.storage._normalize_name(clean_name(name))
+
+    def _get_object(self, name: str, byte_range: Optional[str] = None):
+        params = {"Bucket": self.storage.bucket_name, "Key": self._key(name)}
+        if byte_range:
+            params["Range"] = byte_range
+        try:
+            return self.get_client().get_object(**params)
+        except self.get_client().exceptions.NoSuchKey:
+            raise FileNotFoundError(f"File does not exist: {name}")
+
+    def read(self, name: str) -> bytes:
+        return self._get_object(name)["Body"].read()
+
+    def read_range(self, name: str, start: int, end: Optional[int] = None) -> bytes:
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end - 1}"
+        return self._get_object(name, byte_range)["Body"].read()
+
+    def stream(self, name: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        body = self._get_object(name)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size=chunk_size)
+        finally:
+            body.close()
+
+
+def get_storage_reader(storage=None) -> StorageReader:
+    """Return the most direct reader available for `storage` (default storage if omitted)."""
+    storage = storage or default_storage
+    if isinstance(storage, FileSystemStorage):
+        return FileSystemStorageReader(storage)
+
+    try:
+        from storages.backends.s3boto3 import S3Boto3Storage
+    except ImportError:
+        S3Boto3Storage = None
+
+    if S3Boto3Storage is not None and isinstance(storage, S3Boto3Storage):
+        return S3StorageReader(storage)
+    return StorageReader(storage)
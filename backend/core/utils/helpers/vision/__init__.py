@@ -0,0 +1,123 @@
+"""
+CPU food classifier backed by an int8-quantised ONNX model.
+
+The model and its label manifest are produced by
+`ai/model/food-vision/export.py`. Every label in the manifest carries the
+reference portion and nutrition the classifier reports for that food.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+from typing import List, Optional
+
+from loguru import logger
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+    from PIL import Image, ImageOps
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
+def load_image_tensor(image_data: bytes, size: int, mean: "np.ndarray", std: "np.ndarray") -> "np.ndarray":
+    """Decode, centre-crop and normalise one image into a CHW float32 tensor."""
+    with Image.open(BytesIO(image_data)) as image:
+        image.draft("RGB", (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image = ImageOps.fit(image, (size, size), method=Image.Resampling.BILINEAR)
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+    return ((pixels - mean) / std).transpose(2, 0, 1)
+
+
+def create_session(model_path: str, threads: int) -> "ort.InferenceSession":
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+@dataclass
+class FoodLabel:
+    name: str
+    food_group: str
+    portion_estimate: str
+    portion_grams: float = 0
+    nutritional_info: dict = field(default_factory=dict)
+    micronutrients: dict = field(default_factory=dict)
+
+
+@dataclass
+class Prediction:
+    label: FoodLabel
+    confidence: float
+
+    def as_dict(self) -> dict:
+        return {**asdict(self.label), "confidence": self.confidence}
+
+
+class FoodVisionModel:
+    """
+    Wraps an ONNX Runtime CPU session. Images in a batch are decoded and
+    resized in parallel on a thread pool, then classified in one `run` call.
+    """
+
+    _instance: Optional["FoodVisionModel"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_path: str, labels_path: str, threads: int = 1):
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime, numpy and Pillow are required for local food analysis")
+
+        with open(labels_path) as f:
+            manifest = json.load(f)
+        self.labels = [FoodLabel(**entry) for entry in manifest["labels"]]
+        self.input_size = manifest.get("input_size", 224)
+        self.mean = np.array(manifest.get("mean", IMAGENET_MEAN), dtype=np.float32)
+        self.std = np.array(manifest.get("std", IMAGENET_STD), dtype=np.float32)
+
+        self.session = create_session(model_path, threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="food-vision")
+        logger.info(f"Loaded food vision model {model_path} ({len(self.labels)} labels)")
+
+    @classmethod
+    def get_instance(cls) -> "FoodVisionModel":
+        from django.conf import settings
+
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    model_path=settings.FOOD_VISION_MODEL_PATH,
+                    labels_path=settings.FOOD_VISION_LABELS_PATH,
+                    threads=settings.FOOD_VISION_THREADS,
+                )
+            return cls._instance
+
+    def preprocess(self, image_data: bytes) -> "np.ndarray":
+        return load_image_tensor(image_data, self.input_size, self.mean, self.std)
+
+    def classify(self, images_data: List[bytes], top_k: int = 3) -> List[List[Prediction]]:
+        """Return the `top_k` predictions for each image, most confident first."""
+        batch = np.stack(list(self.executor.map(self.preprocess, images_data)))
+        (logits,) = self.session.run(None, {self.input_name: batch})
+
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        top = np.argsort(-probabilities, axis=1)[:, :top_k]
+        return [
+            [Prediction(self.labels[index], float(probabilities[row, index])) for index in top[row]]
+            for row in range(len(images_data))
+        ]
@@ -0,0 +1,106 @@
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from loguru import logger
+
+from core.utils.services.standin import GeminiStandIn
+
+
+GENERATE_CONTENT_PATH = re.compile(r"^/v1(?:beta|alpha)?/models/(?P<model>[^/:]+):generateContent$")
+
+
+class GeminiStandInHandler(BaseHTTPRequestHandler):
+    standin: GeminiStandIn = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {"error": "Not found"})
+        self.send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        match = GENERATE_CONTENT_PATH.match(self.path.split("?")[0])
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not match:
+            return self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            return self.send_json(400, {"error": {"code": 400, "message": "Invalid JSON body"}})
+
+        status, payload, delay = self.standin.generate(
+            match.group("model"), body, api_key=self.headers.get("x-goog-api-key", "")
+        )
+        time.sleep(delay)
+        self.send_json(status, payload)
+
+    def send_json(self, status_code: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"gemini-standin {self.address_string()} {format % args}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a deterministic stand-in for the Gemini generateContent API. "
+        "Point workers at it with GEMINI_BASE_URL=http://<host>:<port>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8200)
+        parser.add_argument(
+            "--latency",
+            default="lognormal:1200,0.35",
+            help="fixed:MS, uniform:LOW,HIGH, normal:MEAN,STD or lognormal:MEDIAN,SIGMA",
+        )
+        parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with 503")
+        parser.add_argument("--throttle-rate", type=float, default=0, help="Share of requests answered with 429")
+        parser.add_argument(
+            "--malformed-rate", type=float, default=0, help="Share of replies truncated into invalid JSON"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--replay", help="Cassette (JSON lines) of recorded replies to serve first")
+        parser.add_argument("--record", help="Forward requests to real Gemini and append replies to this cassette")
+        parser.add_argument("--upstream", default="https://generativelanguage.googleapis.com")
+
+    def handle(self, *args, **options):
+        if options["record"] and options["replay"]:
+            raise CommandError("--record and --replay can't be combined")
+
+        try:
+            GeminiStandInHandler.standin = GeminiStandIn(
+                latency=options["latency"],
+                error_rate=options["error_rate"],
+                throttle_rate=options["throttle_rate"],
+                malformed_rate=options["malformed_rate"],
+                seed=options["seed"],
+                replay_path=options["replay"],
+                record_path=options["record"],
+                upstream_url=options["upstream"],
+                upstream_api_key=settings.GEMINI_API_KEY if options["record"] else "",
+            )
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), GeminiStandInHandler)
+        server.daemon_threads = True
+        logger.info(f"Gemini stand-in listening on {options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 22:45
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+                ('date_last_modified', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('task', 'TASK'), ('event', 'EVENT')], max_length=10, verbose_name='Kind')),
+                ('name', models.CharField(help_text='Task name, or channel-layer group for events', max_length=255, verbose_name='Name')),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Task args/kwargs, or the event message', verbose_name='Payload')),
+                ('options', models.JSONField(blank=True, default=dict, help_text='apply_async options such as priority or countdown', verbose_name='Options')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Dispatched At')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Publish Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+            ],
+            options={
+                'verbose_name': 'Outbox Message',
+                'verbose_name_plural': 'Outbox Messages',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='outbox_undispatched_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0002_outbox_dispatched_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text='Set while a relay is publishing the message; expires if it dies midway', null=True, verbose_name='Claimed Until'),
+        ),
+    ]
@@ -1,3 +1,80 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+from core.utils.mixins import BaseModelMixin
+from core.utils import enums
+
+
+class OutboxMessage(BaseModelMixin):
+    """
+    A Celery task or websocket event recorded in the same transaction as the
+    rows it refers to, and published by the relay once that transaction has
+    committed (see core.utils.helpers.outbox).
+    """
+
+    kind = models.CharField(
+        _("Kind"),
+        max_length=10,
+        choices=enums.OutboxMessageKind.choices(),
+    )
+    name = models.CharField(
+        _("Name"),
+        max_length=255,
+        help_text=_("Task name, or channel-layer group for events")
+    )
+    payload = models.JSONField(
+        _("Payload"),
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        help_text=_("Task args/kwargs, or the event message")
+    )
+    options = models.JSONField(
+        _("Options"),
+        default=dict,
+        blank=True,
+        help_text=_("apply_async options such as priority or countdown")
+    )
+    dispatched_at = models.DateTimeField(
+        _("Dispatched At"),
+        null=True,
+        blank=True,
+    )
+    claimed_until = models.DateTimeField(
+        _("Claimed Until"),
+        null=True,
+        blank=True,
+        help_text=_("Set while a relay is publishing the message; expires if it dies midway")
+    )
+    attempts = models.PositiveIntegerField(
+        _("Publish Attempts"),
+        default=0,
+    )
+    last_error = models.TextField(
+        _("Last Error"),
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = _("Outbox Message")
+        verbose_name_plural = _("Outbox Messages")
+        ordering = ["id"]
+        indexes = [
+            # the relay only reads undispatched rows
+            models.Index(
+                fields=["id"],
+                condition=Q(dispatched_at__isnull=True),
+                name="outbox_undispatched_idx",
+            ),
+            # pruning deletes by dispatch time
+            models.Index(
+                fields=["dispatched_at"],
+                condition=Q(dispatched_at__isnull=False),
+                name="outbox_dispatched_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.name}"
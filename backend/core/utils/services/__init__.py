@@ -1,42 +1,263 @@
+import asyncio
 import json
+import os
+import threading
 
 from loguru import logger
-from typing import Any
+from typing import Any, Coroutine, Optional, Type
+
+from pydantic import BaseModel, ValidationError
 
 
 try:
     from google import genai
-    from google.genai import types
+    from google.genai import errors, types
     GENAI_AVAILABLE = True
 except ImportError:
     GENAI_AVAILABLE = False
+    errors = None
     types = None
 
 from django.conf import settings
 
+from core.utils.helpers import metrics
+from .quota import GeminiQuotaGuard, GeminiUnavailable, RateLimitExceeded, CircuitOpen
+
+
+REPAIR_PROMPT = """
+Your previous reply did not match the required response schema.
+
+Previous reply:
+{reply}
+
+Validation errors:
+{errors}
+
+Return the corrected JSON only.
+"""
+
+
+class InvalidModelResponse(Exception):
+    """Raised when Gemini keeps replying with output that fails schema validation."""
+
+    def __init__(self, message: str, reply: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.reply = reply
+
+
+class AsyncGeminiEngine:
+    """
+    Runs Gemini requests on a single background asyncio loop per process.
+
+    Each task thread hands its request to the loop and waits for the reply,
+    so a threads-pool worker (the interactive lane when GEMINI_ASYNC_ENGINE
+    is on) keeps up to `max_in_flight` analyses in flight on one process and
+    one `client.aio` connection pool. On prefork each process still runs a
+    single task at a time.
+    """
+
+    _instance: Optional["AsyncGeminiEngine"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_in_flight: int, timeout: float):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "AsyncGeminiEngine":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    max_in_flight=settings.GEMINI_ASYNC_MAX_IN_FLIGHT,
+                    timeout=settings.GEMINI_ASYNC_TIMEOUT,
+                )
+            return cls._instance
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # the loop thread does not survive a fork, so prefork children start their own
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="gemini-async-engine",
+                    daemon=True,
+                )
+                thread.start()
+                self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                self._loop = loop
+                self._pid = os.getpid()
+                logger.info(
+                    f"Started Gemini async engine (max_in_flight={self.max_in_flight})"
+                )
+            return self._loop
+
+    async def _limited(self, coro: Coroutine):
+        async with self._semaphore:
+            return await coro
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run `coro` on the engine loop and block the calling thread until it finishes."""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._limited(coro), loop)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+
 class GeminiBaseService:
-    def __init__(self):
+    def __init__(self, use_async_engine: bool = False):
         self.api_key = getattr(settings, 'GEMINI_API_KEY', None)
         self.model_name = getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash')
-        
+
         if GENAI_AVAILABLE and self.api_key:
-            self.client = genai.Client(api_key=self.api_key)
+            self.client = genai.Client(api_key=self.api_key, http_options=self.http_options())
         else:
             self.client = None
 
+        self.async_engine = AsyncGeminiEngine.get_instance() if use_async_engine else None
+        self.quota = GeminiQuotaGuard.get_instance()
+
+    @staticmethod
+    def http_options() -> Any:
+        # GEMINI_BASE_URL points the SDK at a stand-in (`manage.py serve_gemini_standin`)
+        if not settings.GEMINI_BASE_URL:
+            return None
+        return types.HttpOptions(base_url=settings.GEMINI_BASE_URL)
+
     def create_image_part(self, image_data: bytes, mime_type: str = "image/jpeg") -> Any:
         """Create an image Part for Gemini API using the new SDK format."""
         if types is None:
             raise ImportError("google.genai.types is not available")
         return types.Part.from_bytes(data=image_data, mime_type=mime_type)
 
-    def call_gemini(self, contents: Any):
-        response = self.client.models.generate_content(
+    async def generate_content_async(self, contents: Any, config: Any = None) -> Any:
+        return await self.client.aio.models.generate_content(
             model=self.model_name,
             contents=contents,
+            config=config,
+        )
+
+    def generate_content(self, contents: Any, config: Any = None) -> Any:
+        """
+        Send a request through the shared quota guard. Throttling, server
+        errors and an open circuit surface as GeminiUnavailable so callers can
+        back off instead of retrying blindly.
+        """
+        estimated_tokens = self.quota.estimate_tokens(contents)
+        with metrics.stage("quota"):
+            probing = self.quota.before_call(estimated_tokens)
+
+        try:
+            with metrics.stage("inference"):
+                if self.async_engine is not None:
+                    response = self.async_engine.run(
+                        self.generate_content_async(contents, config)
+                    )
+                else:
+                    response = self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config,
+                    )
+        except Exception as e:
+            if not self.is_transient_error(e):
+                raise
+            self.quota.record_failure()
+            raise GeminiUnavailable(
+                f"Gemini request failed: {e}",
+                retry_after=settings.GEMINI_CIRCUIT_RESET_TIMEOUT,
+            ) from e
+        else:
+            usage = getattr(response, "usage_metadata", None)
+            self.quota.record_success(
+                estimated_tokens, getattr(usage, "total_token_count", None)
+            )
+        finally:
+            # the outcome is recorded by now; a probe that ended in a
+            # non-transient error must not hold the half-open circuit until its TTL
+            if probing:
+                self.quota.release_probe()
+        return response
+
+    @staticmethod
+    def is_transient_error(error: Exception) -> bool:
+        """Whether an error means Gemini is throttling or unhealthy, not that the request was bad."""
+        if errors is not None and isinstance(error, errors.APIError):
+            return error.code == 429 or error.code >= 500
+        return isinstance(error, (TimeoutError, ConnectionError)) or (
+            type(error).__module__.startswith("httpx")
         )
 
-        response_text = response.text.strip()
+    def call_gemini(self, contents: Any, schema: Optional[Type[BaseModel]] = None):
+        """
+        Prompt Gemini and return (result, is_mock). With a `schema` the reply
+        is requested as structured output and returned as a validated
+        instance of it; otherwise it is parsed as free-form JSON.
+        """
+        if schema is not None:
+            result = self.call_gemini_structured(contents, schema)
+        else:
+            response = self.generate_content(contents)
+            with metrics.stage("parse"):
+                result = self.parse_response(response.text)
+        logger.info("Successfully prompted Gemini")
+        return result, False
+
+    @staticmethod
+    def structured_config(schema: Type[BaseModel]) -> Any:
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=schema,
+        )
+
+    def call_gemini_structured(self, contents: Any, schema: Type[BaseModel]) -> BaseModel:
+        """
+        Request JSON constrained to `schema` and validate the raw reply
+        straight into it. Invalid replies are sent back with the validation
+        errors for repair, up to GEMINI_STRUCTURED_MAX_ATTEMPTS calls in total.
+        """
+        config = self.structured_config(schema)
+        base_contents = list(contents) if isinstance(contents, (list, tuple)) else [contents]
+        attempt_contents = base_contents
+        max_attempts = settings.GEMINI_STRUCTURED_MAX_ATTEMPTS
+
+        for attempt in range(1, max_attempts + 1):
+            response = self.generate_content(attempt_contents, config=config)
+            reply = response.text or ""
+            with metrics.stage("parse"):
+                try:
+                    return schema.model_validate_json(reply)
+                except ValidationError as e:
+                    validation_error = e
+
+            logger.warning(
+                f"Gemini reply failed {schema.__name__} validation "
+                f"(attempt {attempt}/{max_attempts}): {validation_error.error_count()} errors"
+            )
+            attempt_contents = [
+                *base_contents,
+                REPAIR_PROMPT.format(
+                    reply=reply,
+                    errors=validation_error.json(include_url=False, include_input=False),
+                ),
+            ]
+
+        raise InvalidModelResponse(
+            f"Gemini reply failed {schema.__name__} validation after {max_attempts} attempts",
+            reply=reply,
+        )
+
+    @staticmethod
+    def parse_response(response_text: str) -> dict:
+        response_text = response_text.strip()
         if response_text.startswith('```json'):
             response_text = response_text[7:]
         if response_text.startswith('```'):
@@ -44,6 +265,4 @@ class GeminiBaseService:
         if response_text.endswith('```'):
             response_text = response_text[:-3]
 
-        result = json.loads(response_text.strip())
-        logger.info("Successfully prompted Gemini")
-        return result, False
\ No newline at end of file
+        return json.loads(response_text.strip())
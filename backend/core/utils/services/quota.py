@@ -0,0 +1,222 @@
+import threading
+from typing import Any, Optional
+
+from django.conf import settings
+from loguru import logger
+
+
+# Gemini bills 258 tokens per 768x768 image tile; a 1024px image spans up to 4
+IMAGE_TOKEN_ESTIMATE = 258 * 4
+CHARS_PER_TOKEN = 4
+
+
+class GeminiUnavailable(Exception):
+    """
+    Raised instead of calling Gemini when quota or the circuit breaker says
+    the call would fail. `retry_after` is the suggested backoff in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(GeminiUnavailable):
+    pass
+
+
+class CircuitOpen(GeminiUnavailable):
+    pass
+
+
+# Refill every bucket, then consume `cost` from all of them only if every
+# bucket can afford it. With force=1 the cost is always deducted, which is
+# used to reconcile estimated against actual token usage.
+TOKEN_BUCKET_SCRIPT = """
+local force = tonumber(ARGV[1])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local levels = {}
+local wait = 0
+
+for i, key in ipairs(KEYS) do
+    local offset = 1 + (i - 1) * 3
+    local capacity = tonumber(ARGV[offset + 1])
+    local rate = tonumber(ARGV[offset + 2])
+    local cost = tonumber(ARGV[offset + 3])
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, math.ceil((cost - tokens) / rate))
+    end
+end
+
+local allowed = (wait == 0 or force == 1) and 1 or 0
+
+for i, key in ipairs(KEYS) do
+    local offset = 1 + (i - 1) * 3
+    local capacity = tonumber(ARGV[offset + 1])
+    local rate = tonumber(ARGV[offset + 2])
+    local cost = tonumber(ARGV[offset + 3])
+    local tokens = levels[i]
+    if allowed == 1 then
+        tokens = tokens - cost
+    end
+    redis.call("HSET", key, "tokens", tokens, "ts", now)
+    redis.call("PEXPIRE", key, math.ceil(capacity / rate) + 1000)
+end
+
+return {allowed, wait}
+"""
+
+
+class GeminiQuotaGuard:
+    """
+    Redis-backed quota shared by every worker calling Gemini.
+
+    Combines two token buckets (requests/min and tokens/min) with a circuit
+    breaker. After GEMINI_CIRCUIT_FAILURE_THRESHOLD consecutive failures the
+    circuit opens for GEMINI_CIRCUIT_RESET_TIMEOUT seconds, then lets a single
+    half-open probe through; its outcome closes or re-opens the circuit.
+    If Redis is unreachable the guard fails open and lets calls through.
+    """
+
+    KEY_PREFIX = "gemini-quota"
+
+    _instance: Optional["GeminiQuotaGuard"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self.requests_per_minute = settings.GEMINI_RATE_LIMIT_RPM
+        self.tokens_per_minute = settings.GEMINI_RATE_LIMIT_TPM
+        self.failure_threshold = settings.GEMINI_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = settings.GEMINI_CIRCUIT_RESET_TIMEOUT
+        self._script = None
+
+    @classmethod
+    def get_instance(cls) -> "GeminiQuotaGuard":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def _key(self, name: str) -> str:
+        return f"{self.KEY_PREFIX}:{name}"
+
+    @property
+    def redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+
+    @staticmethod
+    def estimate_tokens(contents: Any) -> int:
+        items = contents if isinstance(contents, (list, tuple)) else [contents]
+        tokens = settings.GEMINI_ESTIMATED_OUTPUT_TOKENS
+        for item in items:
+            if isinstance(item, str):
+                tokens += len(item) // CHARS_PER_TOKEN
+            else:
+                tokens += IMAGE_TOKEN_ESTIMATE
+        return tokens
+
+    def _run_buckets(self, tokens: int, force: bool = False):
+        if self._script is None:
+            self._script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+        buckets = [
+            (self._key("requests"), self.requests_per_minute, 0 if force else 1),
+            (self._key("tokens"), self.tokens_per_minute, tokens),
+        ]
+        keys, args = [], [int(force)]
+        for key, per_minute, cost in buckets:
+            keys.append(key)
+            # a cost above capacity could never be admitted
+            args += [per_minute, per_minute / 60000, min(cost, per_minute)]
+        allowed, wait_ms = self._script(keys=keys, args=args, client=self.redis)
+        return bool(allowed), int(wait_ms) / 1000
+
+    def before_call(self, estimated_tokens: int) -> bool:
+        """
+        Reserve quota for one call or raise GeminiUnavailable with a backoff hint.
+        Returns True when the call is the half-open probe, which the caller
+        must hand back with `release_probe` once it finishes.
+        """
+        probing = False
+        try:
+            probing = self._check_circuit()
+            allowed, wait = self._run_buckets(estimated_tokens)
+        except GeminiUnavailable:
+            raise
+        except Exception as e:
+            logger.warning(f"Gemini quota guard unavailable, allowing call: {e}")
+            return probing
+
+        if not allowed:
+            if probing:
+                self.release_probe()
+            raise RateLimitExceeded("Gemini rate limit reached", retry_after=wait)
+        return probing
+
+    def _check_circuit(self) -> bool:
+        open_ttl, state = self._circuit_state()
+        if open_ttl > 0:
+            raise CircuitOpen("Gemini circuit is open", retry_after=open_ttl / 1000)
+        if state != b"open":
+            return False
+        # cool-down elapsed: half-open, only one probe may go through
+        probe_acquired = self.redis.set(
+            self._key("probe"), 1, nx=True, ex=self.reset_timeout
+        )
+        if not probe_acquired:
+            raise CircuitOpen("Gemini circuit is half-open", retry_after=1)
+        return True
+
+    def release_probe(self):
+        """
+        Let the next call probe again. Needed when the probe ended in an error
+        that says nothing about Gemini's health, e.g. a rejected request.
+        """
+        try:
+            self.redis.delete(self._key("probe"))
+        except Exception as e:
+            logger.warning(f"Failed to release Gemini probe: {e}")
+
+    def _circuit_state(self):
+        pipeline = self.redis.pipeline()
+        pipeline.pttl(self._key("open"))
+        pipeline.get(self._key("state"))
+        return pipeline.execute()
+
+    def record_success(self, estimated_tokens: int, actual_tokens: Optional[int] = None):
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.delete(self._key("failures"), self._key("state"), self._key("probe"))
+            pipeline.execute()
+            if actual_tokens and actual_tokens > estimated_tokens:
+                self._run_buckets(actual_tokens - estimated_tokens, force=True)
+        except Exception as e:
+            logger.warning(f"Failed to record Gemini success: {e}")
+
+    def record_failure(self):
+        try:
+            pipeline = self.redis.pipeline()
+            pipeline.incr(self._key("failures"))
+            pipeline.expire(self._key("failures"), self.reset_timeout * 10)
+            pipeline.get(self._key("state"))
+            failures, _, state = pipeline.execute()
+
+            if state == b"open" or failures >= self.failure_threshold:
+                pipeline = self.redis.pipeline()
+                pipeline.set(self._key("open"), 1, ex=self.reset_timeout)
+                pipeline.set(self._key("state"), "open")
+                pipeline.delete(self._key("failures"), self._key("probe"))
+                pipeline.execute()
+                logger.warning(
+                    f"Gemini circuit opened for {self.reset_timeout}s after {failures} failures"
+                )
+        except Exception as e:
+            logger.warning(f"Failed to record Gemini failure: {e}")
@@ -0,0 +1,294 @@
+"""
+Deterministic stand-in for the Gemini `generateContent` REST endpoint.
+
+Replies are generated from the `responseSchema` of each request, so every
+structured call the app makes (single, batched and items-only analyses,
+weekly recommendations) gets a reply that validates. Latency, 5xx/429
+errors and malformed JSON are injected at configurable rates. All random
+choices are seeded from the request itself and how often it has been seen,
+so a rerun of the same workload sees the same replies and faults.
+
+Recorded cassettes map a request fingerprint to a real Gemini reply; in
+replay mode those are served before falling back to synthetic replies.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from loguru import logger
+
+
+FOOD_NAMES = [
+    "jollof rice", "fried plantain", "grilled chicken breast", "boiled white rice",
+    "black beans", "steamed broccoli", "scrambled eggs", "whole wheat toast",
+    "greek yogurt", "banana", "garden salad", "beef stew", "boiled yam", "apple",
+]
+FOOD_GROUPS = ["Carbs", "Proteins", "Vegetables", "Fruits", "Dairy"]
+MEAL_TYPES = ["Breakfast", "Lunch", "Dinner", "Snack"]
+WORDS = [
+    "add", "more", "leafy", "greens", "swap", "for", "whole", "grains", "include",
+    "lean", "protein", "fresh", "fruit", "drink", "water", "reduce", "fried", "portions",
+]
+
+# rough Gemini accounting, good enough to exercise the token bucket
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class LatencyModel:
+    """
+    Per-request latency from a spec such as "fixed:800", "uniform:300,1500",
+    "normal:900,200" or "lognormal:900,0.4" (median ms, sigma).
+    """
+
+    kind: str
+    params: Tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, params = (spec or "fixed:0").partition(":")
+        values = tuple(float(value) for value in params.split(",") if value)
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        return cls(kind, values)
+
+    def sample(self, rng: random.Random) -> float:
+        """Latency in seconds."""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma)
+        return max(ms, 0) / 1000
+
+
+class SchemaFaker:
+    """Builds a JSON value matching a Gemini `Schema` dict."""
+
+    def __init__(self, rng: random.Random, image_count: int):
+        self.rng = rng
+        self.image_count = image_count
+
+    def value(self, schema: dict, name: str = ""):
+        kind = (schema.get("type") or "OBJECT").upper()
+        if schema.get("enum"):
+            return self.rng.choice(schema["enum"])
+        if kind == "OBJECT":
+            return {
+                key: self.value(child, key)
+                for key, child in (schema.get("properties") or {}).items()
+            }
+        if kind == "ARRAY":
+            return self.array(schema.get("items") or {}, schema, name)
+        if kind in ("NUMBER", "INTEGER"):
+            return self.number(schema, name, integer=kind == "INTEGER")
+        if kind == "BOOLEAN":
+            return self.rng.random() < 0.5
+        return self.string(name)
+
+    def array(self, items: dict, schema: dict, name: str) -> list:
+        if "image_index" in (items.get("properties") or {}):
+            # batched analyses: one slot per image, in order
+            slots = []
+            for index in range(self.image_count):
+                slot = self.value(items, name)
+                slot["image_index"] = index
+                slots.append(slot)
+            return slots
+        low = int(schema.get("minItems") or schema.get("min_items") or 1)
+        high = int(schema.get("maxItems") or schema.get("max_items") or max(low, 3))
+        return [self.value(items, name) for _ in range(self.rng.randint(low, high))]
+
+    def number(self, schema: dict, name: str, integer: bool):
+        low = schema.get("minimum")
+        high = schema.get("maximum")
+        if low is None and high is None:
+            low, high = (0, 1) if name in ("confidence", "balance_score") else (0, 400)
+        low = 0 if low is None else low
+        high = low + 400 if high is None else high
+        value = self.rng.uniform(low, high)
+        return int(round(value)) if integer else round(value, 2)
+
+    def string(self, name: str) -> str:
+        if name == "name":
+            return self.rng.choice(FOOD_NAMES)
+        if name == "food_group":
+            return self.rng.choice(FOOD_GROUPS)
+        if name == "meal_type":
+            return self.rng.choice(MEAL_TYPES)
+        if name == "portion_estimate":
+            return f"{self.rng.randint(1, 3) * 50}g"
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(4, 9)))
+
+
+def request_fingerprint(model: str, body: dict) -> str:
+    """Stable hash of what determines a reply: model, contents and generation config."""
+    canonical = json.dumps(
+        {"model": model, "contents": body.get("contents"), "config": body.get("generationConfig")},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def error_payload(code: int, status: str, message: str) -> dict:
+    return {"error": {"code": code, "status": status, "message": message}}
+
+
+class GeminiStandIn:
+    """
+    Produces (status code, JSON payload, delay seconds) for a generateContent
+    call. Thread-safe; the HTTP layer lives in the `serve_gemini_standin`
+    management command.
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0,
+        throttle_rate: float = 0,
+        malformed_rate: float = 0,
+        seed: int = 0,
+        replay_path: Optional[str] = None,
+        record_path: Optional[str] = None,
+        upstream_url: str = "https://generativelanguage.googleapis.com",
+        upstream_api_key: str = "",
+    ):
+        self.latency = LatencyModel.parse(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.record_path = record_path
+        self.upstream_url = upstream_url.rstrip("/")
+        self.upstream_api_key = upstream_api_key
+        self.cassette = self.load_cassette(replay_path) if replay_path else {}
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load_cassette(path: str) -> dict:
+        cassette = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    cassette[entry["key"]] = entry
+        logger.info(f"Loaded {len(cassette)} recorded Gemini replies from {path}")
+        return cassette
+
+    def next_rng(self, key: str) -> random.Random:
+        # the n-th time a request is seen always gets the same draws, so a
+        # retry of a throttled request isn't throttled forever
+        with self.lock:
+            occurrence = self.seen.get(key, 0)
+            self.seen[key] = occurrence + 1
+        return random.Random(f"{self.seed}:{key}:{occurrence}")
+
+    def generate(self, model: str, body: dict, api_key: str = "") -> Tuple[int, dict, float]:
+        key = request_fingerprint(model, body)
+
+        if self.record_path:
+            status, payload = self.forward(model, body, api_key)
+            # a failed forward is no reply worth replaying
+            if status != 502:
+                self.record(key, status, payload)
+            return status, payload, 0
+
+        rng = self.next_rng(key)
+        delay = self.latency.sample(rng)
+
+        if key in self.cassette:
+            entry = self.cassette[key]
+            return entry["status"], entry["payload"], delay
+
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            return 429, error_payload(
+                429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."
+            ), delay
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, error_payload(503, "UNAVAILABLE", "The model is overloaded."), delay
+
+        text = self.reply_text(body, rng)
+        if rng.random() < self.malformed_rate:
+            text = text[: max(len(text) // 2, 1)]
+        return 200, self.response_payload(body, text), delay
+
+    def reply_text(self, body: dict, rng: random.Random) -> str:
+        config = body.get("generationConfig") or {}
+        schema = config.get("responseSchema") or config.get("responseJsonSchema")
+        if not schema:
+            return json.dumps({"text": " ".join(rng.choice(WORDS) for _ in range(12))})
+        return json.dumps(SchemaFaker(rng, self.image_count(body)).value(schema))
+
+    @staticmethod
+    def image_count(body: dict) -> int:
+        return sum(
+            1
+            for content in body.get("contents") or []
+            for part in content.get("parts") or []
+            if "inlineData" in part or "inline_data" in part
+        )
+
+    def response_payload(self, body: dict, text: str) -> dict:
+        prompt_chars = sum(
+            len(part.get("text", ""))
+            for content in body.get("contents") or []
+            for part in content.get("parts") or []
+        )
+        prompt_tokens = prompt_chars // CHARS_PER_TOKEN + IMAGE_TOKENS * self.image_count(body)
+        output_tokens = len(text) // CHARS_PER_TOKEN
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens,
+            },
+            "modelVersion": "stand-in",
+        }
+
+    def forward(self, model: str, body: dict, api_key: str) -> Tuple[int, dict]:
+        """Send the request to real Gemini; unreachable upstreams come back as a 502."""
+        request = urllib.request.Request(
+            f"{self.upstream_url}/v1beta/models/{model}:generateContent",
+            data=json.dumps(body).encode(),
+            headers={
+                "Content-Type": "application/json",
+                "x-goog-api-key": self.upstream_api_key or api_key,
+            },
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b"{}")
+            except ValueError:
+                return e.code, error_payload(e.code, "UNKNOWN", e.reason or "Upstream error")
+        except (urllib.error.URLError, TimeoutError, OSError) as e:
+            reason = getattr(e, "reason", None) or e
+            logger.warning(f"Gemini upstream request failed: {reason}")
+            return 502, error_payload(502, "UNAVAILABLE", f"Upstream Gemini request failed: {reason}")
+
+    def record(self, key: str, status: int, payload: dict):
+        with self.lock, open(self.record_path, "a") as f:
+            f.write(json.dumps({"key": key, "status": status, "payload": payload}) + "\n")
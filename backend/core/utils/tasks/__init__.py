@@ -0,0 +1 @@
+from .outbox import relay_outbox, prune_outbox
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from loguru import logger
+
+from core.utils.helpers.outbox import relay
+
+
+@shared_task
+def relay_outbox():
+    """Publish outbox messages that weren't sent when their transaction committed."""
+    published = 0
+    while True:
+        count = relay.drain()
+        if not count:
+            break
+        published += count
+    if published:
+        logger.info(f"Relayed {published} outbox messages")
+    return {"published": published}
+
+
+@shared_task
+def prune_outbox():
+    """Delete outbox messages dispatched more than OUTBOX_RETENTION_DAYS ago."""
+    deleted = relay.prune(timedelta(days=settings.OUTBOX_RETENTION_DAYS))
+    logger.info(f"Pruned {deleted} dispatched outbox messages")
+    return {"deleted": deleted}
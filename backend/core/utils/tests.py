@@ -1,3 +1,498 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import random
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from pydantic import BaseModel
+
+from core.account.models import Account
+from core.file_storage.models import FileModel
+from core.results.models import DetectedFood, FoodAnalysis
+from core.utils import enums
+from core.utils.helpers import images, outbox
+from core.utils.helpers.nutrients.aggregation import sum_micronutrients, sum_micronutrients_in_python
+from core.utils.models import OutboxMessage
+from core.utils.services import AsyncGeminiEngine, GeminiBaseService, InvalidModelResponse
+from core.utils.services.quota import CircuitOpen, GeminiQuotaGuard, RateLimitExceeded
+from core.utils.services.standin import GeminiStandIn
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+def make_image(seed: int, size=(320, 240), quality: int = 90) -> bytes:
+    # smooth random blobs, so resizing and recompressing keep the structure
+    rng = random.Random(seed)
+    small = Image.frombytes("RGB", (8, 6), rng.randbytes(8 * 6 * 3))
+    buffer = io.BytesIO()
+    small.resize(size, Image.Resampling.BICUBIC).save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class PerceptualHashTests(TestCase):
+
+    def test_resized_copy_hashes_close(self):
+        original = images.compute_dhash(io.BytesIO(make_image(1)))
+        resized = images.compute_dhash(io.BytesIO(make_image(1, size=(640, 480), quality=60)))
+        other = images.compute_dhash(io.BytesIO(make_image(2)))
+
+        self.assertLessEqual(images.hamming_distance(original, resized), 3)
+        self.assertGreater(images.hamming_distance(original, other), 10)
+
+    def test_undecodable_file(self):
+        self.assertIsNone(images.compute_dhash(io.BytesIO(b"not an image")))
+
+    def test_close_hashes_share_a_band(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            value = rng.getrandbits(64)
+            near = value
+            for bit in rng.sample(range(64), images.HASH_BANDS - 1):
+                near ^= 1 << bit
+            self.assertTrue(set(images.hash_bands(value)) & set(images.hash_bands(near)))
+
+    def test_bands_are_distinct_per_position(self):
+        # equal bits in different positions must not collide
+        self.assertEqual(len(set(images.hash_bands(0))), images.HASH_BANDS)
+
+
+class AsyncGeminiEngineTests(TestCase):
+    """Threads waiting on the engine share one loop, with several requests in flight."""
+
+    def setUp(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.engine = AsyncGeminiEngine(max_in_flight=3, timeout=5)
+        self.addCleanup(lambda: self.engine._loop and self.engine._loop.call_soon_threadsafe(self.engine._loop.stop))
+
+        self.service = GeminiBaseService()
+        self.service.async_engine = self.engine
+        self.service.quota = mock.Mock(estimate_tokens=mock.Mock(return_value=1))
+        self.service.client = SimpleNamespace(
+            aio=SimpleNamespace(models=SimpleNamespace(generate_content=self.generate_content))
+        )
+
+    async def generate_content(self, model, contents, config=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        return SimpleNamespace(text=contents, usage_metadata=None)
+
+    def call_from_threads(self, count: int) -> list:
+        replies = [None] * count
+
+        def call(index):
+            replies[index] = self.service.generate_content(f"image {index}").text
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return replies
+
+    def test_requests_from_several_threads_overlap(self):
+        replies = self.call_from_threads(3)
+
+        self.assertEqual(replies, ["image 0", "image 1", "image 2"])
+        self.assertEqual(self.peak, 3)
+
+    def test_requests_in_flight_are_capped(self):
+        self.call_from_threads(6)
+
+        self.assertEqual(self.peak, 3)
+
+
+@skipUnless(FAKEREDIS_AVAILABLE, "fakeredis is not installed")
+@override_settings(GEMINI_CIRCUIT_FAILURE_THRESHOLD=3, GEMINI_CIRCUIT_RESET_TIMEOUT=30)
+class GeminiQuotaGuardTests(TestCase):
+    """Circuit breaker state in a fake Redis; the bucket script itself is stubbed."""
+
+    def setUp(self):
+        self.guard = GeminiQuotaGuard()
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        # the token buckets are a Lua script, which fakeredis can't run without lupa
+        for patcher in (
+            mock.patch.object(GeminiQuotaGuard, "redis", new_callable=mock.PropertyMock, return_value=self.redis),
+            mock.patch.object(self.guard, "_run_buckets", return_value=(True, 0)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_circuit(self):
+        for _ in range(3):
+            self.guard.record_failure()
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.guard.record_failure()
+        self.guard.record_failure()
+        self.guard.before_call(100)
+
+        self.guard.record_failure()
+        with self.assertRaises(CircuitOpen) as raised:
+            self.guard.before_call(100)
+        self.assertGreater(raised.exception.retry_after, 0)
+
+    def test_success_resets_the_failure_count(self):
+        self.guard.record_failure()
+        self.guard.record_failure()
+        self.guard.record_success(100)
+        self.guard.record_failure()
+
+        self.guard.before_call(100)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.open_circuit()
+        # the cool-down elapsed
+        self.redis.delete(self.guard._key("open"))
+
+        self.guard.before_call(100)
+        with self.assertRaises(CircuitOpen) as raised:
+            self.guard.before_call(100)
+        self.assertEqual(raised.exception.retry_after, 1)
+
+    def test_successful_probe_closes_the_circuit(self):
+        self.open_circuit()
+        self.redis.delete(self.guard._key("open"))
+        self.guard.before_call(100)
+
+        self.guard.record_success(100)
+
+        self.guard.before_call(100)
+        self.guard.before_call(100)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.open_circuit()
+        self.redis.delete(self.guard._key("open"))
+        self.guard.before_call(100)
+
+        self.guard.record_failure()
+
+        with self.assertRaises(CircuitOpen):
+            self.guard.before_call(100)
+        self.assertGreater(self.redis.pttl(self.guard._key("open")), 0)
+
+    def test_rate_limit_reports_the_wait(self):
+        with mock.patch.object(self.guard, "_run_buckets", return_value=(False, 2.5)):
+            with self.assertRaises(RateLimitExceeded) as raised:
+                self.guard.before_call(100)
+        self.assertEqual(raised.exception.retry_after, 2.5)
+
+    def test_unreachable_redis_fails_open(self):
+        with mock.patch.object(
+            GeminiQuotaGuard, "redis", new_callable=mock.PropertyMock, side_effect=ConnectionError("down")
+        ):
+            self.guard.before_call(100)
+            self.guard.record_failure()
+
+    def test_probe_is_released_after_a_rejected_request(self):
+        self.open_circuit()
+        self.redis.delete(self.guard._key("open"))
+        service = GeminiBaseService()
+        service.quota = self.guard
+        service.client = mock.Mock()
+        service.client.models.generate_content.side_effect = ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            service.generate_content("prompt")
+
+        # still half-open, and the next call may probe
+        self.assertTrue(self.guard.before_call(100))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    METRICS_TOKEN="scrape-token",
+)
+class MetricsViewTests(TestCase):
+
+    def test_requires_the_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(
+            self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403
+        )
+        with mock.patch("core.utils.views.metrics.render_prometheus", return_value="# no metrics\n"):
+            self.assertEqual(
+                self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-token").status_code, 200
+            )
+
+    @override_settings(METRICS_TOKEN="")
+    def test_closed_without_a_configured_token(self):
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+
+class Meal(BaseModel):
+    name: str
+    calories: float
+
+
+@override_settings(GEMINI_STRUCTURED_MAX_ATTEMPTS=2)
+class StructuredOutputTests(TestCase):
+    """Invalid structured replies are sent back once with the validation errors."""
+
+    def setUp(self):
+        self.service = GeminiBaseService()
+        patcher = mock.patch.object(self.service, "generate_content")
+        self.generate_content = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reply(self, *texts):
+        self.generate_content.side_effect = [SimpleNamespace(text=text) for text in texts]
+
+    def test_valid_reply(self):
+        self.reply('{"name": "Rice", "calories": 200}')
+
+        result = self.service.call_gemini_structured("prompt", Meal)
+
+        self.assertEqual(result, Meal(name="Rice", calories=200))
+        self.assertEqual(self.generate_content.call_count, 1)
+
+    def test_invalid_reply_is_repaired(self):
+        self.reply('{"name": "Rice"}', '{"name": "Rice", "calories": 200}')
+
+        result, is_mock = self.service.call_gemini(["prompt"], schema=Meal)
+
+        self.assertEqual(result, Meal(name="Rice", calories=200))
+        self.assertFalse(is_mock)
+        repair_contents = self.generate_content.call_args_list[1].args[0]
+        self.assertEqual(repair_contents[0], "prompt")
+        self.assertIn('{"name": "Rice"}', repair_contents[-1])
+        self.assertIn("calories", repair_contents[-1])
+
+    def test_gives_up_after_max_attempts(self):
+        self.reply("not json", '{"name": "Rice", "calories": "lots"}')
+
+        with self.assertRaises(InvalidModelResponse) as raised:
+            self.service.call_gemini_structured("prompt", Meal)
+
+        self.assertEqual(self.generate_content.call_count, 2)
+        self.assertEqual(raised.exception.reply, '{"name": "Rice", "calories": "lots"}')
+
+
+class TaskRelayTests(TestCase):
+    """OutboxRelay.drain against a mocked Celery app."""
+
+    def setUp(self):
+        self.sent = []
+        self.failing = set()
+        patcher = mock.patch.object(outbox, "current_app")
+        app = patcher.start()
+        self.addCleanup(patcher.stop)
+        app.send_task.side_effect = self.send_task
+        self.relay = outbox.OutboxRelay()
+
+    def send_task(self, name, args=(), kwargs=None, **options):
+        if name in self.failing:
+            raise ConnectionError("broker unavailable")
+        self.sent.append((name, args))
+
+    def add_task(self, name: str, *args) -> OutboxMessage:
+        return OutboxMessage.objects.create(
+            kind=enums.OutboxMessageKind.TASK.value, name=name, payload={"args": list(args), "kwargs": {}}
+        )
+
+    def test_drain_publishes_in_id_order(self):
+        messages = [self.add_task("first", 1), self.add_task("second", 2), self.add_task("third", 3)]
+
+        self.assertEqual(self.relay.drain(), 3)
+
+        self.assertEqual(self.sent, [("first", [1]), ("second", [2]), ("third", [3])])
+        for message in messages:
+            message.refresh_from_db()
+            self.assertIsNotNone(message.dispatched_at)
+        self.assertEqual(self.relay.drain(), 0)
+
+    def test_drain_only_takes_the_given_ids(self):
+        self.add_task("first")
+        second = self.add_task("second")
+
+        self.assertEqual(self.relay.drain(ids=[second.id]), 1)
+
+        self.assertEqual([name for name, _ in self.sent], ["second"])
+
+    def test_failures_count_attempts_and_keep_the_rest_going(self):
+        self.failing.add("broken")
+        broken = self.add_task("broken")
+        healthy = self.add_task("healthy")
+
+        self.assertEqual(self.relay.drain(), 1)
+
+        broken.refresh_from_db()
+        healthy.refresh_from_db()
+        self.assertIsNone(broken.dispatched_at)
+        self.assertEqual(broken.attempts, 1)
+        self.assertEqual(broken.last_error, "broker unavailable")
+        self.assertIsNotNone(healthy.dispatched_at)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_message_gives_up_at_max_attempts_and_can_be_redriven(self):
+        self.failing.add("broken")
+        broken = self.add_task("broken")
+
+        with mock.patch.object(outbox.metrics.outbox_messages_dead_total, "increment_many") as dead:
+            self.relay.drain()
+            dead.assert_not_called()
+            self.relay.drain()
+            dead.assert_called_once_with({enums.OutboxMessageKind.TASK.value: 1})
+
+        # no longer picked up by the relay
+        self.relay.drain()
+        broken.refresh_from_db()
+        self.assertEqual(broken.attempts, 2)
+
+        self.failing.clear()
+        self.assertEqual(self.relay.redrive([broken.id]), 1)
+        broken.refresh_from_db()
+        self.assertIsNotNone(broken.dispatched_at)
+        self.assertIsNone(broken.last_error)
+
+    def test_prune_deletes_old_dispatched_messages_only(self):
+        old = self.add_task("old")
+        recent = self.add_task("recent")
+        pending = self.add_task("pending")
+        OutboxMessage.objects.filter(id=old.id).update(dispatched_at=timezone.now() - timedelta(days=8))
+        OutboxMessage.objects.filter(id=recent.id).update(dispatched_at=timezone.now())
+
+        self.assertEqual(outbox.OutboxRelay.prune(timedelta(days=7), chunk_size=1), 1)
+
+        self.assertCountEqual(OutboxMessage.objects.values_list("id", flat=True), [recent.id, pending.id])
+
+    def test_publishing_happens_outside_the_claim(self):
+        message = self.add_task("first")
+        seen = []
+
+        def send_task(name, args=(), kwargs=None, **options):
+            # a relay running meanwhile skips the claimed message
+            seen.append((OutboxMessage.objects.get(id=message.id).claimed_until, self.relay.drain()))
+
+        outbox.current_app.send_task.side_effect = send_task
+
+        self.assertEqual(self.relay.drain(), 1)
+
+        [(claimed_until, concurrent_drained)] = seen
+        self.assertGreater(claimed_until, timezone.now())
+        self.assertEqual(concurrent_drained, 0)
+        message.refresh_from_db()
+        self.assertIsNotNone(message.dispatched_at)
+        self.assertIsNone(message.claimed_until)
+
+    def test_expired_claim_is_picked_up_again(self):
+        message = self.add_task("orphaned")
+        OutboxMessage.objects.filter(id=message.id).update(claimed_until=timezone.now() + timedelta(seconds=30))
+        self.assertEqual(self.relay.drain(), 0)
+
+        OutboxMessage.objects.filter(id=message.id).update(claimed_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.relay.drain(), 1)
+        self.assertEqual(self.sent, [("orphaned", [])])
+
+
+class RecordingChannelLayer:
+    def __init__(self, failing=()):
+        self.sent = []
+        self.failing = set(failing)
+
+    async def group_send(self, group, message):
+        if (group, message["n"]) in self.failing:
+            raise ConnectionError("channel layer unavailable")
+        self.sent.append((group, message["n"]))
+
+
+class EventRelayTests(TestCase):
+
+    def add_event(self, group: str, n: int) -> OutboxMessage:
+        return outbox.enqueue_event(group, {"type": "analysis_update", "n": n})
+
+    def drain(self, layer: RecordingChannelLayer) -> int:
+        with mock.patch("channels.layers.get_channel_layer", return_value=layer):
+            return outbox.OutboxRelay().drain()
+
+    def test_events_keep_their_order_per_group(self):
+        for n in range(3):
+            self.add_event("analysis-a", n)
+            self.add_event("analysis-b", n)
+        layer = RecordingChannelLayer()
+
+        self.assertEqual(self.drain(layer), 6)
+
+        for group in ("analysis-a", "analysis-b"):
+            self.assertEqual([n for name, n in layer.sent if name == group], [0, 1, 2])
+
+    def test_a_failed_event_holds_back_later_ones_of_its_group(self):
+        self.add_event("analysis-a", 0)
+        held = self.add_event("analysis-a", 1)
+        self.add_event("analysis-b", 0)
+
+        self.assertEqual(self.drain(RecordingChannelLayer(failing=[("analysis-a", 0)])), 1)
+        held.refresh_from_db()
+        self.assertEqual(held.attempts, 1)
+        self.assertEqual(held.last_error, "An earlier message for this group failed")
+
+        layer = RecordingChannelLayer()
+        self.assertEqual(self.drain(layer), 2)
+        self.assertEqual(layer.sent, [("analysis-a", 0), ("analysis-a", 1)])
+
+
+class GeminiStandInRecordTests(TestCase):
+
+    def test_unreachable_upstream_is_a_502_and_not_recorded(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        record_dir = tempfile.mkdtemp()
+        record_path = os.path.join(record_dir, "cassette.jsonl")
+        standin = GeminiStandIn(record_path=record_path, upstream_url=f"http://127.0.0.1:{port}")
+
+        status, payload, _ = standin.generate("gemini-test", {"contents": []})
+
+        self.assertEqual(status, 502)
+        self.assertEqual(payload["error"]["code"], 502)
+        self.assertIn("Upstream Gemini request failed", payload["error"]["message"])
+        self.assertFalse(os.path.exists(record_path))
+        os.rmdir(record_dir)
+
+
+class SumMicronutrientsTests(TestCase):
+
+    def setUp(self):
+        user = Account.objects.create_user("sums@example.com", "Sum", "Test", "password")
+        file_obj = FileModel.objects.create(owner=user, purpose=enums.FilePurposeType.FOOD_IMAGE.value)
+        analysis = FoodAnalysis.objects.create(owner=user, food_image=file_obj)
+        for micronutrients in (
+            {"iron": 1.5, "zinc": 2},
+            {"iron": "2.5", "zinc": None},
+            # older free-form replies
+            {"iron": "12mg", "zinc": "", "calcium": True},
+            {},
+        ):
+            DetectedFood.objects.create(analysis=analysis, name="Food", micronutrients=micronutrients)
+        self.foods = DetectedFood.objects.all()
+
+    def test_sums_numeric_values_and_skips_the_rest(self):
+        totals = sum_micronutrients(self.foods, ["iron", "zinc", "calcium", "folate"])
+
+        self.assertEqual(totals, {"iron": 4.0, "zinc": 2.0, "calcium": 0.0, "folate": 0.0})
+
+    def test_python_fallback_agrees_with_the_database(self):
+        keys = ["iron", "zinc", "calcium"]
+
+        self.assertEqual(
+            sum_micronutrients_in_python(self.foods, keys, "micronutrients"),
+            sum_micronutrients(self.foods, keys),
+        )
+
+    def test_no_keys(self):
+        self.assertEqual(sum_micronutrients(self.foods, []), {})
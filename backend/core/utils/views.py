@@ -1,3 +1,36 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework import views
+from rest_framework.permissions import BasePermission
+
+from core.utils.helpers import metrics
+
+
+class HasMetricsToken(BasePermission):
+    """
+    Allows scrapers presenting `Authorization: Bearer <METRICS_TOKEN>`.
+    Access is denied when no token is configured.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        if not token:
+            return False
+        presented = request.headers.get("Authorization", "")
+        return hmac.compare_digest(presented.encode(), f"Bearer {token}".encode())
+
+
+@extend_schema(exclude=True)
+class MetricsView(views.APIView):
+    http_method_names = ["get"]
+    authentication_classes = []
+    permission_classes = [HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -105,6 +105,11 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         logger.info(f"Sent analysis_failed to user {self.user.id}")
 
 
+    async def analysis_pending(self, event):
+        await self.send_json(event)
+        logger.info(f"Sent analysis_pending to user {self.user.id}")
+
+
     @database_sync_to_async
     def mark_recommendation_read(self, recommendation_id: int) -> bool:
         """
@@ -35,4 +35,23 @@ def emit_websocket_event(instance,  event_type: str) -> bool:
         logger.error(f"Failed to emit event: {e}")
         raise exceptions.CustomException(
             message=f"Event emission failed: {e}"
-        )
\ No newline at end of file
+        )
+
+
+def queue_websocket_event(instance, event_type: str):
+    """
+    Record the event in the outbox as part of the current transaction; it is
+    sent once the transaction commits.
+    """
+    from core.utils.helpers import outbox
+
+    event_method = getattr(instance.EventData, f"on_{event_type}", None)
+    if not event_method:
+        logger.warning(f"Unknown event type: {event_type}")
+        raise exceptions.CustomException(
+            message="Invalid event type for WebSocket emission."
+        )
+
+    return outbox.enqueue_event(
+        instance.owner.push_notification_channel_id, event_method(instance)
+    )
@@ -4,5 +4,9 @@ set -o errexit
 set -o pipefail
 set -o nounset
 
-echo "Starting Celery worker..."
-celery -A config worker -Q beats,email-notification,recommendations -l INFO -n worker@%h
\ No newline at end of file
+# CELERY_WORKER_LANE picks the queues and concurrency from CELERY_WORKER_LANES
+# (interactive, bulk, background or all); see config/celery/lanes.py
+LANE="${CELERY_WORKER_LANE:-all}"
+
+echo "Starting Celery worker (lane: ${LANE})..."
+celery -A config worker $(python -m config.celery.lanes "${LANE}") -l INFO -n "${LANE}@%h"